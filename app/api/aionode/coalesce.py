@@ -0,0 +1,78 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one in-flight request; the first caller starts it.
+    The request runs in its own task and every caller awaits it through a shield,
+    so a cancelled caller (e.g. a listener that has timed out) does not cancel the others.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, request: Callable[[], Awaitable[Any]]):
+        self.calls += 1
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            task = self._in_flight[key] = asyncio.ensure_future(request())
+            task.add_done_callback(lambda t: self._on_done(key, t))
+        return await asyncio.shield(task)
+
+    def _on_done(self, key: Hashable, task: asyncio.Future):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # nobody may be waiting anymore; this prevents "exception was never retrieved"
+            task.exception()
+
+    def __contains__(self, key: Hashable):
+        return key in self._in_flight
+
+    def __len__(self):
+        return len(self._in_flight)
+
+
+class ResponseMemo:
+    """
+    Small in-memory map of responses that expire after `ttl` seconds; the oldest goes first when full.
+    Meant for the responses pinned to a block height: they never change, only memory is limited.
+    """
+
+    def __init__(self, capacity: int, ttl: float, clock=time.monotonic):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._clock = clock
+        self._items: Dict[Hashable, tuple] = {}  # key -> (expires_at, value), in insertion order
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default=None):
+        entry = self._items.get(key)
+        if entry is None or entry[0] < self._clock():
+            if entry is not None:
+                del self._items[key]
+            self.misses += 1
+            return default
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value):
+        if self.capacity <= 0 or self.ttl <= 0:
+            return
+        self._items.pop(key, None)
+        while len(self._items) >= self.capacity:
+            del self._items[next(iter(self._items))]
+        self._items[key] = (self._clock() + self.ttl, value)
+
+    def clear(self):
+        self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
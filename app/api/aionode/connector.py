@@ -1,13 +1,20 @@
 import asyncio
 import logging
+import time
+from typing import Optional
 
 from aiohttp import ClientSession, ClientError, ServerDisconnectedError
 
+from .coalesce import SingleFlight, ResponseMemo
 from .env import ThorEnvironment
+from .height_cache import HeightResponseCache
 from .nodeclient import ThorNodeClient
 from .types import *
 
 
+_NOT_CACHED = object()
+
+
 class ThorConnector:
     # --- METHODS ----
 
@@ -103,7 +110,7 @@ class ThorConnector:
 
     async def query_thorchain_block_raw(self, height):
         path = self.env.path_thorchain_block_by_height
-        data = await self._request(path, height=height)
+        data = await self._request(path, height=height, hedge=True)
         return data
 
     async def query_genesis(self):
@@ -111,7 +118,7 @@ class ThorConnector:
         return data['result']['genesis'] if data else None
 
     async def query_native_status_raw(self):
-        return await self._request(self.env.path_status, is_rpc=True)
+        return await self._request(self.env.path_status, is_rpc=True, hedge=True)
 
     async def query_native_block_results_raw(self, height=None):
         url = self.env.path_block_results
@@ -277,8 +284,16 @@ class ThorConnector:
 
     # ---- Internal ----
 
+    DEFAULT_HEDGE_MIN_DELAY = 0.2
+    DEFAULT_HEDGE_MAX_DELAY = 3.0
+    DEFAULT_PINNED_TTL = 60.0
+    DEFAULT_PINNED_MAX_ITEMS = 128
+
     def __init__(self, env: ThorEnvironment, session: ClientSession, logger=None, extra_headers=None,
-                 additional_envs=None, silent=True):
+                 additional_envs=None, silent=True,
+                 hedge=False, hedge_min_delay=DEFAULT_HEDGE_MIN_DELAY, hedge_max_delay=DEFAULT_HEDGE_MAX_DELAY,
+                 pinned_ttl=DEFAULT_PINNED_TTL, pinned_max_items=DEFAULT_PINNED_MAX_ITEMS,
+                 height_cache: Optional[HeightResponseCache] = None):
         self.session = session
         self.env = env
         self.silent = silent
@@ -294,6 +309,20 @@ class ThorConnector:
             for env in additional_envs:
                 self._clients.append(self._make_client(env, extra_headers))
 
+        # latency-critical calls may fire a second request to another node if the first one is slow
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+        # identical concurrent requests share one HTTP call;
+        # the responses at a given height never change, so they are also kept for a short while
+        self._single_flight = SingleFlight()
+        self._pinned = ResponseMemo(pinned_max_items, pinned_ttl)
+        # optional persistent storage for them (archive queries, backfills)
+        self.height_cache = height_cache
+
     def _make_client(self, env: ThorEnvironment, extra_headers):
         return ThorNodeClient(self.session, logger=self.logger, env=env,
                               extra_headers=extra_headers)
@@ -302,30 +331,184 @@ class ThorConnector:
         for client in self._clients:
             client.set_client_id_header(client_id)
 
-    async def _request(self, path, is_rpc=False, treat_empty_as_ok=True, paginated=False, height=None, collect_key=''):
-        for client in self._clients:
-            for attempt in range(1, client.env.retries + 1):
-                if attempt > 1:
-                    self.logger.debug(f'Retry #{attempt} for path "{path}"')
-                try:
-                    if paginated:
-                        data = await client.paginated_request(path, height=height, result_key=collect_key)
-                    else:
-                        data = await client.request(path, is_rpc=is_rpc, height=height)
+    @property
+    def endpoint_health(self):
+        return [(client, client.health) for client in self._clients]
+
+    def _ranked_clients(self) -> List[ThorNodeClient]:
+        # the configured order breaks the ties
+        order = {id(c): i for i, c in enumerate(self._clients)}
+        return sorted(self._clients, key=lambda c: (c.health.score, order[id(c)]))
+
+    def _hedge_delay(self, client: ThorNodeClient) -> float:
+        p95 = client.health.p95
+        if p95 is None:
+            return self.hedge_max_delay
+        return min(self.hedge_max_delay, max(self.hedge_min_delay, p95))
+
+    async def _request_once(self, client: ThorNodeClient, path, is_rpc, paginated, height, collect_key):
+        ts_start = time.monotonic()
+        try:
+            if paginated:
+                data = await client.paginated_request(path, height=height, result_key=collect_key)
+            else:
+                data = await client.request(path, is_rpc=is_rpc, height=height)
+        except FileNotFoundError:
+            # the node has answered, it is just not there
+            client.health.record_success(time.monotonic() - ts_start)
+            raise
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            client.health.record_error(time.monotonic() - ts_start)
+            raise
+        client.health.record_success(time.monotonic() - ts_start)
+        return data
 
-                    if treat_empty_as_ok:
-                        return data
-                    else:
-                        if data:
-                            # only non-empty data is considered as valid
-                            if isinstance(data, dict) and data.get('code', 0) != 0:
-                                self.logger.error(f'Error in THORNode: {data}')
-                                raise ConnectionError(f'Error in THORNode: {data}')
-
-                            return data
-                        else:
-                            # if data is empty and treat_empty_as_ok==False, try next client
-                            break  # breaks the retry loop
+    def _check_data(self, data, treat_empty_as_ok):
+        """
+        Returns True if the data is an answer, False if another client should be asked.
+        """
+        if treat_empty_as_ok:
+            return True
+        if data:
+            # only non-empty data is considered as valid
+            if isinstance(data, dict) and data.get('code', 0) != 0:
+                self.logger.error(f'Error in THORNode: {data}')
+                raise ConnectionError(f'Error in THORNode: {data}')
+            return True
+        # if data is empty and treat_empty_as_ok==False, try next client
+        return False
+
+    async def _request_hedged(self, path, is_rpc, height):
+        """
+        Asks the healthiest client; if it hasn't answered within its p95 latency, asks the next one as well.
+        The first good answer wins, the other request is cancelled.
+        Returns (ok, data); not ok if there is nobody to hedge with.
+        """
+        ranked = self._ranked_clients()
+        primary = ranked[0]
+        url = primary.connection_url(path, is_rpc)
+        # e.g. the RPC URL may be shared by all the clients, no point in asking it twice
+        secondary = next((c for c in ranked[1:] if c.connection_url(path, is_rpc) != url), None)
+        if secondary is None:
+            return False, None
+
+        started = {}
+
+        def launch(client):
+            started[client] = time.monotonic()
+            tasks[asyncio.create_task(self._request_once(client, path, is_rpc, False, height, ''))] = client
+
+        tasks = {}
+        launch(primary)
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self._hedge_delay(primary))
+            if not done or next(iter(done)).exception() is not None:
+                self.hedges_fired += 1
+                self.logger.debug(f'Hedging "{path}" to {secondary}')
+                launch(secondary)
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if tasks[task] is secondary:
+                            self.hedges_won += 1
+                        return True, task.result()
+                    self.logger.warning(f'Failed to query {tasks[task]} for "{path}" '
+                                        f'(err: {type(task.exception()).__name__}).')
+            return False, None
+        finally:
+            for task, client in tasks.items():
+                if not task.done():
+                    # the loser: its time so far still counts, or a degraded primary would keep ranking first
+                    client.health.record_abandoned(time.monotonic() - started[client])
+                    task.cancel()
+
+    async def _request(self, path, is_rpc=False, treat_empty_as_ok=True, paginated=False, height=None, collect_key='',
+                       hedge=False):
+        """
+        The shared response object is returned to all the callers, so it must not be modified.
+        """
+        key = (path, is_rpc, height, paginated, collect_key, treat_empty_as_ok)
+        if height:
+            data = self._load_at_height(key)
+            if data is not _NOT_CACHED:
+                return data
+
+        return await self._single_flight.do(
+            key,
+            lambda: self._request_and_remember(key, path, is_rpc, treat_empty_as_ok, paginated, height, collect_key,
+                                               hedge)
+        )
+
+    @staticmethod
+    def _height_cache_key(key):
+        path, is_rpc, height, paginated, collect_key, _ = key
+        return HeightResponseCache.make_key(path, height, int(is_rpc), int(paginated), collect_key)
+
+    def _load_at_height(self, key):
+        data = self._pinned.get(key, _NOT_CACHED)
+        if data is _NOT_CACHED and self.height_cache is not None:
+            data = self.height_cache.get(self._height_cache_key(key), _NOT_CACHED)
+            if data is not _NOT_CACHED:
+                self._pinned.set(key, data)
+        return data
+
+    @staticmethod
+    def _is_final_response(data, is_rpc):
+        """
+        Only a good answer may be remembered for the height. E.g. a height that is not reached yet
+        or is pruned on this node gives an error, and the archive node shares the same cache.
+        """
+        if not data:
+            return False
+        if isinstance(data, dict) and (data.get('code', 0) != 0 or 'error' in data):
+            return False
+        if is_rpc and not (isinstance(data, dict) and 'result' in data):
+            # Tendermint RPC: {"jsonrpc": "2.0", "id": -1, "result": ...} or {..., "error": ...}
+            return False
+        return True
+
+    async def _request_and_remember(self, key, path, is_rpc, treat_empty_as_ok, paginated, height, collect_key, hedge):
+        ok, data = await self._request_any_client(path, is_rpc, treat_empty_as_ok, paginated, height, collect_key,
+                                                  hedge)
+        if ok and height and self._is_final_response(data, is_rpc):
+            self._pinned.set(key, data)
+            if self.height_cache is not None:
+                self.height_cache.put(self._height_cache_key(key), data)
+        return data
+
+    async def _request_any_client(self, path, is_rpc, treat_empty_as_ok, paginated, height, collect_key, hedge):
+        """
+        Returns (ok, data); ok if the data has passed _check_data, otherwise all the clients have failed.
+        """
+        if hedge and self.hedge and not paginated and len(self._clients) > 1:
+            ok, data = await self._request_hedged(path, is_rpc, height)
+            try:
+                if ok and self._check_data(data, treat_empty_as_ok):
+                    return True, data
+            except ConnectionError:
+                pass
+            # both have failed, fall back to the regular retries
+
+        # every round tries all the clients, the healthiest first, so a slow or broken one does not hold the rest
+        exhausted = set()
+        max_retries = max(client.env.retries for client in self._clients)
+        for attempt in range(1, max_retries + 1):
+            if attempt > 1:
+                self.logger.debug(f'Retry #{attempt} for path "{path}"')
+
+            for client in self._ranked_clients():
+                if attempt > client.env.retries or id(client) in exhausted:
+                    continue
+                try:
+                    data = await self._request_once(client, path, is_rpc, paginated, height, collect_key)
+                    if self._check_data(data, treat_empty_as_ok):
+                        return True, data
+                    exhausted.add(id(client))
                 except NotImplementedError:
                     # Do no retries, no backups. Something is wrong with your code
                     raise
@@ -338,6 +521,9 @@ class ThorConnector:
                         err_type = type(e).__name__
                         self.logger.warning(
                             f'#{attempt}. Failed to query {client} for "{client.connection_url(path, is_rpc)}" (err: {err_type}).')
-                if d := client.env.retry_delay:
-                    self.logger.debug(f'#{attempt}. Delay before retry: {d} sec...')
-                    await asyncio.sleep(d)
+
+            if attempt < max_retries and (d := max(client.env.retry_delay for client in self._clients)):
+                self.logger.debug(f'#{attempt}. Delay before retry: {d} sec...')
+                await asyncio.sleep(d)
+
+        return False, None
@@ -0,0 +1,105 @@
+import time
+from collections import deque
+from typing import Optional
+
+
+class EndpointHealth:
+    """
+    Latency and error rate of one THORNode endpoint over its recent requests.
+    The error rate fades out with time, so an endpoint that has failed gets another chance later
+    even if no requests were routed to it meanwhile.
+    """
+
+    DEFAULT_WINDOW = 100
+    ERROR_WEIGHT = 0.2  # of the newest outcome in the error rate
+    ERROR_HALF_LIFE = 60.0  # sec
+    COOLDOWN_PER_ERROR = 5.0  # sec, after consecutive errors
+    MAX_COOLDOWN = 120.0
+    # an untried endpoint is assumed to be this slow, so it does not jump ahead of a primary that answers fine
+    UNKNOWN_LATENCY = 1.0  # sec
+
+    def __init__(self, window=DEFAULT_WINDOW, clock=time.monotonic):
+        self._latencies = deque(maxlen=window)
+        self._clock = clock
+        self._error_rate = 0.0
+        self._error_rate_ts = 0.0
+        self.consecutive_errors = 0
+        self.last_error_ts = 0.0
+        self.total_calls = 0
+        self.total_errors = 0
+
+    def _update_error_rate(self, outcome: float):
+        self._error_rate = self.error_rate * (1.0 - self.ERROR_WEIGHT) + outcome * self.ERROR_WEIGHT
+        self._error_rate_ts = self._clock()
+
+    def record_success(self, latency: float):
+        self.total_calls += 1
+        self._latencies.append(latency)
+        self.consecutive_errors = 0
+        self._update_error_rate(0.0)
+
+    def record_abandoned(self, elapsed: float):
+        """
+        The request was cancelled before it finished (e.g. it lost a hedge). The elapsed time is
+        a lower bound of its latency; it is recorded, so a slow endpoint does not keep its good p50.
+        """
+        self.total_calls += 1
+        self._latencies.append(elapsed)
+
+    def record_error(self, latency: Optional[float] = None):
+        self.total_calls += 1
+        self.total_errors += 1
+        if latency is not None:
+            self._latencies.append(latency)
+        self.consecutive_errors += 1
+        self.last_error_ts = self._clock()
+        self._update_error_rate(1.0)
+
+    @property
+    def error_rate(self) -> float:
+        if not self._error_rate:
+            return 0.0
+        age = self._clock() - self._error_rate_ts
+        return self._error_rate * 0.5 ** (age / self.ERROR_HALF_LIFE)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self._latencies:
+            return None
+        values = sorted(self._latencies)
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    @property
+    def p50(self) -> Optional[float]:
+        return self.quantile(0.5)
+
+    @property
+    def p95(self) -> Optional[float]:
+        return self.quantile(0.95)
+
+    @property
+    def in_cooldown(self) -> bool:
+        if not self.consecutive_errors:
+            return False
+        cooldown = min(self.MAX_COOLDOWN, self.COOLDOWN_PER_ERROR * self.consecutive_errors)
+        return self._clock() - self.last_error_ts < cooldown
+
+    @property
+    def score(self) -> float:
+        """
+        Expected cost of a request, lower is better: the typical latency inflated by the error rate.
+        Endpoints in cooldown after consecutive failures go last.
+        """
+        latency = self.p50
+        if latency is None:
+            latency = self.UNKNOWN_LATENCY
+        cost = latency * (1.0 + 10.0 * self.error_rate) + self.error_rate
+        if self.in_cooldown:
+            cost += 1000.0
+        return cost
+
+    def __repr__(self):
+        p50, p95 = self.p50, self.p95
+        p50 = f'{p50:.3f}' if p50 is not None else '?'
+        p95 = f'{p95:.3f}' if p95 is not None else '?'
+        return (f'EndpointHealth(p50={p50}, p95={p95}, error_rate={self.error_rate:.2f}, '
+                f'errors={self.total_errors}/{self.total_calls})')
@@ -0,0 +1,143 @@
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any
+
+import ujson
+
+
+class HeightResponseCache:
+    """
+    Persistent cache of THORNode responses pinned to a block height: they never change.
+    Values are zlib-compressed JSON in a single SQLite file; the most recent ones are also kept decoded
+    in memory (LRU). The file is limited to `max_bytes`: when it grows beyond, the least recently
+    written entries are deleted.
+    SQLite calls are synchronous; in WAL mode a point read or a small write takes well under a millisecond.
+    """
+
+    DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+    DEFAULT_MEMORY_ITEMS = 256
+    TRIM_EVERY = 100  # writes
+    TRIM_TO = 0.9  # of max_bytes
+
+    def __init__(self, path: str, max_bytes=DEFAULT_MAX_BYTES, memory_items=DEFAULT_MEMORY_ITEMS,
+                 compress_level=6, logger=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.compress_level = compress_level
+        self.logger = logger or logging.getLogger(self.__class__.__name__)
+
+        self._memory = OrderedDict()
+        self._writes_since_trim = 0
+        self._total_bytes = 0
+
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.errors = 0
+
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, ts REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS responses_ts ON responses (ts)')
+        self._total_bytes = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    @staticmethod
+    def make_key(path: str, height: int, *extra) -> str:
+        return ':'.join(str(p) for p in (height, path, *extra))
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str, default=None) -> Any:
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits_memory += 1
+            return self._memory[key]
+
+        try:
+            row = self._db.execute('SELECT value FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            value = ujson.loads(zlib.decompress(row[0]))
+        except (sqlite3.Error, zlib.error, ValueError) as e:
+            self.errors += 1
+            self.logger.warning(f'Failed to read {key!r} from the height cache: {e!r}')
+            return default
+
+        self.hits_disk += 1
+        self._remember(key, value)
+        return value
+
+    def put(self, key: str, value):
+        try:
+            blob = zlib.compress(ujson.dumps(value).encode(), self.compress_level)
+            old = self._db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self._db.execute('INSERT OR REPLACE INTO responses (key, value, size, ts) VALUES (?, ?, ?, ?)',
+                             (key, blob, len(blob), time.time()))
+        except (sqlite3.Error, TypeError, ValueError, OverflowError) as e:
+            self.errors += 1
+            self.logger.warning(f'Failed to save {key!r} to the height cache: {e!r}')
+            return
+
+        self._total_bytes += len(blob) - (old[0] if old else 0)
+        self._remember(key, value)
+
+        self._writes_since_trim += 1
+        if self._writes_since_trim >= self.TRIM_EVERY or self._total_bytes > self.max_bytes:
+            self._writes_since_trim = 0
+            self.trim()
+
+    def trim(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        target = int(self.max_bytes * self.TRIM_TO)
+        to_free = self._total_bytes - target
+        freed, deleted = 0, []
+        for key, size in self._db.execute('SELECT key, size FROM responses ORDER BY ts'):
+            if freed >= to_free:
+                break
+            freed += size
+            deleted.append((key,))
+        self._db.executemany('DELETE FROM responses WHERE key = ?', deleted)
+        for (key,) in deleted:
+            self._memory.pop(key, None)
+        self._total_bytes -= freed
+        self.logger.info(f'Height cache trimmed: {len(deleted)} entries, {freed} bytes')
+
+    @property
+    def hits(self):
+        return self.hits_memory + self.hits_disk
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+    def __repr__(self):
+        return (f'HeightResponseCache({self.path!r}, {self._total_bytes} bytes, '
+                f'hits={self.hits_memory}+{self.hits_disk}, misses={self.misses}, errors={self.errors})')
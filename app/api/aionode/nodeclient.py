@@ -6,6 +6,7 @@ from aiohttp import ClientSession, ClientTimeout
 from aiohttp.helpers import sentinel
 
 from api.aionode.env import ThorEnvironment
+from api.aionode.health import EndpointHealth
 
 
 class ThorNodeClient:
@@ -17,6 +18,7 @@ class ThorNodeClient:
         self.logger = logger or logging.getLogger(self.__class__.__name__)
         self.extra_headers = extra_headers
         self.env = env
+        self.health = EndpointHealth()
 
     async def request(self, path, is_rpc=False, height: Optional[int] = None) -> Dict:
         url = self.connection_url(path, is_rpc)
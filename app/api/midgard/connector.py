@@ -2,6 +2,7 @@ from typing import Union, Optional, List
 
 import aiohttp
 
+from api.aionode.coalesce import SingleFlight
 from api.aionode.nodeclient import ThorNodeClient
 from api.aionode.types import ThorPool
 from api.midgard.parser import MidgardParserV2, TxParseResult
@@ -32,6 +33,7 @@ class MidgardConnector(WithLogger):
         self.session = session or aiohttp.ClientSession()
         self.urlgen = free_url_gen
         self.parser = MidgardParserV2(network_id)
+        self._single_flight = SingleFlight()  # identical concurrent requests share one HTTP call
 
     @property
     def public_url(self):
@@ -74,7 +76,9 @@ class MidgardConnector(WithLogger):
 
     # noinspection PyTypeChecker
     async def request(self, path: str) -> Union[str, dict, list]:
-        result = await self._request_json_from_midgard_by_ip(self.public_url, path)
+        result = await self._single_flight.do(
+            path, lambda: self._request_json_from_midgard_by_ip(self.public_url, path)
+        )
         if isinstance(result, str) and result != self.ERROR_NOT_FOUND:
             self.logger.error(f'Probably there is an issue. Midgard has returned a plain string: {result!r} '
                               f'for the path {path!r}')
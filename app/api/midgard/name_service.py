@@ -3,15 +3,18 @@ import json
 import os
 import struct
 from contextlib import suppress
-from typing import Optional, List, Iterable, Dict, NamedTuple
+from functools import partial
+from typing import Optional, List, Iterable, Dict, NamedTuple, Callable, Awaitable, Any
 
 import yaml
 
+from api.aionode.coalesce import SingleFlight
 from lib.config import Config
 from lib.constants import Chains
 from lib.date_utils import parse_timespan_to_seconds
 from lib.db import DB
 from lib.logs import WithLogger
+from lib.lru import TTLCache
 from lib.texts import shorten_text
 from models.memo import THORMemo
 from models.name import ThorName, make_virtual_thor_name, ThorNameAlias
@@ -54,6 +57,8 @@ class NameMap(NamedTuple):
 # Here we basically don't care about owners of ThorNames.
 # We must have API for Address -> ThorName, and ThorName -> [Address] resolution
 class NameService(WithLogger):
+    DEFAULT_MAX_CONCURRENT_REQUESTS = 8
+
     def __init__(self, db: DB, cfg: Config, midgard: MidgardConnector, node_cache):
         super().__init__()
         self.db = db
@@ -69,6 +74,11 @@ class NameService(WithLogger):
         if self._thorname_enabled:
             self.logger.info(f'ThorName is enabled with expire time of {self._thorname_expire} sec.')
 
+        self._api_semaphore = asyncio.Semaphore(
+            cfg.as_int('names.thorname.max_concurrent_requests', self.DEFAULT_MAX_CONCURRENT_REQUESTS)
+        )
+        self._api_single_flight = SingleFlight()
+
         self.aff_man = AffiliateManager()
 
     @property
@@ -121,42 +131,90 @@ class NameService(WithLogger):
         if not address:
             return None
 
-        local_results = self._cache.lookup_name_by_address_local(address)
-        if local_results:
-            return local_results
+        return (await self.lookup_multiple_names_by_addresses([address])).get(address)
 
-        if not self._thorname_enabled:
-            return None
-
-        names = await self._cache.load_name_list(address)
-        if names is None:
-            names = await self._api.thorname_reversed_lookup(address)
-            await self._cache.save_name_list(address, names)
-
-        if not names:
-            return None
+    async def lookup_multiple_names_by_addresses(self, addresses: Iterable) -> Dict[str, Optional[ThorName]]:
+        """
+        Resolves many addresses at once: one MGET for their name lists, one MGET for the ThorNames,
+        and Midgard requests only for the entries that are neither in the local nor in the Redis cache.
+        """
+        results = {}
+        unresolved = []
+        for address in dict.fromkeys(addresses):
+            results[address] = self._cache.lookup_name_by_address_local(address) if address else None
+            if address and not results[address]:
+                unresolved.append(address)
+
+        if not unresolved or not self._thorname_enabled:
+            return results
 
-        if names == self._cache.NO_VALUE:
-            return None
+        name_lists = await self._cache.load_name_lists(unresolved)
+        missing = [address for address in unresolved if name_lists.get(address) is None]
+        if missing:
+            fetched = await asyncio.gather(*[
+                self._call_api_once(f'rlookup:{address}', partial(self._api.thorname_reversed_lookup, address))
+                for address in missing
+            ])
+            fetched = dict(zip(missing, fetched))
+            await self._cache.save_name_lists(fetched)
+            name_lists.update(fetched)
+
+        name_of_address = {}
+        for address in unresolved:
+            names = name_lists.get(address)
+            if not names or names == self._cache.NO_VALUE:
+                continue
 
-        # todo: find a ThorName locally or pick any of this list
-        name = names[0]
-        if len(names) > 1:
-            self.logger.warning(f'Address {address} resolves to more than 1 ThorNames: "{names}". '
-                                f'I will take the first one "{name}"')
+            # todo: find a ThorName locally or pick any of this list
+            name = names[0]
+            if len(names) > 1:
+                self.logger.warning(f'Address {address} resolves to more than 1 ThorNames: "{names}". '
+                                    f'I will take the first one "{name}"')
+            name_of_address[address] = name.strip()
+
+        thorname_by_name = await self.lookup_thornames_by_names(name_of_address.values())
+        for address, name in name_of_address.items():
+            results[address] = thorname_by_name.get(name)
+        return results
+
+    async def lookup_thornames_by_names(self, names: Iterable[str]) -> Dict[str, Optional[ThorName]]:
+        results = {}
+        unresolved = []
+        for name in dict.fromkeys(name.strip() for name in names if name):
+            if known_name := self._cache.lookup_name_by_address_local(name):
+                results[name] = known_name
+            else:
+                unresolved.append(name)
 
-        thorname = await self.lookup_thorname_by_name(name)
-        return None if thorname == self._cache.NO_VALUE else thorname
+        if not unresolved or not self._thorname_enabled:
+            return results
 
-    async def lookup_multiple_names_by_addresses(self, addresses: Iterable) -> Dict[str, ThorName]:
-        if not addresses:
-            return {}
+        thorname_by_name = await self._cache.load_thor_names(unresolved)
+        missing = [name for name in unresolved if not thorname_by_name.get(name)]
+        if missing:
+            fetched = await asyncio.gather(*[
+                self._call_api_once(f'lookup:{name}', partial(self._api.thorname_lookup, name))
+                for name in missing
+            ])
+            fetched = dict(zip(missing, fetched))
+            await self._cache.save_thor_names(fetched)  # save anyway, even if there is no registered ThorName!
+            thorname_by_name.update(fetched)
+
+        for name in unresolved:
+            thorname = thorname_by_name.get(name)
+            results[name] = None if thorname == self._cache.NO_VALUE else thorname
+        return results
+
+    async def _call_api_once(self, key: str, request: Callable[[], Awaitable[Any]]):
+        """
+        Concurrent callers asking for the same key share one Midgard request;
+        no more than `max_concurrent_requests` requests run at a time.
+        """
+        async def limited_request():
+            async with self._api_semaphore:
+                return await request()
 
-        thor_names = await asyncio.gather(
-            *[self.lookup_name_by_address(address) for address in addresses]
-        )
-        entries = [(address, thor_name) for address, thor_name in zip(addresses, thor_names)]
-        return dict(entries)
+        return await self._api_single_flight.do(key, limited_request)
 
     async def lookup_thorname_by_name(self, name: str, forced=False) -> Optional[ThorName]:
         name = name.strip()
@@ -187,10 +245,16 @@ class NameService(WithLogger):
     def get_local_service(self, user_id):
         return LocalWalletNameDB(self.db, user_id)
 
+    async def get_local_name_maps(self, user_ids: Iterable) -> Dict[str, NameMap]:
+        return await LocalWalletNameDB.get_name_maps(self.db, user_ids)
+
     @staticmethod
     def enrich_name_map_with_nodes(name_map: NameMap, addresses: Iterable, nodes):
         if not nodes:
-            return
+            return name_map
+
+        if addresses is not None:
+            addresses = set(addresses)
 
         for node in nodes:
             for bp in node.bond_providers:
@@ -208,6 +272,9 @@ class NameService(WithLogger):
 
 
 class THORNameCache:
+    DEFAULT_LOCAL_MAX_ITEMS = 20_000
+    DEFAULT_LOCAL_TTL = '10m'
+
     def __init__(self, db: DB, cfg: Config):
         self.db = db
         self.cfg = cfg
@@ -217,6 +284,12 @@ class THORNameCache:
 
         self.thorname_expire = int(parse_timespan_to_seconds(cfg.as_str('names.thorname.expire', '24h'))) or None
 
+        # Redis key -> decoded value, including the negative results ([] and NO_VALUE)
+        self._local = TTLCache(
+            cfg.as_int('names.thorname.local_cache.max_items', self.DEFAULT_LOCAL_MAX_ITEMS),
+            cfg.as_interval('names.thorname.local_cache.ttl', self.DEFAULT_LOCAL_TTL),
+        )
+
         self._load_preconfigured_names()
 
     def lookup_name_by_address_local(self, address: str) -> Optional[ThorName]:
@@ -239,27 +312,55 @@ class THORNameCache:
 
     async def save_name_list(self, address: str, names: List[str], expiring: bool = True):
         ex = self.thorname_expire if expiring else None
-        await self.db.redis.set(self._key_address_to_names(address),
-                                value=json.dumps(names),
-                                ex=ex)
+        key = self._key_address_to_names(address)
+        await self.db.redis.set(key, value=json.dumps(names), ex=ex)
+        self._local.set(key, names)
 
-    async def load_name_list(self, address: str) -> List[str]:
-        data = await self.db.redis.get(self._key_address_to_names(address))
+    async def save_name_lists(self, names_by_address: Dict[str, List[str]], expiring: bool = True):
+        if not names_by_address:
+            return
+
+        ex = self.thorname_expire if expiring else None
+        async with self.db.redis.pipeline(transaction=False) as pipe:
+            for address, names in names_by_address.items():
+                pipe.set(self._key_address_to_names(address), json.dumps(names), ex=ex)
+            await pipe.execute()
+
+        for address, names in names_by_address.items():
+            self._local.set(self._key_address_to_names(address), names)
+
+    @staticmethod
+    def _decode_name_list(data) -> Optional[List[str]]:
         return json.loads(data) if data else None
 
+    async def load_name_list(self, address: str) -> List[str]:
+        return (await self.load_name_lists([address])).get(address)
+
+    async def load_name_lists(self, addresses: List[str]) -> Dict[str, Optional[List[str]]]:
+        return await self._load_many({a: self._key_address_to_names(a) for a in addresses}, self._decode_name_list)
+
     NO_VALUE = 'no_value'
 
     async def save_thor_name(self, name, thorname: ThorName, expiring: bool = True):
         if not name:
             return
 
+        await self.save_thor_names({name: thorname}, expiring)
+
+    async def save_thor_names(self, thorname_by_name: Dict[str, Optional[ThorName]], expiring: bool = True):
+        thorname_by_name = {name: thorname for name, thorname in thorname_by_name.items() if name}
+        if not thorname_by_name:
+            return
+
         ex = self.thorname_expire if expiring else None
-        value = thorname.to_dict() if thorname else self.NO_VALUE
-        await self.db.redis.set(
-            self._key_thorname_to_addresses(name),
-            value=value,
-            ex=ex
-        )
+        async with self.db.redis.pipeline(transaction=False) as pipe:
+            for name, thorname in thorname_by_name.items():
+                value = thorname.to_dict() if thorname else self.NO_VALUE
+                pipe.set(self._key_thorname_to_addresses(name), value, ex=ex)
+            await pipe.execute()
+
+        for name, thorname in thorname_by_name.items():
+            self._local.set(self._key_thorname_to_addresses(name), thorname or self.NO_VALUE)
 
     async def save_custom_name(self, name, address: str, expiring: bool = True):
         if not name:
@@ -267,11 +368,7 @@ class THORNameCache:
 
         await self.save_thor_name(name, make_virtual_thor_name(address, name), expiring=expiring)
 
-    async def load_thor_name(self, name: str) -> Optional[ThorName]:
-        if not name:
-            return None
-
-        data = await self.db.redis.get(self._key_thorname_to_addresses(name))
+    def _decode_thor_name(self, data):
         if not data:
             return None
 
@@ -283,11 +380,46 @@ class THORNameCache:
         except (TypeError, struct.error):
             return None
 
+    async def load_thor_name(self, name: str) -> Optional[ThorName]:
+        if not name:
+            return None
+
+        return (await self.load_thor_names([name])).get(name)
+
+    async def load_thor_names(self, names: List[str]) -> Dict[str, Optional[ThorName]]:
+        return await self._load_many({n: self._key_thorname_to_addresses(n) for n in names}, self._decode_thor_name)
+
+    async def _load_many(self, keys: Dict[str, str], decode) -> Dict[str, Any]:
+        """
+        keys: item -> Redis key. Looks in the local cache first, then reads the rest with one MGET.
+        Items found nowhere are mapped to None.
+        """
+        results, missing = {}, []
+        for item, key in keys.items():
+            value = self._local.get(key)
+            if value is None:
+                missing.append(item)
+            else:
+                results[item] = value
+
+        if missing:
+            raw_values = await self.db.redis.mget([keys[item] for item in missing])
+            for item, data in zip(missing, raw_values):
+                results[item] = value = decode(data)
+                if value is not None:
+                    self._local.set(keys[item], value)
+
+        return results
+
     async def clear_cache_for_name(self, name: str):
-        await self.db.redis.delete(self._key_thorname_to_addresses(name))
+        key = self._key_thorname_to_addresses(name)
+        self._local.pop(key)
+        await self.db.redis.delete(key)
 
     async def clear_cache_for_address(self, address: str):
-        await self.db.redis.delete(self._key_address_to_names(address))
+        key = self._key_address_to_names(address)
+        self._local.pop(key)
+        await self.db.redis.delete(key)
 
 
 class THORNameAPIClient:
@@ -339,9 +471,13 @@ class LocalWalletNameDB:
         self.db = db
         self.user_id = user_id
 
+    @staticmethod
+    def key(user_id):
+        return f'THORName:Local:{user_id}'
+
     @property
     def db_key(self):
-        return f'THORName:Local:{self.user_id}'
+        return self.key(self.user_id)
 
     async def get_wallet_local_name(self, address: str) -> Optional[str]:
         if not address or not self.user_id:
@@ -362,7 +498,26 @@ class LocalWalletNameDB:
         return await self.db.redis.hgetall(self.db_key)
 
     async def get_name_map(self) -> Optional[NameMap]:
-        all_names = await self.get_all_for_user()
+        return self._to_name_map(await self.get_all_for_user())
+
+    @classmethod
+    async def get_name_maps(cls, db: DB, user_ids: Iterable) -> Dict[str, NameMap]:
+        """
+        Local name maps of many users at once (one pipelined HGETALL per user).
+        """
+        user_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id]
+        if not user_ids:
+            return {}
+
+        async with db.redis.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.hgetall(cls.key(user_id))
+            results = await pipe.execute()
+
+        return {user_id: cls._to_name_map(all_names) for user_id, all_names in zip(user_ids, results)}
+
+    @staticmethod
+    def _to_name_map(all_names) -> NameMap:
         if not all_names:
             return NameMap.empty()
 
@@ -28,7 +28,6 @@ from notify.public.node_churn_notify import NodeChurnNotifier
 from notify.public.price_notify import PriceChangeNotifier
 from notify.public.stats_notify import NetworkStatsNotifier
 from .base import BaseDialog, message_handler, query_handler
-from ..picture.pools_picture import PoolPictureGenerator
 
 
 class MetricsStates(StatesGroup):
@@ -327,8 +326,7 @@ class MetricsDialog(BaseDialog):
             return
 
         text = self.loc.notification_text_best_pools(event_pools)
-        generator = PoolPictureGenerator(self.loc, event_pools)
-        pic, pic_name = await generator.get_picture()
+        pic, pic_name = await self.deps.alert_presenter.render_best_pools(self.loc, event_pools)
         await message.answer_photo(img_to_bio(pic, pic_name), caption=text, disable_notification=True)
 
     async def show_pol_state(self, message: Message):
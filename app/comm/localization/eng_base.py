@@ -71,6 +71,12 @@ class BaseLocalization(ABC):  # == English
         self.ach = AchievementsEnglishLocalization()
         self.mimir_rules = None
 
+    def __getstate__(self):
+        # pictures may be rendered in another process (see RenderPool); the name service is bound to the DB
+        state = self.__dict__.copy()
+        state['name_service'] = None
+        return state
+
     # ----- WELCOME ------
 
     TEXT_DECORATION_ENABLED = True
@@ -1,3 +1,5 @@
+from typing import Dict, Iterable
+
 from lib.config import Config
 from lib.db import DB
 from lib.utils import Singleton
@@ -50,6 +52,14 @@ class LocalizationManager(metaclass=Singleton):
         lang = await self.get_lang(chat_id, db)
         return self.get_from_lang(lang)
 
+    async def get_from_db_many(self, chat_ids: Iterable, db: DB) -> Dict[str, BaseLocalization]:
+        chat_ids = list(chat_ids)
+        if not chat_ids:
+            return {}
+        redis = await db.get_redis()
+        langs = await redis.mget([self.lang_key(chat_id) for chat_id in chat_ids])
+        return {chat_id: self.get_from_lang(lang) for chat_id, lang in zip(chat_ids, langs)}
+
     def set_mimir_rules(self, rules):
         for loc in self._langs.values():
             loc: BaseLocalization
@@ -1,10 +1,11 @@
 import abc
 import math
-from typing import Tuple, NamedTuple, List, Optional
+from typing import Tuple, NamedTuple, List, Optional, Union
 
 import PIL.Image
 
 from comm.localization.manager import BaseLocalization
+from comm.picture.render_pool import RenderPool, RenderSpec
 from lib.date_utils import today_str
 from lib.draw_utils import TC_WHITE, font_estimate_size, result_color
 from lib.logs import WithLogger
@@ -12,7 +13,8 @@ from lib.money import calc_percent_change, short_money
 from lib.texts import bracketify
 from lib.utils import async_wrap
 
-PictureAndName = Tuple[Optional[PIL.Image.Image], str]
+# the picture is PNG bytes when it was rendered in the RenderPool
+PictureAndName = Tuple[Optional[Union[PIL.Image.Image, bytes]], str]
 
 
 class BasePictureGenerator(WithLogger, abc.ABC):
@@ -31,7 +33,11 @@ class BasePictureGenerator(WithLogger, abc.ABC):
         try:
             self.logger.info('Started building a picture...')
             await self.prepare()
-            pic = await self._get_picture_sync()
+            render_pool = RenderPool()
+            if render_pool.enabled:
+                pic = await render_pool.render(RenderSpec.for_generator(self))
+            else:
+                pic = await self._get_picture_sync()
             return pic, self.generate_picture_filename()
         except Exception:
             self.logger.exception('An error occurred when generating a picture!', exc_info=True)
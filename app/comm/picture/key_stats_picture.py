@@ -1,7 +1,7 @@
 import asyncio
 from datetime import timedelta
 
-from PIL import Image, ImageDraw
+from PIL import ImageDraw
 
 from comm.localization.manager import BaseLocalization
 from comm.picture.common import BasePictureGenerator
@@ -28,7 +28,6 @@ class KeyStatsPictureGenerator(BasePictureGenerator):
 
     def __init__(self, loc: BaseLocalization, event: AlertKeyStats):
         super().__init__(loc)
-        self.bg = Image.open(self.BG_FILE)
         self.event = event
         self.logos = {}
         self.r = Resources()
@@ -36,6 +35,10 @@ class KeyStatsPictureGenerator(BasePictureGenerator):
         self.eth_logo = None
         self.usdt_logo = self.usdc_logo = self.busd_logo = self.rune_logo = None
 
+    @property
+    def bg(self):
+        return self.r.image(self.BG_FILE)
+
     FILENAME_PREFIX = 'thorchain_weekly_stats'
 
     async def prepare(self):
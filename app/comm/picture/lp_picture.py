@@ -6,6 +6,7 @@ from typing import List
 from PIL import ImageDraw
 
 from comm.localization.manager import BaseLocalization
+from comm.picture.render_pool import RenderPool, RenderSpec
 from comm.picture.resources import Resources
 from lib.constants import RUNE_SYMBOL
 from lib.draw_utils import CATEGORICAL_PALETTE, pos_percent, result_color, hor_line, LIGHT_TEXT_COLOR, \
@@ -348,6 +349,12 @@ def _generate_lp_pool_picture(price_holder: PriceHolder,
 
 async def lp_address_summary_picture(reports: List[LiquidityPoolReport], weekly_charts,
                                      loc: BaseLocalization, value_hidden=False):
+    render_pool = RenderPool()
+    if render_pool.enabled:
+        return await render_pool.render(RenderSpec(
+            sync_lp_address_summary_picture, (reports, weekly_charts, loc, value_hidden),
+            name='lp_address_summary'
+        ))
     return await sync_lp_address_summary_picture(reports, weekly_charts, loc, value_hidden)
 
 
@@ -1,4 +1,4 @@
-from PIL import Image, ImageDraw
+from PIL import ImageDraw
 
 from comm.localization.eng_base import BaseLocalization
 from comm.picture.common import BasePictureGenerator
@@ -18,12 +18,15 @@ class PoolPictureGenerator(BasePictureGenerator):
 
     def __init__(self, loc: BaseLocalization, event: EventPools):
         super().__init__(loc)
-        self.bg = Image.open(self.BG_FILE)
         self.event = event
         self.logos = {}
         self.chain_logos = {}
         self.r = Resources()
 
+    @property
+    def bg(self):
+        return self.r.image(self.BG_FILE)
+
     FILENAME_PREFIX = 'thorchain_pools'
 
     async def prepare(self):
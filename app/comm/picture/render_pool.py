@@ -0,0 +1,200 @@
+import asyncio
+import multiprocessing
+import pickle
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Callable, Dict, Optional, Tuple
+
+from comm.picture.resources import Resources
+from lib.logs import WithLogger
+from lib.utils import Singleton
+
+
+class RenderError(Exception):
+    """
+    The picture function itself failed. Anything else raised by the pool is a transport problem.
+    """
+
+
+def encode_png(image) -> Optional[bytes]:
+    if image is None or isinstance(image, bytes):
+        return image
+    if isinstance(image, BytesIO):
+        return image.getvalue()
+    bio = BytesIO()
+    image.save(bio, 'PNG')
+    return bio.getvalue()
+
+
+@dataclass
+class RenderSpec:
+    """
+    A picklable description of one picture: a module-level function (or a method looked up on the class)
+    and its arguments. Functions decorated with @async_wrap are unwrapped and called synchronously.
+    """
+    func: Callable
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+    name: str = ''
+
+    @classmethod
+    def for_generator(cls, generator):
+        # noinspection PyProtectedMember
+        return cls(type(generator)._get_picture_sync, (generator,), name=generator.__class__.__name__)
+
+    @property
+    def title(self):
+        return self.name or getattr(self.func, '__qualname__', str(self.func))
+
+    def render(self):
+        func = getattr(self.func, '__wrapped__', self.func)
+        return func(*self.args, **self.kwargs)
+
+
+@dataclass
+class RenderStats:
+    count: int = 0
+    errors: int = 0
+    total_render: float = 0.0
+    max_render: float = 0.0
+    total_wait: float = 0.0
+
+    def add(self, render_time: float, wait_time: float):
+        self.count += 1
+        self.total_render += render_time
+        self.max_render = max(self.max_render, render_time)
+        self.total_wait += wait_time
+
+    @property
+    def avg_render(self):
+        return self.total_render / self.count if self.count else 0.0
+
+    @property
+    def avg_wait(self):
+        return self.total_wait / self.count if self.count else 0.0
+
+
+def _init_worker(font_sizes):
+    # the parent process handles Ctrl-C and shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    r = Resources()
+    for size in font_sizes:
+        r.fonts.get_font(size)
+        r.fonts.get_font_bold(size)
+    for image in (r.hidden_img, r.bg_image, r.tc_logo, r.tc_logo_transparent):
+        image.load()
+    for path in Resources.PRELOAD_IMAGES:
+        r.image(path)
+
+
+def _render_in_worker(spec: RenderSpec) -> Tuple[Optional[bytes], float]:
+    t0 = time.perf_counter()
+    try:
+        data = encode_png(spec.render())
+    except Exception as e:
+        raise RenderError(f'{spec.title}: {e!r}') from e
+    return data, time.perf_counter() - t0
+
+
+class RenderPool(WithLogger, metaclass=Singleton):
+    """
+    Optional process pool for the PIL pictures. Drawing, text layout and PNG encoding hold the GIL,
+    so rendering them in the main process competes with the event loop.
+    Every worker loads the fonts and images once (Resources, FontCache) and returns encoded PNG bytes.
+    When it is not started, pictures are rendered in the default thread pool like before.
+    """
+
+    DEFAULT_START_METHOD = 'spawn'
+    DEFAULT_FONT_SIZES = (24, 28, 30, 34, 40, 48)
+
+    def __init__(self):
+        super().__init__()
+        self.workers = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._start_method = self.DEFAULT_START_METHOD
+        self._font_sizes = self.DEFAULT_FONT_SIZES
+        self.pending = 0
+        self.stats: Dict[str, RenderStats] = {}
+
+    @property
+    def enabled(self):
+        return self._executor is not None
+
+    @property
+    def queue_depth(self):
+        return max(0, self.pending - self.workers)
+
+    def start(self, workers: int, start_method=DEFAULT_START_METHOD, font_sizes=DEFAULT_FONT_SIZES):
+        self.stop()
+        if workers <= 0:
+            return
+        self.workers = workers
+        self._start_method = start_method
+        self._font_sizes = tuple(font_sizes)
+        self._executor = self._make_executor()
+        self.logger.info(f'Render pool started: {workers} workers ({start_method}).')
+
+    def _make_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(self._start_method),
+            initializer=_init_worker,
+            initargs=(self._font_sizes,),
+        )
+
+    def stop(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self.workers = 0
+
+    async def _render_in_thread(self, spec: RenderSpec):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, _render_in_worker, spec)
+
+    async def render(self, spec: RenderSpec) -> Optional[bytes]:
+        """
+        Renders the picture and returns it as PNG bytes.
+        Falls back to the thread pool if the spec can't be sent to a worker or the pool is broken.
+        """
+        loop = asyncio.get_running_loop()
+        stats = self.stats.setdefault(spec.title, RenderStats())
+        self.pending += 1
+        t0 = time.perf_counter()
+        try:
+            if self._executor is None:
+                data, render_time = await self._render_in_thread(spec)
+            else:
+                try:
+                    data, render_time = await loop.run_in_executor(self._executor, _render_in_worker, spec)
+                except BrokenProcessPool:
+                    self.logger.error('Render pool is broken; restarting it.')
+                    self._executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = self._make_executor()
+                    data, render_time = await self._render_in_thread(spec)
+                except (pickle.PicklingError, TypeError, AttributeError) as e:
+                    self.logger.warning(f'Could not render {spec.title} in the pool ({e!r}); using a thread.')
+                    data, render_time = await self._render_in_thread(spec)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            self.pending -= 1
+
+        elapsed = time.perf_counter() - t0
+        stats.add(render_time, max(0.0, elapsed - render_time))
+        self.logger.debug(f'Rendered {spec.title} in {render_time:.3f}s, '
+                          f'waited {elapsed - render_time:.3f}s, queue depth {self.queue_depth}.')
+        return data
+
+    def summary(self) -> str:
+        lines = [f'Render pool: {self.workers} workers, {self.pending} pending, queue depth {self.queue_depth}']
+        for title, s in sorted(self.stats.items()):
+            lines.append(f'{title}: {s.count} done, {s.errors} errors, '
+                         f'render avg {s.avg_render:.3f}s max {s.max_render:.3f}s, wait avg {s.avg_wait:.3f}s')
+        return '\n'.join(lines)
@@ -27,6 +27,10 @@ class FontCache(metaclass=Singleton):
             f = self._cache[key] = ImageFont.truetype(font_path, size)
         return f
 
+    def __reduce__(self):
+        # when sent to a render worker, it becomes the worker's own cache
+        return FontCache, (self._base_dir,)
+
     def get_font_bold(self, size: int):
         return self.get_font(size, self.FONT_BOLD)
 
@@ -51,6 +55,12 @@ class Resources(metaclass=Singleton):
     CUSTOM_FONT_RUNIC_BW = f'{BASE}/achievement/numbers_runic_bw'
     CUSTOM_FONT_BALLOON = f'{BASE}/achievement/numbers_balloon'
 
+    # big backgrounds that the render workers decode once, see image()
+    PRELOAD_IMAGES = (
+        f'{BASE}/pools_bg.png',
+        f'{BASE}/key_weekly_stats_bg.png',
+    )
+
     def __init__(self) -> None:
         self.fonts = FontCache(self.BASE)
         self.hidden_img = Image.open(self.HIDDEN_IMG)
@@ -74,6 +84,22 @@ class Resources(metaclass=Singleton):
         self.custom_font_runic_bw = SpriteFont(self.CUSTOM_FONT_RUNIC_BW, filename_prefix='bw_')
         self.custom_font_balloon = SpriteFont(self.CUSTOM_FONT_BALLOON, available_symbols=string.digits)
 
+        self._images = {}
+
+    def __reduce__(self):
+        # Resources are never pickled with a picture spec, a render worker uses its own preloaded instance
+        return Resources, ()
+
+    def image(self, path):
+        """
+        Loaded image, cached for the lifetime of the process. Do not draw on it, make a copy.
+        """
+        image = self._images.get(path)
+        if image is None:
+            image = self._images[path] = Image.open(path)
+            image.load()
+        return image
+
     def put_hidden_plate(self, image, position, anchor='left', ey=-3):
         x, y = position
         if anchor == 'right':
@@ -1,12 +1,14 @@
+import asyncio
 import json
 from contextlib import suppress
 from json import JSONDecodeError
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterable
 
 from redis.asyncio import Redis
 from tqdm import tqdm
 
 from jobs.fetch.cached.base import CachedDataSource
+from jobs.fetch.cached.pool_history import PoolHistoryStore
 from lib.constants import THOR_BLOCK_TIME
 from lib.date_utils import parse_timespan_to_seconds, DAY
 from lib.depcont import DepContainer
@@ -27,6 +29,14 @@ class PoolCache(CachedDataSource[PriceHolder]):
         self.pool_cache_max_age = parse_timespan_to_seconds(deps.cfg.price.pool_cache_max_age)
         assert self.pool_cache_max_age > 0
 
+        self.history = PoolHistoryStore(
+            deps.db,
+            bucket_size=deps.cfg.as_int('price.pool_history.bucket_size', PoolHistoryStore.DEFAULT_BUCKET_SIZE),
+            flush_every=deps.cfg.as_int('price.pool_history.flush_every', PoolHistoryStore.DEFAULT_FLUSH_EVERY),
+        )
+        # heights copied from the legacy hash; they are deleted there only after the history is flushed
+        self._legacy_migrated = set()
+
     async def get_usd_per_rune(self) -> float:
         ph = await self.deps.pool_cache.get()
         if not ph or not ph.usd_per_rune:
@@ -79,6 +89,36 @@ class PoolCache(CachedDataSource[PriceHolder]):
             pool_map = await self._fetch_pool_data_from_thornode(height)
         return pool_map
 
+    async def load_pools_many(self, heights: Iterable[int], pools: Optional[Iterable[str]] = None) \
+            -> Dict[int, PoolInfoMap]:
+        """
+        Historical pool states for many heights. The stored ones are read in one go (per height bucket),
+        the rest is fetched from THORNode and saved.
+        If `pools` is given, only those pools are returned.
+        """
+        heights = list(set(heights))
+        pools = list(pools) if pools is not None else None
+        results = await self.history.load_many(heights, pools)
+
+        async def fetch_missing(height):
+            pool_map = await self.load_pools(height, caching=True)
+            if pools is not None:
+                pool_map = {p: pool_map[p] for p in pools if p in pool_map}
+            results[height] = pool_map
+
+        missing = [h for h in heights if h not in results]
+        if missing:
+            await asyncio.gather(*[fetch_missing(h) for h in missing])
+        return results
+
+    async def load_pool_history(self, pool: str, height_from: int, height_to: int,
+                                fields: Iterable[str] = ('balance_rune', 'balance_asset')):
+        """
+        Stored values of the pool's fields in the height range, e.g. BTC depth from A to B.
+        It does not fetch anything from THORNode.
+        """
+        return await self.history.load_range(pool, height_from, height_to, fields)
+
     async def _fetch_pool_data_from_thornode(self, height=None) -> PoolInfoMap:
         try:
             thor_pools = await self.deps.thor_connector.query_pools(height)
@@ -118,38 +158,44 @@ class PoolCache(CachedDataSource[PriceHolder]):
                 self.logger.warning(f'Pool map is empty for block #{block_no}. Skipping...')
             return pool_map
 
-        tasks = [load_for_block(block_no) for block_no in block_heights]
+        stored = {} if forced else await self.history.load_many(block_heights)
+        missing = [block_no for block_no in block_heights if block_no not in stored]
+        self.logger.info(f'{len(stored)} of {len(block_heights)} heights are already stored.')
 
-        results = await parallel_run_in_groups(
+        tasks = [load_for_block(block_no) for block_no in missing]
+
+        fetched = await parallel_run_in_groups(
             tasks,
             concurrency=group_size,
             delay=0.0,
             use_tqdm=use_tqdm
         )
+        await self.flush_history()
 
-        return results  # Optionally, filter or process this further
+        fetched = dict(zip(missing, fetched))
+        return [stored.get(block_no) or fetched.get(block_no) for block_no in block_heights]
 
+    # legacy storage: one JSON of all pools per height, new data goes to PoolHistoryStore
     DB_KEY_POOL_INFO_HASH = 'PoolInfo:hashtable_v2'
 
     async def clear(self, max_age=1000 * DAY):
-        r: Redis = await self.deps.db.get_redis()
-
         top_block = await self.deps.last_block_cache.get_thor_block()
         if top_block is None or top_block < 1:
             self.logger.warning(f'Failed to get top block from the store ({top_block = })')
             return
 
         min_block = int(max(1, top_block - max_age / THOR_BLOCK_TIME))
-        block_numbers = await r.hkeys(self.DB_KEY_POOL_INFO_HASH)
+        await self.history.clear(min_block, top_block)
+        await self._clear_legacy_history_data(min_block, top_block)
+        self.logger.info('Cache cleared successfully!')
 
-        cache_size = len(block_numbers)
+    async def _clear_legacy_history_data(self, min_block, top_block):
+        r: Redis = await self.deps.db.get_redis()
+        block_numbers = await r.hkeys(self.DB_KEY_POOL_INFO_HASH)
         blocks_to_delete = [b for b in block_numbers if int(b) < min_block or int(b) > top_block]
-        self.logger.info(f'Cache size: {cache_size}, entries to delete: {len(blocks_to_delete)}')
-
-        for block_number in blocks_to_delete:
-            await r.hdel(self.DB_KEY_POOL_INFO_HASH, block_number)
-
-        self.logger.info('Cache cleared successfully!')
+        self.logger.info(f'Legacy cache size: {len(block_numbers)}, entries to delete: {len(blocks_to_delete)}')
+        for batch in grouper(1000, blocks_to_delete):
+            await r.hdel(self.DB_KEY_POOL_INFO_HASH, *batch)
 
     async def _save_historic_data(self, subkey, pool_map: PoolInfoMap):
         if not pool_map:
@@ -160,11 +206,34 @@ class PoolCache(CachedDataSource[PriceHolder]):
             self.logger.error('Subkey is empty! Cannot save to cache!')
             return
 
-        r: Redis = await self.deps.db.get_redis()
-        j_pools = json.dumps({key: p.to_dict() for key, p in pool_map.items()})
-        await r.hset(self.DB_KEY_POOL_INFO_HASH, str(subkey), j_pools)
+        await self.history.save(int(subkey), pool_map)
 
     async def _load_history_data(self, subkey) -> Optional[PoolInfoMap]:
+        pool_map = await self.history.load(int(subkey))
+        if pool_map:
+            return pool_map
+
+        # not migrated yet? look in the old hash and move the entry to the new store
+        pool_map = await self._load_legacy_history_data(subkey)
+        if pool_map:
+            await self.history.save(int(subkey), pool_map)
+            self._legacy_migrated.add(int(subkey))
+            if len(self._legacy_migrated) >= self.history.flush_every:
+                await self.flush_history()
+        return pool_map
+
+    async def flush_history(self):
+        """
+        Writes the buffered pool states. Call it on stop.
+        The legacy entries migrated so far are deleted only after they have been written to the new store.
+        """
+        migrated, self._legacy_migrated = self._legacy_migrated, set()
+        await self.history.flush()
+        if migrated:
+            r: Redis = await self.deps.db.get_redis()
+            await r.hdel(self.DB_KEY_POOL_INFO_HASH, *[str(height) for height in migrated])
+
+    async def _load_legacy_history_data(self, subkey) -> Optional[PoolInfoMap]:
         try:
             r: Redis = await self.deps.db.get_redis()
             cached_item = await r.hget(self.DB_KEY_POOL_INFO_HASH, str(subkey))
@@ -180,6 +249,7 @@ class PoolCache(CachedDataSource[PriceHolder]):
     async def purge(self):
         r: Redis = await self.deps.db.get_redis()
         await r.delete(self.DB_KEY_POOL_INFO_HASH)
+        await self.history.purge()
 
     async def automatic_clear(self):
         # sometimes clear the cache
@@ -0,0 +1,296 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, List
+
+import numpy as np
+from redis.asyncio import Redis
+
+from lib.columnar import encode_columns, decode_columns, ColumnarError
+from lib.db import DB
+from lib.logs import WithLogger
+from lib.lru import LRUCache
+from models.pool_info import PoolInfo, PoolInfoMap
+
+PoolColumns = Dict[str, np.ndarray]
+
+
+class PoolHistoryStore(WithLogger):
+    """
+    Historical pool states stored column-wise.
+    Heights are grouped into buckets of `bucket_size` blocks; each bucket is a Redis hash
+    "PoolHistory:v3:<bucket>" with one field per pool. The value is a compressed columnar chunk
+    (see lib/columnar.py) holding the heights and the numeric fields of PoolInfo at those heights.
+    So reading a single pool or a range of heights touches only a few small values.
+    New rows are buffered in memory and merged into the chunks once in `flush_every` heights.
+    """
+
+    KEY_PREFIX = 'PoolHistory:v3'
+    DEFAULT_BUCKET_SIZE = 1000
+    DEFAULT_FLUSH_EVERY = 20
+
+    COL_HEIGHT = 'height'
+    INT_FIELDS = (
+        'balance_asset', 'balance_rune', 'pool_units', 'synth_supply', 'synth_units', 'units', 'volume_24h',
+        'savers_depth', 'savers_units',
+    )
+    FLOAT_FIELDS = ('usd_per_asset', 'pool_apy', 'savers_apr', 'pool_apr')
+    STR_FIELDS = ('status',)
+    BOOL_FIELDS = ('is_virtual',)
+
+    def __init__(self, db: DB,
+                 bucket_size: int = DEFAULT_BUCKET_SIZE,
+                 flush_every: int = DEFAULT_FLUSH_EVERY,
+                 chunk_cache_size: int = 256):
+        super().__init__()
+        assert bucket_size > 0
+        self.db = db
+        self.bucket_size = bucket_size
+        self.flush_every = max(1, flush_every)
+        # bucket -> height -> pool map
+        self._pending: Dict[int, Dict[int, PoolInfoMap]] = defaultdict(dict)
+        self._pending_heights = 0
+        # (bucket, pool) -> decoded columns
+        self._chunks = LRUCache(chunk_cache_size)
+        self._flush_lock = asyncio.Lock()
+
+    @property
+    def key_index(self):
+        return f'{self.KEY_PREFIX}:buckets'
+
+    def key_bucket(self, bucket: int):
+        return f'{self.KEY_PREFIX}:{bucket}'
+
+    def bucket_of(self, height: int) -> int:
+        return int(height) // self.bucket_size
+
+    # ---- writing ----
+
+    async def save(self, height: int, pool_map: PoolInfoMap):
+        if not pool_map or not height:
+            return
+        height = int(height)
+        bucket = self._pending[self.bucket_of(height)]
+        if height not in bucket:
+            self._pending_heights += 1
+        bucket[height] = pool_map
+        if self._pending_heights >= self.flush_every:
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            pending, self._pending = self._pending, defaultdict(dict)
+            self._pending_heights = 0
+            if not pending:
+                return
+
+            r: Redis = await self.db.get_redis()
+            for bucket, rows in pending.items():
+                pools = set()
+                for pool_map in rows.values():
+                    pools.update(pool_map.keys())
+                pools = sorted(pools)
+
+                # always re-read: another process may have written to this bucket
+                existing = await self._read_chunks(r, bucket, pools, use_cache=False)
+                mapping = {}
+                for pool in pools:
+                    columns = self._merge(existing.get(pool), rows, pool)
+                    if columns is not None:
+                        mapping[pool] = encode_columns(columns)
+                        self._chunks[(bucket, pool)] = columns
+
+                if mapping:
+                    async with r.pipeline(transaction=False) as pipe:
+                        pipe.hset(self.key_bucket(bucket), mapping=mapping)
+                        pipe.zadd(self.key_index, {str(bucket): bucket})
+                        await pipe.execute()
+
+    def _merge(self, columns: Optional[PoolColumns], rows: Dict[int, PoolInfoMap], pool: str) -> Optional[PoolColumns]:
+        by_height = {}
+        if columns is not None:
+            for i, h in enumerate(columns[self.COL_HEIGHT]):
+                by_height[int(h)] = i
+        new_rows = {h: pool_map[pool] for h, pool_map in rows.items() if pool in pool_map}
+        if not new_rows:
+            return columns
+
+        heights = sorted(set(by_height) | set(new_rows))
+
+        def column(field, dtype, default):
+            values = []
+            for h in heights:
+                if h in new_rows:
+                    v = getattr(new_rows[h], field)
+                    values.append(default if v is None else v)
+                else:
+                    values.append(columns[field][by_height[h]])
+            return np.array(values, dtype=dtype)
+
+        def int_column(field):
+            try:
+                return column(field, np.int64, 0)
+            except OverflowError:
+                # beyond int64: kept as Python ints, the chunk stores them raw instead of delta-encoded
+                self.logger.warning(f'{pool}.{field} does not fit int64, stored raw')
+                return column(field, object, 0)
+
+        result = {self.COL_HEIGHT: np.array(heights, dtype=np.int64)}
+        for field in self.INT_FIELDS:
+            result[field] = int_column(field)
+        for field in self.FLOAT_FIELDS:
+            result[field] = column(field, np.float64, 0.0)
+        for field in self.STR_FIELDS:
+            result[field] = column(field, object, '')
+        for field in self.BOOL_FIELDS:
+            result[field] = column(field, np.bool_, False)
+        return result
+
+    # ---- reading ----
+
+    async def _read_chunks(self, r: Redis, bucket: int, pools: Optional[List[str]] = None,
+                           use_cache=True) -> Dict[str, PoolColumns]:
+        results = {}
+        missing = []
+        if pools is not None:
+            for pool in pools:
+                cached = self._chunks.get((bucket, pool)) if use_cache else None
+                if cached is not None:
+                    results[pool] = cached
+                else:
+                    missing.append(pool)
+            if not missing:
+                return results
+            raw = dict(zip(missing, await r.hmget(self.key_bucket(bucket), missing)))
+        else:
+            raw = await r.hgetall(self.key_bucket(bucket))
+
+        for pool, blob in raw.items():
+            if not blob:
+                continue
+            try:
+                columns = decode_columns(blob)
+            except ColumnarError as e:
+                self.logger.warning(f'Bad pool history chunk {bucket}/{pool}: {e}')
+                continue
+            self._chunks[(bucket, pool)] = columns
+            results[pool] = columns
+        return results
+
+    def _pool_at(self, pool: str, columns: PoolColumns, height: int) -> Optional[PoolInfo]:
+        heights = columns[self.COL_HEIGHT]
+        i = int(np.searchsorted(heights, height))
+        if i >= len(heights) or heights[i] != height:
+            return None
+        kwargs = {}
+        for field in self.INT_FIELDS:
+            kwargs[field] = int(columns[field][i])
+        for field in self.FLOAT_FIELDS:
+            kwargs[field] = float(columns[field][i])
+        for field in self.STR_FIELDS:
+            kwargs[field] = str(columns[field][i])
+        for field in self.BOOL_FIELDS:
+            kwargs[field] = bool(columns[field][i])
+        return PoolInfo(pool, **kwargs)
+
+    def _pending_at(self, height: int, pools: Optional[Iterable[str]]) -> Optional[PoolInfoMap]:
+        pool_map = self._pending.get(self.bucket_of(height), {}).get(height)
+        if pool_map is None:
+            return None
+        if pools is None:
+            return pool_map
+        return {p: pool_map[p] for p in pools if p in pool_map}
+
+    async def load(self, height: int, pools: Optional[Iterable[str]] = None) -> Optional[PoolInfoMap]:
+        """
+        Pool states exactly at the given height. If `pools` is given, only those pools are read.
+        Returns None if the height has never been saved.
+        """
+        results = await self.load_many([height], pools)
+        return results.get(int(height))
+
+    async def load_many(self, heights: Iterable[int],
+                        pools: Optional[Iterable[str]] = None) -> Dict[int, PoolInfoMap]:
+        """
+        Pool states for many heights at once, each bucket is read only once.
+        Heights that are not stored are absent in the result.
+        """
+        pools = sorted(set(pools)) if pools is not None else None
+        results = {}
+        by_bucket = defaultdict(list)
+        for height in set(int(h) for h in heights):
+            pending = self._pending_at(height, pools)
+            if pending:
+                results[height] = pending
+            else:
+                by_bucket[self.bucket_of(height)].append(height)
+
+        if not by_bucket:
+            return results
+
+        r: Redis = await self.db.get_redis()
+        for bucket, bucket_heights in by_bucket.items():
+            chunks = await self._read_chunks(r, bucket, pools)
+            for height in bucket_heights:
+                pool_map = {}
+                for pool, columns in chunks.items():
+                    pool_info = self._pool_at(pool, columns, height)
+                    if pool_info is not None:
+                        pool_map[pool] = pool_info
+                if pool_map:
+                    results[height] = pool_map
+        return results
+
+    async def load_range(self, pool: str, height_from: int, height_to: int,
+                         fields: Iterable[str] = ('balance_rune', 'balance_asset')) -> PoolColumns:
+        """
+        Range query: columns of one pool for heights in [height_from, height_to].
+        Example: await store.load_range('BTC.BTC', 100, 5000, ['balance_rune']) -> {'height': [...], 'balance_rune': [...]}
+        """
+        fields = [self.COL_HEIGHT] + [f for f in fields if f != self.COL_HEIGHT]
+        await self.flush()
+
+        r: Redis = await self.db.get_redis()
+        parts = defaultdict(list)
+        for bucket in range(self.bucket_of(height_from), self.bucket_of(height_to) + 1):
+            columns = (await self._read_chunks(r, bucket, [pool])).get(pool)
+            if columns is None:
+                continue
+            heights = columns[self.COL_HEIGHT]
+            mask = (heights >= height_from) & (heights <= height_to)
+            for field in fields:
+                parts[field].append(columns[field][mask])
+
+        return {
+            field: (np.concatenate(parts[field]) if parts[field] else np.array([], dtype=np.int64))
+            for field in fields
+        }
+
+    # ---- maintenance ----
+
+    async def clear(self, min_height: int, max_height: int):
+        """
+        Drops the whole buckets that are completely outside [min_height, max_height].
+        """
+        r: Redis = await self.db.get_redis()
+        min_bucket, max_bucket = self.bucket_of(min_height), self.bucket_of(max_height)
+        old = await r.zrangebyscore(self.key_index, '-inf', f'({min_bucket}')
+        future = await r.zrangebyscore(self.key_index, f'({max_bucket}', '+inf')
+        buckets = [int(b) for b in old + future]
+        self.logger.info(f'Pool history: {len(buckets)} buckets to delete.')
+        if not buckets:
+            return
+
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.delete(*[self.key_bucket(b) for b in buckets])
+            pipe.zrem(self.key_index, *[str(b) for b in buckets])
+            await pipe.execute()
+        self._chunks = LRUCache(self._chunks.capacity)
+
+    async def purge(self):
+        r: Redis = await self.db.get_redis()
+        buckets = await r.zrangebyscore(self.key_index, '-inf', '+inf')
+        keys = [self.key_bucket(int(b)) for b in buckets]
+        await r.delete(self.key_index, *keys)
+        self._pending.clear()
+        self._pending_heights = 0
+        self._chunks = LRUCache(self._chunks.capacity)
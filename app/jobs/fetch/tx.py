@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from aiohttp import ContentTypeError
 from tqdm import tqdm
@@ -31,6 +31,15 @@ class TxFetcher(BaseFetcher):
         self.max_age_sec = parse_timespan_to_seconds(s_cfg.max_age)
         self.announce_pending_after_blocks = int(s_cfg.announce_pending_after_blocks)
 
+        # Midgard lists the newest TXs first, so a regular tick pages only down to the newest TX seen before.
+        # Once in a while all max_page_deep pages are scanned again to catch TXs that changed deeper in the list
+        # (e.g. pending ones that became successful).
+        self.deep_scan_period = deps.cfg.as_interval('tx.deep_scan_period', '10m')
+        self.last_deep_scan_ts = 0.0
+        self.high_water_mark: Optional[Tuple[int, str]] = None  # (height, tx hash) of the newest processed TX
+        self._next_high_water_mark: Optional[Tuple[int, str]] = None
+        self.pages_fetched_last_tick = 0
+
         self.tx_parser = get_parser_by_network_id(deps.cfg.network_id)
 
         self.progress_tracker: Optional[tqdm] = None
@@ -51,8 +60,12 @@ class TxFetcher(BaseFetcher):
 
     async def post_action(self, txs: List[ThorAction]):
         hashes = [self.get_seen_hash(t) for t in txs]
-        for h in hashes:
-            await self.deduplicator.mark_as_seen(h)
+        await self.deduplicator.mark_as_seen_hashes(hashes)
+
+        # the listeners have got everything above it
+        if self._next_high_water_mark:
+            self.high_water_mark = self._next_high_water_mark
+            self._next_high_water_mark = None
 
     # -----------------------
 
@@ -184,31 +197,44 @@ class TxFetcher(BaseFetcher):
             self.logger.exception(f'Failed to recover old TXs ({e})', stack_info=True)
             return []
 
+    @property
+    def is_deep_scan_due(self):
+        return not self.high_water_mark or now_ts() - self.last_deep_scan_ts >= self.deep_scan_period
+
+    def _reached_high_water_mark(self, txs: List[ThorAction]):
+        mark_height, mark_hash = self.high_water_mark
+        return any(tx.height < mark_height or tx.tx_hash == mark_hash for tx in txs)
+
+    @staticmethod
+    def _newest_tx_mark(txs: List[ThorAction]) -> Optional[Tuple[int, str]]:
+        newest = max(txs, key=lambda tx: tx.height, default=None)
+        return (newest.height, newest.tx_hash) if newest else None
+
     async def _fetch_unseen_txs(self):
         all_txs = []
 
         deepest_block_height = 1_000_000_000_000_000
         top_block_height = 0
 
-        futures = [
-            self._fetch_one_batch_tries(page, tries=self.RETRY_COUNT) for page in range(self.max_page_deep)
-        ]
-
         number_of_pending_txs_this_tick = 0
         cleared_pending_hashes = set()
 
-        # future_tasks = asyncio.as_completed(futures)  # parallel
-        # fixme: as we use 9R servers, we have to run sequential fetching in order to avoid 503 errors
-        future_tasks = futures  # sequential
+        deep_scan = self.is_deep_scan_due
+        pages_fetched = 0
 
-        for future in future_tasks:
+        # fixme: as we use 9R servers, we have to run sequential fetching in order to avoid 503 errors
+        for page in range(self.max_page_deep):
             # get a batch of TXs
-            results = await future
+            results = await self._fetch_one_batch_tries(page, tries=self.RETRY_COUNT)
+            pages_fetched += 1
 
             if results is None:
                 self.logger.warning('Got None from Midgard. For now, we just skip it.')
                 continue
 
+            if page == 0:
+                self._next_high_water_mark = self._newest_tx_mark(results.txs)
+
             # estimate "top_block_height"
             deepest_block_height, top_block_height = self._estimate_min_max_height(
                 results, deepest_block_height, top_block_height)
@@ -230,10 +256,11 @@ class TxFetcher(BaseFetcher):
                 # second, we select additionally OLD enough pending TXs
                 selected_txs += pending_old_txs
 
-            # filter out TXs from "selected_txs" that have been seen already
+            # filter out TXs from "selected_txs" that have been seen already, the whole page in one go
+            seen_flags = await self.deduplicator.batch_ever_seen_hashes([tx.tx_hash for tx in selected_txs])
             unseen_new_txs = []
-            for tx in selected_txs:
-                if not await self.deduplicator.have_ever_seen_hash(tx.tx_hash):
+            for tx, seen in zip(selected_txs, seen_flags):
+                if not seen:
                     unseen_new_txs.append(tx)
 
                     # It was previously pending, but now it's successful
@@ -243,6 +270,18 @@ class TxFetcher(BaseFetcher):
 
             all_txs += unseen_new_txs
 
+            # the raw count: an action that has failed to parse does not make the page short
+            if results.tx_count_unfiltered < self.tx_per_batch:
+                break  # the end of the list
+
+            if not deep_scan and self._reached_high_water_mark(results.txs):
+                break  # everything below has been processed
+
+        if deep_scan:
+            self.last_deep_scan_ts = now_ts()
+        self.pages_fetched_last_tick = pages_fetched
+        self.logger.info(f'Fetched {pages_fetched} pages ({"deep scan" if deep_scan else "incremental"}).')
+
         # Take care of pending TXs that were not seen for a long time
         # extra_txs = await self.try_to_recover_old_txs(deepest_block_height)
         # all_txs.extend(extra_txs)
@@ -57,8 +57,11 @@ class NodeChurnDetector(WithDelegates, INotified, WithLogger):
         old_nodes = await self.get_last_node_info()
         changes: NodeSetChanges = self.extract_changes(info_list, old_nodes)
 
-        await self._node_db.save_node_info_list(info_list)
-        self.logger.info(f'Saved state of THORNode set: {len(info_list)} nodes.')
+        # keyed diff against the previous snapshot; the personal trackers read it instead of comparing all nodes
+        diff = await self._node_db.save_node_info_list(info_list)
+        if old_nodes:
+            changes.diff = diff
+        self.logger.info(f'Saved state of THORNode set: {len(info_list)} nodes; {diff}.')
 
         try:
             # Fill out some additional data
@@ -53,22 +53,23 @@ class PriceRecorder(WithLogger, INotified):
         else:
             self.logger.error(f'Odd {rune_market_info.tcy_price = }')
 
-    async def get_prices(self, period, max_points=None):
-        if not max_points:
-            max_points = 60_000 if period >= 7 * DAY else 10_000
+    CHART_POINTS = 500
+
+    async def _get_chart(self, series: PriceTimeSeries, period, max_points=None):
+        if max_points:
+            # explicitly asked for raw points
+            return await series.get_last_values(period, with_ts=True, max_points=max_points)
+        return await series.get_last_values_rollup(period, series.KEY, points=self.CHART_POINTS, with_ts=True)
 
-        pool_prices = await self.pool_price_series.get_last_values(period, with_ts=True, max_points=max_points)
-        cex_prices = await self.cex_price_series.get_last_values(period, with_ts=True, max_points=max_points)
-        det_prices = await self.deterministic_price_series.get_last_values(period, with_ts=True, max_points=max_points)
+    async def get_prices(self, period, max_points=None):
+        pool_prices = await self._get_chart(self.pool_price_series, period, max_points)
+        cex_prices = await self._get_chart(self.cex_price_series, period, max_points)
+        det_prices = await self._get_chart(self.deterministic_price_series, period, max_points)
 
         return pool_prices, cex_prices, det_prices
 
     async def get_tcy_prices(self, period, max_points=None):
-        if not max_points:
-            max_points = 60_000 if period >= 7 * DAY else 10_000
-
-        tcy_prices = await self.tcy_price_series.get_last_values(period, with_ts=True, max_points=max_points)
-        return tcy_prices
+        return await self._get_chart(self.tcy_price_series, period, max_points)
 
     async def get_historical_price_dict(self, periods=(HOUR, DAY, 7 * DAY, 30 * DAY, YEAR), tolerance_percent=5):
         prices = {}
@@ -115,6 +116,7 @@ class PriceRecorder(WithLogger, INotified):
         r = series.db.redis
         if message_ids:
             await r.xdel(series.stream_name, *message_ids)
+            await series.rebuild_rollups()
 
     async def purge_spikes(self, interval, max_value_pool, max_value_det):
         await self.purge_spike_time_series(self.deterministic_price_series, interval, max_value_det)
@@ -14,7 +14,7 @@ from lib.date_utils import DAY, now_ts
 from lib.delegates import INotified
 from lib.depcont import DepContainer
 from lib.logs import WithLogger
-from models.events import EventSwap, parse_swap_and_out_event
+from models.events import EventSwap
 from models.rapid_swap import (
     RapidSwapDailyPoint,
     RapidSwapDelta,
@@ -60,8 +60,7 @@ class RapidSwapRecorder(INotified, WithLogger):
 
     @staticmethod
     def iter_swap_events(block: BlockResult):
-        for raw_event in block.end_block_events:
-            parsed_event = parse_swap_and_out_event(raw_event)
+        for parsed_event in block.typed_events_of_type('swap'):
             if isinstance(parsed_event, EventSwap):
                 yield parsed_event
 
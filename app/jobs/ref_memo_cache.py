@@ -37,14 +37,17 @@ class RefMemoCache(INotified, WithLogger):
         self._dedup = EventDbTxDeduplicator(deps.db, self.DEDUP_COMPONENT_NAME)
 
     @staticmethod
-    def parse_reference_memo(memo: str) -> Optional[THORMemo]:
+    def parse_reference_memo(memo: str, block: Optional[BlockResult] = None) -> Optional[THORMemo]:
         if not memo:
             return None
 
-        try:
-            parsed = THORMemo.parse_memo(memo, no_raise=True)
-        except Exception:
-            return None
+        if block:
+            parsed = block.parse_memo(memo)
+        else:
+            try:
+                parsed = THORMemo.parse_memo(memo, no_raise=True)
+            except Exception:
+                return None
 
         if parsed and parsed.action == ActionType.REFERENCE:
             return parsed
@@ -65,15 +68,16 @@ class RefMemoCache(INotified, WithLogger):
         return bool(tx and tx.tx_hash and cls.parse_reference_memo(cls._native_memo(tx)))
 
     @classmethod
-    def _native_candidate(cls, tx: NativeThorTx) -> Optional[ReferenceMemoCandidate]:
+    def _native_candidate(cls, tx: NativeThorTx, block: Optional[BlockResult] = None) -> Optional[ReferenceMemoCandidate]:
         memo = cls._native_memo(tx)
-        if tx and tx.tx_hash and cls.parse_reference_memo(memo):
+        if tx and tx.tx_hash and cls.parse_reference_memo(memo, block):
             return ReferenceMemoCandidate(str(tx.tx_hash), memo, 'native_deposit')
         return None
 
     @classmethod
-    def _observed_candidate(cls, tx: ThorObservedTx) -> Optional[ReferenceMemoCandidate]:
-        if tx and tx.is_inbound and tx.tx_id and cls.parse_reference_memo(tx.memo):
+    def _observed_candidate(cls, tx: ThorObservedTx,
+                            block: Optional[BlockResult] = None) -> Optional[ReferenceMemoCandidate]:
+        if tx and tx.is_inbound and tx.tx_id and cls.parse_reference_memo(tx.memo, block):
             return ReferenceMemoCandidate(str(tx.tx_id), str(tx.memo), 'observed_in')
         return None
 
@@ -88,11 +92,11 @@ class RefMemoCache(INotified, WithLogger):
     def iter_reference_candidates(cls, block: BlockResult) -> Iterable[ReferenceMemoCandidate]:
         """Yield all REFERENCE registration candidates from native deposits and inbound observed txs."""
         for tx in block.deposits:
-            if candidate := cls._native_candidate(tx):
+            if candidate := cls._native_candidate(tx, block):
                 yield candidate
 
         for tx in block.all_observed_txs:
-            if candidate := cls._observed_candidate(tx):
+            if candidate := cls._observed_candidate(tx, block):
                 yield candidate
 
     @staticmethod
@@ -0,0 +1,135 @@
+import base64
+import json
+import zlib
+from typing import List, Optional, Tuple
+
+from api.midgard.parser import get_parser_by_network_id
+from api.midgard.urlgen import free_url_gen
+from lib.date_utils import DAY
+from lib.depcont import DepContainer
+from lib.logs import WithLogger
+from models.pool_member import PoolMemberDetails
+from models.tx import ThorAction
+
+
+class LPActionLog(WithLogger):
+    """
+    Liquidity actions (add/withdraw) of an address, cached in Redis and appended incrementally.
+    The raw Midgard actions are stored compressed under "LPActionLog:{address}" together with
+    a signature of the address's pool membership (units and the date of the last addition per pool).
+    While the signature is the same, the history is served from the cache without asking Midgard for actions.
+    Otherwise only the actions newer than the cached tip are fetched (Midgard lists the newest first).
+    The tip is held below the oldest pending action, so the pending ones are fetched again until they settle.
+    """
+
+    KEY_PREFIX = 'LPActionLog'
+    VERSION = 1
+    DEFAULT_TTL = 30 * DAY
+    PAGE_SIZE = 50
+    MAX_PAGES = 1000
+
+    def __init__(self, deps: DepContainer, ttl=DEFAULT_TTL, page_size=PAGE_SIZE):
+        super().__init__()
+        self.deps = deps
+        self.ttl = ttl
+        self.page_size = page_size
+        self.parser = get_parser_by_network_id(deps.cfg.network_id)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, address: str):
+        return f'{self.KEY_PREFIX}:{address}'
+
+    @staticmethod
+    def membership_signature(membership: List[PoolMemberDetails]) -> list:
+        return sorted([m.pool, m.liquidity_units, m.date_last_added] for m in membership)
+
+    @staticmethod
+    def _height(raw: dict) -> int:
+        return int(raw.get('height', 0))
+
+    @classmethod
+    def _tip(cls, raw_actions: List[dict]) -> int:
+        if not raw_actions:
+            return 0
+        pending = [cls._height(a) for a in raw_actions if str(a.get('status', '')).lower() == 'pending']
+        return min(pending) if pending else max(cls._height(a) for a in raw_actions)
+
+    @staticmethod
+    def _encode(entry: dict) -> str:
+        return base64.b64encode(zlib.compress(json.dumps(entry, separators=(',', ':')).encode())).decode()
+
+    @staticmethod
+    def _decode(blob: str) -> dict:
+        return json.loads(zlib.decompress(base64.b64decode(blob)))
+
+    async def _load(self, address: str) -> Optional[dict]:
+        r = await self.deps.db.get_redis()
+        blob = await r.get(self.key(address))
+        if not blob:
+            return None
+        try:
+            entry = self._decode(blob)
+        except (ValueError, zlib.error) as e:
+            self.logger.warning(f'Bad LP action log of {address}: {e!r}')
+            return None
+        return entry if entry.get('v') == self.VERSION else None
+
+    async def _save(self, address: str, entry: dict):
+        r = await self.deps.db.get_redis()
+        await r.set(self.key(address), self._encode(entry), ex=int(self.ttl))
+
+    async def _fetch_newer_than(self, address: str, tip: int) -> Tuple[List[dict], bool]:
+        """
+        Raw actions at heights >= tip (all of them if tip is 0), newest first.
+        Returns (actions, ok); not ok if Midgard has failed on the way.
+        """
+        actions, seen = [], set()
+        for page in range(self.MAX_PAGES):
+            url = free_url_gen.url_for_tx(page * self.page_size, self.page_size,
+                                          address=address, tx_type=free_url_gen.LIQUIDITY_TX_TYPES)
+            j = await self.deps.midgard_connector.request(url)
+            if not isinstance(j, dict):
+                return actions, False
+
+            batch = j.get('actions', [])
+            for raw in batch:
+                if tip and self._height(raw) < tip:
+                    continue
+                # the offsets shift if new actions arrive while paging
+                action_id = json.dumps(raw, sort_keys=True)
+                if action_id not in seen:
+                    seen.add(action_id)
+                    actions.append(raw)
+
+            if len(batch) < self.page_size or (tip and any(self._height(raw) < tip for raw in batch)):
+                break
+        return actions, True
+
+    def _parse(self, raw_actions: List[dict]) -> List[ThorAction]:
+        return list(self.parser.safe_parse_raw_batch(raw_actions))
+
+    async def get_actions(self, address: str,
+                          membership: Optional[List[PoolMemberDetails]] = None) -> List[ThorAction]:
+        if membership is None:
+            membership = await self.deps.midgard_connector.query_pool_membership(address)
+        signature = self.membership_signature(membership)
+
+        entry = await self._load(address)
+        if entry and entry['signature'] == signature:
+            self.hits += 1
+            return self._parse(entry['actions'])
+
+        self.misses += 1
+        cached = entry['actions'] if entry else []
+        tip = self._tip(cached)
+        fresh, ok = await self._fetch_newer_than(address, tip)
+        if tip:
+            actions = [a for a in cached if self._height(a) < tip] + fresh
+        else:
+            actions = fresh
+
+        if ok:
+            await self._save(address, {'v': self.VERSION, 'signature': signature, 'actions': actions})
+        self.logger.info(f'LP actions of {address}: {len(actions)} ({len(fresh)} fetched above #{tip})')
+        return self._parse(actions)
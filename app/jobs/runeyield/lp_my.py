@@ -1,14 +1,14 @@
-import asyncio
 import datetime
 import operator
 from collections import defaultdict, Counter
-from typing import List, Tuple, Dict, Optional
+from typing import List, Tuple, Dict, Optional, Iterable, Set
 
 from api.midgard.parser import get_parser_by_network_id
 from jobs.fetch.tx import TxFetcher
 from jobs.runeyield import AsgardConsumerConnectorBase
 from jobs.runeyield.base import YieldSummary
 from jobs.runeyield.date2block import DateToBlockMapper
+from jobs.runeyield.lp_history import LPActionLog
 from lib.constants import thor_to_float, Chains
 from lib.date_utils import days_ago_noon, now_ts
 from lib.depcont import DepContainer
@@ -31,6 +31,7 @@ class HomebrewLPConnector(AsgardConsumerConnectorBase):
     def __init__(self, deps: DepContainer):
         super().__init__(deps)
         self.tx_fetcher = TxFetcher(deps)
+        self.action_log = LPActionLog(deps)
         self.parser = get_parser_by_network_id(deps.cfg.network_id)
         self.days_for_chart = 30
         self.block_mapper = DateToBlockMapper(deps)
@@ -40,11 +41,11 @@ class HomebrewLPConnector(AsgardConsumerConnectorBase):
     async def generate_yield_summary(self, address, pools: List[str]) -> YieldSummary:
         self.update_fees()
 
-        user_txs = await self._get_user_tx_actions(address)
+        membership = await self.get_my_pools(address)
+        user_txs = await self._get_user_tx_actions(address, membership=membership)
 
         if not pools:
-            pools = await self.get_my_pools(address)
-            pools = [p.pool for p in pools]
+            pools = [p.pool for p in membership]
 
         historic_all_pool_states = await self._fetch_historical_pool_states(user_txs)
 
@@ -97,9 +98,6 @@ class HomebrewLPConnector(AsgardConsumerConnectorBase):
                                        pool_name: str,
                                        user_txs: List[ThorAction],
                                        address) -> LiquidityPoolReport:
-        # todo: idea: check date_last_added, if it is not changed - get user_txs from local cache
-        # todo: or you can compare current liq_units! if it has changed, you reload tx! (unsafe)
-
         summary = self._get_liquidity_in_out_summary(user_txs, pool_name, historic_all_pool_states,
                                                      withdraw_fee_rune=self.withdraw_fee_rune)
         liq = await self.get_current_liquidity_from_node(address, pool_name)
@@ -170,8 +168,9 @@ class HomebrewLPConnector(AsgardConsumerConnectorBase):
         else:
             return txs
 
-    async def _get_user_tx_actions(self, address: str, pool_filter=None) -> List[ThorAction]:
-        txs = await self.tx_fetcher.fetch_all_tx(address, liquidity_change_only=True)
+    async def _get_user_tx_actions(self, address: str, pool_filter=None,
+                                   membership: Optional[List[PoolMemberDetails]] = None) -> List[ThorAction]:
+        txs = await self.action_log.get_actions(address, membership)
 
         txs = self._apply_pool_filter(txs, pool_filter)
 
@@ -184,7 +183,7 @@ class HomebrewLPConnector(AsgardConsumerConnectorBase):
             if thor_address:
                 self.logger.info(f'Found THOR address: "{thor_address}" for asset address: "{address}".')
 
-                txs_from_thor_address = await self.tx_fetcher.fetch_all_tx(thor_address, liquidity_change_only=True)
+                txs_from_thor_address = await self.action_log.get_actions(thor_address)
                 txs_from_thor_address = self._apply_pool_filter(txs_from_thor_address, pool_filter)
 
                 old_txs_len = len(txs)
@@ -214,10 +213,18 @@ class HomebrewLPConnector(AsgardConsumerConnectorBase):
         return txs
 
     async def _fetch_historical_pool_states(self, txs: List[ThorAction]) -> HeightToAllPools:
-        heights = list(set(tx.height for tx in txs))
-        tasks = [self.deps.pool_cache.load_pools(h, caching=True) for h in heights]
-        pool_states = await asyncio.gather(*tasks)
-        return dict(zip(heights, pool_states))
+        heights = set(tx.height for tx in txs)
+        pools = self._pools_to_load(tx.first_pool for tx in txs)
+        return await self.deps.pool_cache.load_pools_many(heights, pools=pools)
+
+    def _pools_to_load(self, pools: Iterable[str]) -> Set[str]:
+        # the user's pools (and their L1 pools for synths) + the stable coin pools for the USD price of Rune
+        names = set(self.deps.pool_cache.stable_coins)
+        for pool in pools:
+            if pool:
+                names.add(pool)
+                names.add(Asset.to_L1_pool_name(pool))
+        return names
 
     def _get_liquidity_in_out_summary(self, txs: List[ThorAction],
                                       pool_name,
@@ -465,11 +472,18 @@ class HomebrewLPConnector(AsgardConsumerConnectorBase):
         for pool, pool_txs in tx_by_pool_map.items():
             day_to_units = self._pool_units_by_day(pool_txs, days=days)  # List of (day_no, timestamp, units)
 
-            graph_points = []
+            day_heights = []
             for day, ts, units in day_to_units:
                 that_day = now - datetime.timedelta(days=day)
                 height = await self.block_mapper.get_block_height_by_date(that_day.date(), self.last_block)
-                pools_at_height = await self.deps.pool_cache.load_pools(height, caching=True)
+                day_heights.append(height)
+
+            pools_by_height = await self.deps.pool_cache.load_pools_many(day_heights,
+                                                                         pools=self._pools_to_load([pool]))
+
+            graph_points = []
+            for (day, ts, units), height in zip(day_to_units, day_heights):
+                pools_at_height = pools_by_height.get(height) or {}
                 pool_info = pools_at_height.get(pool, None)
 
                 if pool_info:
@@ -1,11 +1,15 @@
 import logging
 import re
+from collections import defaultdict
 from dataclasses import dataclass, replace
-from typing import List, NamedTuple, Iterable
+from functools import cached_property
+from typing import List, NamedTuple, Iterable, Dict, Optional
 
 from jobs.scanner.tx import NativeThorTx, ThorEvent, ThorObservedTx, ThorMessageType
 from lib.date_utils import date_parse_rfc
 from lib.utils import safe_get
+from models.events import parse_swap_and_out_event, TypeEvents
+from models.memo import THORMemo
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +37,11 @@ def is_block_error(result):
 
 @dataclass
 class BlockResult:
+    """
+    One block as seen by the scanner listeners.
+    Derived data (observed txs, typed events, parsed memos) is built lazily on the first access and memoized,
+    so every listener gets the same objects. Treat them as read-only!
+    """
     block_no: int
     txs: List[NativeThorTx]
     end_block_events: List[ThorEvent]
@@ -91,7 +100,7 @@ class BlockResult:
     def all_event_types(self):
         return set(ev.type for ev in self.end_block_events)
 
-    @property
+    @cached_property
     def all_observed_txs(self) -> List[ThorObservedTx]:
         observed_txs = {}
         for tx in self.txs:
@@ -117,3 +126,44 @@ class BlockResult:
     @property
     def deposits(self):
         return self.find_tx_by_type(ThorMessageType.MsgDeposit)
+
+    @cached_property
+    def _typed_end_block_event_pairs(self) -> List[tuple]:
+        pairs = []
+        for ev in self.end_block_events:
+            if (typed_ev := parse_swap_and_out_event(ev)) is not None:
+                pairs.append((ev.type, typed_ev))
+        return pairs
+
+    @cached_property
+    def typed_end_block_events(self) -> List[TypeEvents]:
+        """End block events decoded with parse_swap_and_out_event in the block order. Unknown types are skipped."""
+        return [typed_ev for _, typed_ev in self._typed_end_block_event_pairs]
+
+    @cached_property
+    def typed_events_by_type(self) -> Dict[str, List[TypeEvents]]:
+        grouped = defaultdict(list)
+        for ev_type, typed_ev in self._typed_end_block_event_pairs:
+            grouped[ev_type].append(typed_ev)
+        return dict(grouped)
+
+    def typed_events_of_type(self, *types: str) -> List[TypeEvents]:
+        if len(types) == 1:
+            return self.typed_events_by_type.get(types[0], [])
+        return [typed_ev for ev_type, typed_ev in self._typed_end_block_event_pairs if ev_type in types]
+
+    @cached_property
+    def _parsed_memos(self) -> Dict[str, Optional[THORMemo]]:
+        return {}
+
+    def parse_memo(self, memo: str) -> Optional[THORMemo]:
+        """THORMemo.parse_memo memoized within this block. None if the memo is empty or can not be parsed."""
+        if not memo:
+            return None
+        cache = self._parsed_memos
+        if memo not in cache:
+            try:
+                cache[memo] = THORMemo.parse_memo(memo, no_raise=True)
+            except Exception:
+                cache[memo] = None
+        return cache[memo]
@@ -1,7 +1,6 @@
-import asyncio
 import json
 import re
-from typing import Optional
+from typing import Optional, Iterable, Dict, List
 
 from redis.asyncio import Redis
 
@@ -53,6 +52,23 @@ class EventDatabase(WithLogger):
         props = await r.hgetall(self.key_to_tx(tx_id))
         return SwapProps.restore_events_from_tx_status(props)
 
+    async def read_many_tx_status(self, tx_ids: Iterable[str]) -> Dict[str, Optional[SwapProps]]:
+        """Reads the statuses of many txs in one round trip."""
+        tx_ids = list(dict.fromkeys(tx_id for tx_id in tx_ids if tx_id))
+        if not tx_ids:
+            return {}
+
+        r: Redis = await self.db.get_redis()
+        async with r.pipeline(transaction=False) as pipe:
+            for tx_id in tx_ids:
+                pipe.hgetall(self.key_to_tx(tx_id))
+            results = await pipe.execute()
+
+        return {
+            tx_id: SwapProps.restore_events_from_tx_status(props)
+            for tx_id, props in zip(tx_ids, results)
+        }
+
     async def has_tx_flag(self, tx_id, flag_name: str) -> bool:
         if not tx_id:
             return False
@@ -62,6 +78,21 @@ class EventDatabase(WithLogger):
         value = await r.hget(self.key_to_tx(tx_id), flag_name)
         return self._as_bool(value)
 
+    async def has_tx_flag_many(self, tx_ids: List[str], flag_name: str) -> List[bool]:
+        """Same as has_tx_flag for every tx_id, but in one round trip. The order is preserved."""
+        flag_name = self.normalize_flag_name(flag_name)
+        valid_ids = [tx_id for tx_id in tx_ids if tx_id]
+        if not valid_ids:
+            return [False] * len(tx_ids)
+
+        r: Redis = await self.db.get_redis()
+        async with r.pipeline(transaction=False) as pipe:
+            for tx_id in valid_ids:
+                pipe.hget(self.key_to_tx(tx_id), flag_name)
+            values = iter(await pipe.execute())
+
+        return [self._as_bool(next(values)) if tx_id else False for tx_id in tx_ids]
+
     async def set_tx_flag(self, tx_id, flag_name: str, value=True):
         if not tx_id:
             return
@@ -69,6 +100,12 @@ class EventDatabase(WithLogger):
             self.normalize_flag_name(flag_name): value,
         })
 
+    async def set_tx_flag_many(self, tx_ids: Iterable[str], flag_name: str, value=True):
+        flag_name = self.normalize_flag_name(flag_name)
+        await self.write_many_tx_status([
+            (tx_id, {flag_name: value}) for tx_id in tx_ids if tx_id
+        ])
+
     async def is_component_seen(self, tx_id, component_name: str) -> bool:
         return await self.has_tx_flag(tx_id, self.component_flag_name(component_name))
 
@@ -89,15 +126,28 @@ class EventDatabase(WithLogger):
 
     async def write_tx_status(self, tx_id, mapping):
         if mapping:
-            r: Redis = await self.db.get_redis()
-            kwargs = {k: self._convert_type(v) for k, v in mapping.items()}
-
-            key = self.key_to_tx(tx_id)
-
-            await r.hset(key, mapping=kwargs)
-            await r.expire(key, int(self._expiration_sec))
+            await self.write_many_tx_status([(tx_id, mapping)])
+
+    async def write_many_tx_status(self, updates: Iterable[tuple]):
+        """
+        Writes a batch of (tx_id, mapping) updates in one round trip. HSET and EXPIRE go to the same pipeline.
+        Several updates of one tx_id are merged, the later ones win.
+        """
+        merged = {}
+        for tx_id, mapping in updates:
+            if mapping:
+                merged.setdefault(tx_id, {}).update(mapping)
+        if not merged:
+            return
 
-            # print(f"{tx_id}: {mapping}")
+        r: Redis = await self.db.get_redis()
+        expiration_sec = int(self._expiration_sec)
+        async with r.pipeline(transaction=False) as pipe:
+            for tx_id, mapping in merged.items():
+                key = self.key_to_tx(tx_id)
+                pipe.hset(key, mapping={k: self._convert_type(v) for k, v in mapping.items()})
+                pipe.expire(key, expiration_sec)
+            await pipe.execute()
 
     async def write_tx_status_kw(self, tx_id, **kwargs):
         await self.write_tx_status(tx_id, kwargs)
@@ -169,15 +219,20 @@ class EventDbTxDeduplicator:
             return
         await self.event_db.set_tx_flag(tx_id, self.flag_name, True)
 
+    async def mark_as_seen_hashes(self, tx_ids: list[str]):
+        if self.ignore_all_checks:
+            return
+        await self.event_db.set_tx_flag_many(tx_ids, self.flag_name, True)
+
     async def mark_as_seen_txs(self, txs: list[ThorAction]):
         if self.ignore_all_checks:
             return
-        for tx in txs:
-            if tx and tx.tx_hash:
-                await self.mark_as_seen(tx.tx_hash)
+        await self.event_db.set_tx_flag_many((tx.tx_hash for tx in txs if tx), self.flag_name, True)
 
     async def batch_ever_seen_hashes(self, txs: list[str]):
-        return await asyncio.gather(*[self.have_ever_seen_hash(tx_hash) for tx_hash in txs])
+        if self.ignore_all_checks:
+            return [False] * len(txs)
+        return await self.event_db.has_tx_flag_many(txs, self.flag_name)
 
     async def only_hashes_having_certain_flag(self, txs: list[str], desired_flag) -> list[str]:
         flags = await self.batch_ever_seen_hashes(txs)
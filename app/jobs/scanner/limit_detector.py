@@ -78,9 +78,10 @@ class LimitSwapDetector(WithLogger, INotified, WithDelegates):
         return '', 0
 
     @classmethod
-    def _make_opened_limit_swap_from_native_tx(cls, tx: NativeThorTx) -> Optional[OpenedLimitSwap]:
+    def _make_opened_limit_swap_from_native_tx(cls, tx: NativeThorTx,
+                                               block: Optional[BlockResult] = None) -> Optional[OpenedLimitSwap]:
         memo_txt = tx.memo or tx.first_message_memo or ''
-        parsed = THORMemo.parse_memo(memo_txt, no_raise=True)
+        parsed = block.parse_memo(memo_txt) if block else THORMemo.parse_memo(memo_txt, no_raise=True)
         if not parsed or parsed.action != ActionType.LIMIT_ORDER:
             return None
 
@@ -98,8 +99,10 @@ class LimitSwapDetector(WithLogger, INotified, WithDelegates):
         )
 
     @staticmethod
-    def _make_opened_limit_swap_from_observed_tx(tx: ThorObservedTx, thor_block_no: int = 0) -> Optional[OpenedLimitSwap]:
-        parsed = THORMemo.parse_memo(tx.memo or '', no_raise=True)
+    def _make_opened_limit_swap_from_observed_tx(tx: ThorObservedTx, thor_block_no: int = 0,
+                                                 block: Optional[BlockResult] = None) -> Optional[OpenedLimitSwap]:
+        memo_txt = tx.memo or ''
+        parsed = block.parse_memo(memo_txt) if block else THORMemo.parse_memo(memo_txt, no_raise=True)
         if not parsed or parsed.action != ActionType.LIMIT_ORDER:
             return None
 
@@ -148,7 +151,7 @@ class LimitSwapDetector(WithLogger, INotified, WithDelegates):
                     continue
 
                 # Prefer structured memo parsing when available
-                pm = getattr(ev, 'parsed_memo', None)
+                pm = block.parse_memo(ev.memo)
                 if pm is not None:
                     # THORMemo marks limit orders with ActionType.LIMIT_ORDER
                     if pm.action == ActionType.LIMIT_ORDER:
@@ -218,7 +221,7 @@ class LimitSwapDetector(WithLogger, INotified, WithDelegates):
         """
         for tx in block.txs:
             try:
-                parsed = THORMemo.parse_memo(tx.memo or '', no_raise=True)
+                parsed = block.parse_memo(tx.memo or '')
                 if parsed and parsed.action in (ActionType.LIMIT_ORDER, ActionType.LIMIT_ORDER_MODIFY):
                     yield tx
             except Exception:
@@ -237,7 +240,7 @@ class LimitSwapDetector(WithLogger, INotified, WithDelegates):
 
         for tx in block.deposits:
             try:
-                opened = LimitSwapDetector._make_opened_limit_swap_from_native_tx(tx)
+                opened = LimitSwapDetector._make_opened_limit_swap_from_native_tx(tx, block)
                 if opened and opened.tx_id and opened.tx_id not in seen_tx_ids:
                     seen_tx_ids.add(opened.tx_id)
                     yield opened
@@ -246,7 +249,7 @@ class LimitSwapDetector(WithLogger, INotified, WithDelegates):
 
         for tx in block.all_observed_txs:
             try:
-                opened = LimitSwapDetector._make_opened_limit_swap_from_observed_tx(tx, block.block_no)
+                opened = LimitSwapDetector._make_opened_limit_swap_from_observed_tx(tx, block.block_no, block)
                 if opened and opened.tx_id and opened.tx_id not in seen_tx_ids:
                     seen_tx_ids.add(opened.tx_id)
                     yield opened
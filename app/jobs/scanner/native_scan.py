@@ -2,7 +2,7 @@ import asyncio
 import time
 from contextlib import suppress
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Dict
 
 from jobs.fetch.base import BaseFetcher
 from jobs.scanner.block_result import BlockResult
@@ -15,11 +15,12 @@ from lib.utils import safe_get
 
 class BlockScanner(BaseFetcher):
     MAX_ATTEMPTS_TO_SKIP_BLOCK = 5
+    DEFAULT_PREFETCH_WINDOW = 8
 
     NAME = 'block_scanner'
 
     def __init__(self, deps: DepContainer, sleep_period=None, last_block=0, max_attempts=MAX_ATTEMPTS_TO_SKIP_BLOCK,
-                 role='secondary'):
+                 role='secondary', prefetch_window=DEFAULT_PREFETCH_WINDOW):
         sleep_period = sleep_period or THOR_BLOCK_TIME * 0.99
         super().__init__(deps, sleep_period)
         self._last_block = last_block
@@ -37,6 +38,16 @@ class BlockScanner(BaseFetcher):
         # if more time has passed since the last block, we should run aggressive scan
         self._time_tolerance_for_aggressive_scan = THOR_BLOCK_TIME * 1.5  # 6 sec + 50%
 
+        # during the aggressive scan up to this number of blocks are fetched concurrently ahead of the cursor;
+        # they are still handed over to the listeners strictly in the height order. 1 = no prefetch
+        self.prefetch_window = max(1, int(prefetch_window or 1))
+        self._prefetched: Dict[int, asyncio.Task] = {}
+        self._known_thor_height = 0
+
+        # THORNode height for the scanner state (dashboard) is refreshed not more often than this
+        self._thor_height_refresh_period = THOR_BLOCK_TIME
+        self._last_thor_height_refresh_ts = 0.0
+
     @property
     def last_block_ts(self):
         return self._last_block_ts
@@ -53,6 +64,7 @@ class BlockScanner(BaseFetcher):
     def last_block(self, value):
         self.logger.warning(f'Last block number manually changed from {self._last_block} to {value}.')
         self._last_block = value
+        self._drop_prefetched()
 
     def _on_error(self, reason='', **kwargs):
         self.logger.warning(f'Error fetching block #{self._last_block} ({reason = !r}).')
@@ -65,6 +77,7 @@ class BlockScanner(BaseFetcher):
 
             self._last_block += 1
             self._this_block_attempts = 0
+            self._drop_prefetched()
 
     async def ensure_last_block(self, reset=False):
         if reset:
@@ -79,6 +92,13 @@ class BlockScanner(BaseFetcher):
                 self.logger.error('Still no last_block height!')
                 await asyncio.sleep(self.sleep_period)
 
+    def _maybe_refresh_thor_block_for_state(self):
+        if now_ts() - self._last_thor_height_refresh_ts < self._thor_height_refresh_period:
+            return
+        self._last_thor_height_refresh_ts = now_ts()
+        # noinspection PyAsyncCall
+        asyncio.create_task(self._refresh_thor_block_for_state())
+
     async def _refresh_thor_block_for_state(self):
         with suppress(Exception):
             last_thor_block = await self._fetch_last_block()
@@ -92,12 +112,14 @@ class BlockScanner(BaseFetcher):
                        last_available=block.error.last_available_block)
 
     async def should_run_aggressive_scan(self):
+        last_block = await self.deps.last_block_cache.get_thor_block()
+        self._known_thor_height = last_block or 0
+
         time_since_last_block = now_ts() - self._last_block_ts
         if time_since_last_block > self._time_tolerance_for_aggressive_scan:
             self.logger.info(f'😡 time_since_last_block = {time_since_last_block:.3f} sec. Run aggressive scan!')
             return True
 
-        last_block = await self.deps.last_block_cache.get_thor_block()
         lag_behind_node_block = last_block - self._last_block
         if lag_behind_node_block > 2:
             self.logger.info(f"😡 {lag_behind_node_block = }. Run aggressive scan!")
@@ -132,10 +154,10 @@ class BlockScanner(BaseFetcher):
                 raise asyncio.CancelledError('stop_block reached')
 
             try:
-                asyncio.create_task(self._refresh_thor_block_for_state())
+                self._maybe_refresh_thor_block_for_state()
                 self.logger.info(f'Fetching block #{self._last_block}. Cycle: {self._block_cycle}.')
                 start_ts = time.monotonic()
-                block_result = await self.fetch_one_block(self._last_block)
+                block_result = await self._fetch_block_pipelined(self._last_block, prefetch=aggressive)
                 end_ts = time.monotonic()
 
                 if block_result is None:
@@ -162,6 +184,7 @@ class BlockScanner(BaseFetcher):
                                                        to_block=last_av_b)
                             self._last_block = last_av_b
                             self._this_block_attempts = 0
+                            self._drop_prefetched()
                         elif block_result.is_ahead:
                             self.logger.warning(f'We are running ahead of real block height. '
                                                 f'{self._last_block = },'
@@ -199,7 +222,49 @@ class BlockScanner(BaseFetcher):
                 # only one block at the time if it is not aggressive scan
                 break
 
+        self._drop_prefetched()
         await self.state_db.on_iteration_end()
+        await self.state_db.flush(force=True)  # the dashboard gets the state at least once per tick
+
+    def _schedule_prefetch(self, block_no):
+        # forget everything that is behind the cursor
+        for height in [h for h in self._prefetched if h < block_no]:
+            self._cancel_task(self._prefetched.pop(height))
+
+        for i in range(self.prefetch_window):
+            height = block_no + i * self.stride
+            if i > 0:
+                # never run ahead of the node, it will only return "future block" errors
+                if self._known_thor_height and height > self._known_thor_height:
+                    break
+                if self.stop_block and height >= self.stop_block:
+                    break
+            if height not in self._prefetched:
+                self._prefetched[height] = asyncio.create_task(self.fetch_one_block(height))
+
+    async def _fetch_block_pipelined(self, block_no, prefetch=False) -> Optional[BlockResult]:
+        if prefetch and self.prefetch_window > 1:
+            self._schedule_prefetch(block_no)
+            self.logger.debug(f'{len(self._prefetched)} blocks in flight starting from #{block_no}.')
+
+        task = self._prefetched.pop(block_no, None)
+        if task is None:
+            return await self.fetch_one_block(block_no)
+        return await task
+
+    @staticmethod
+    def _cancel_task(task: asyncio.Task):
+        if task.done():
+            # retrieve the result, so asyncio won't complain about a never retrieved exception
+            if not task.cancelled():
+                task.exception()
+        else:
+            task.cancel()
+
+    def _drop_prefetched(self):
+        for task in self._prefetched.values():
+            self._cancel_task(task)
+        self._prefetched.clear()
 
     async def _fetch_last_block(self):
         result = await self.deps.thor_connector.query_native_status_raw()
@@ -29,7 +29,7 @@ class RunePoolEventDecoder(WithLogger, INotified, WithDelegates):
         for tx in block.txs:
             # RunePool Deposit/Withdraw are MsgDeposit With top-layer Memo: "POOL+/POOL-"
             if memo_str := tx.memo:
-                if memo_ob := THORMemo.parse_memo(memo_str, no_raise=True):
+                if memo_ob := block.parse_memo(memo_str):
                     if is_action(memo_ob.action, (ActionType.RUNEPOOL_ADD, ActionType.RUNEPOOL_WITHDRAW)):
                         for message in tx.messages:
                             tx_events = self._convert_tx_to_event(tx, message, memo_ob, block.block_no, usd_per_rune)
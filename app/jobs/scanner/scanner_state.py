@@ -1,4 +1,5 @@
 import json
+from typing import Optional
 
 from pydantic import BaseModel
 
@@ -47,10 +48,27 @@ class ScannerState(BaseModel):
 
 
 class ScannerStateDB(WithLogger):
-    def __init__(self, db: DB, role: str):
+    """
+    The state lives in memory and is written to Redis (as one JSON blob, the dashboard reads it)
+    at most every "flush_interval" seconds or every "flush_every_blocks" scanned blocks.
+    """
+
+    DEFAULT_FLUSH_INTERVAL = 5.0  # sec
+    DEFAULT_FLUSH_EVERY_BLOCKS = 20
+
+    def __init__(self, db: DB, role: str,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 flush_every_blocks=DEFAULT_FLUSH_EVERY_BLOCKS):
         super().__init__()
         self.db = db
         self.role = role
+        self.flush_interval = flush_interval
+        self.flush_every_blocks = flush_every_blocks
+
+        self.state: Optional[ScannerState] = None
+        self._dirty = False
+        self._blocks_since_flush = 0
+        self._last_flush_ts = 0.0
 
     @property
     def db_key(self) -> str:
@@ -70,30 +88,61 @@ class ScannerStateDB(WithLogger):
         data = state.model_dump()
         await r.set(self.db_key, json.dumps(data))
 
+    async def _get_state(self) -> ScannerState:
+        if self.state is None:
+            self.state = await self.load_state()
+        return self.state
+
+    def _is_flush_due(self):
+        return (
+            self._blocks_since_flush >= self.flush_every_blocks or
+            now_ts() - self._last_flush_ts >= self.flush_interval
+        )
+
+    async def flush(self, force=False):
+        if self.state is None or not self._dirty:
+            return
+        if not force and not self._is_flush_due():
+            return
+
+        try:
+            await self.save_state(self.state)
+            self._dirty = False
+            self._blocks_since_flush = 0
+            self._last_flush_ts = now_ts()
+        except Exception as e:
+            self.logger.exception(f'Error saving scanner state: {e}')
+
+    async def _changed(self, new_blocks=0, force=False):
+        self._dirty = True
+        self._blocks_since_flush += new_blocks
+        await self.flush(force)
+
     async def register(self):
         try:
             state = await self.load_state()
             state.started_at_ts = now_ts()
             state.total_blocks_scanned = 0
-            await self.save_state(state)
+            self.state = state
+            await self._changed(force=True)
         except Exception as e:
             self.logger.exception(f'Error registering scanner state: {e}')
 
     async def set_thor_height(self, thor_block: int):
         try:
-            state = await self.load_state()
+            state = await self._get_state()
             if thor_block:
                 state.thor_height_block = thor_block
             else:
                 state.last_message = "No thor height available"
-            await self.save_state(state)
+            await self._changed()
         except Exception as e:
             self.logger.exception(f'Error setting thor height: {e}')
 
     async def on_new_block_scanned(self, block_number: int, scan_time: float,
                                    is_error: bool = False, message: str = ""):
         try:
-            state = await self.load_state()
+            state = await self._get_state()
             state.last_scanned_block = block_number
             state.last_scanned_at_ts = now_ts()
             state.total_blocks_scanned += 1
@@ -105,44 +154,44 @@ class ScannerStateDB(WithLogger):
                 state.errors_encountered += 1
             if message:
                 state.last_message = message
-            await self.save_state(state)
+            await self._changed(new_blocks=1)
         except Exception as e:
             self.logger.exception(f'Error updating scanner state on new block: {e}')
 
     async def on_new_block_processed(self, processing_time: float):
         try:
-            state = await self.load_state()
+            state = await self._get_state()
             state.total_blocks_processed += 1
             # Update average processing time
             n = state.total_blocks_processed
             state.avg_block_processing_time = ((state.avg_block_processing_time * (n - 1)) + processing_time) / n
             state.max_block_processing_time = max(state.max_block_processing_time, processing_time)
-            await self.save_state(state)
+            await self._changed()
         except Exception as e:
             self.logger.exception(f'Error updating scanner state on new block processed: {e}')
 
     async def on_iteration_start(self, is_aggressive: bool):
         try:
-            state = await self.load_state()
+            state = await self._get_state()
             state.is_aggressive_mode = is_aggressive
             state.is_scanning = True
             state.last_message = "..."
-            await self.save_state(state)
+            await self._changed()
         except Exception as e:
             self.logger.exception(f'Error updating scanner state on iteration start: {e}')
 
     async def on_iteration_end(self):
         try:
-            state = await self.load_state()
+            state = await self._get_state()
             state.is_scanning = False
-            await self.save_state(state)
+            await self._changed()
         except Exception as e:
             self.logger.exception(f'Error updating scanner state on iteration end: {e}')
 
     async def set_last_message(self, message: str):
         try:
-            state = await self.load_state()
+            state = await self._get_state()
             state.last_message = message
-            await self.save_state(state)
+            await self._changed()
         except Exception as e:
             self.logger.exception(f'Error setting last message in scanner state: {e}')
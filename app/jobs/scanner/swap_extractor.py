@@ -14,7 +14,7 @@ from lib.logs import WithLogger
 from lib.utils import hash_of_string_repr, say, safe_get
 from models.asset import is_rune
 from models.events import EventOutbound, EventScheduledOutbound, \
-    parse_swap_and_out_event, TypeEventSwapAndOut, EventSwap
+    TypeEventSwapAndOut, EventSwap
 from models.s_swap import AlertSwapStart
 from models.tx import ThorAction
 
@@ -48,9 +48,8 @@ class SwapExtractorBlock(WithDelegates, INotified, WithLogger):
         # Also get quorum observed outbounds
         outbound_tx_id_set, outbound_events = self.detect_observed_quorum_outbounds(block)
 
-        # Write them into the DB
-        await self.register_swap_events(block, interesting_end_block_events)
-        await self.register_swap_events(block, outbound_events)
+        # Write them into the DB (one round trip for both sources)
+        await self.register_swap_events(block, interesting_end_block_events + outbound_events)
 
         # Extract finished TX from these two sources
         all_outbounds_tx_id_set = end_block_outbounds_tx_ids | outbound_tx_id_set
@@ -73,17 +72,18 @@ class SwapExtractorBlock(WithDelegates, INotified, WithLogger):
         ph = await self.deps.pool_cache.get()
         swaps = await self._swap_detector.detect_swaps(block, ph)
 
-        for swap in swaps:
-            swap: AlertSwapStart
-            # skip limit orders, handle only real swaps.
-            if swap.is_limit:
-                continue
+        # skip limit orders, handle only real swaps.
+        real_swaps = [swap for swap in swaps if not swap.is_limit]
+        existing = await self._db.read_many_tx_status(swap.tx_id for swap in real_swaps)
 
-            props = await self._db.read_tx_status(swap.tx_id)
-            if not props or not props.attrs.get('status'):
+        updates = {}
+        for swap in real_swaps:
+            swap: AlertSwapStart
+            props = existing.get(swap.tx_id)
+            # the first appearance in the block wins, as if they were written one by one
+            if (not props or not props.attrs.get('status')) and swap.tx_id not in updates:
                 # self.logger.debug(f'Detect new swap: {swap.tx_id} from {swap.from_address} ({swap.memo})')
-                await self._db.write_tx_status_kw(
-                    swap.tx_id,
+                updates[swap.tx_id] = dict(
                     id=swap.tx_id,
                     status=SwapProps.STATUS_OBSERVED_IN,
                     memo=swap.memo_str,
@@ -99,6 +99,8 @@ class SwapExtractorBlock(WithDelegates, INotified, WithLogger):
             # debugging stuff
             await self.dbg_on_new_swap(swap)
 
+        await self._db.write_many_tx_status(updates.items())
+
         return swaps
 
     @staticmethod
@@ -117,6 +119,7 @@ class SwapExtractorBlock(WithDelegates, INotified, WithLogger):
         return f"ev_{event.original.type}_{short_hash_key}"
 
     async def register_swap_events(self, block: BlockResult, interesting_events: List[TypeEventSwapAndOut]):
+        updates = []
         for event in interesting_events:
             if not event.tx_id:
                 continue
@@ -126,16 +129,15 @@ class SwapExtractorBlock(WithDelegates, INotified, WithLogger):
                 continue
 
             event_ident = self._event_ident(event, block.block_no)
-            await self._db.write_tx_status(event.tx_id, {
+            updates.append((event.tx_id, {
                 event_ident: event.original.attrs
-            })
+            }))
+
+        await self._db.write_many_tx_status(updates)
 
     @staticmethod
     def get_end_block_events_of_interest(block: BlockResult):
-        for ev in block.end_block_events:
-            swap_ev = parse_swap_and_out_event(ev)
-            if swap_ev:
-                yield swap_ev
+        yield from block.typed_end_block_events
 
     @staticmethod
     def get_swap_events_from_props(swap_props: SwapProps) -> List[EventSwap]:
@@ -189,9 +191,12 @@ class SwapExtractorBlock(WithDelegates, INotified, WithLogger):
         Outbound can come from end_block_events or from observed quorum txs.
         """
         results = []
+        given_away_ids = []
+
+        all_swap_props = await self._db.read_many_tx_status(outbound_tx_id_set)
 
         for tx_id in outbound_tx_id_set:
-            swap_props = await self._db.read_tx_status(tx_id)
+            swap_props = all_swap_props.get(tx_id)
             if not swap_props:
                 self.logger.warning(f'There are outbounds for tx {tx_id}, but there is no info about its initiation.')
                 continue
@@ -205,8 +210,8 @@ class SwapExtractorBlock(WithDelegates, INotified, WithLogger):
                     self.logger.info(f'Tx {tx_id} outbound is not signed yet, skipping.')
                     continue
 
-                # Update the status to avoid double processing in the future
-                await self._db.write_tx_status_kw(tx_id, status=SwapProps.STATUS_GIVEN_AWAY)
+                # the status is updated below to avoid double processing in the future
+                given_away_ids.append(tx_id)
 
                 # Find out the timestamp of the swap from the block height
                 ts = await self._get_ts_from_swap_props(swap_props, tx_id)
@@ -215,6 +220,11 @@ class SwapExtractorBlock(WithDelegates, INotified, WithLogger):
                 action = swap_props.build_action(ts)
                 results.append(action)
 
+        if given_away_ids:
+            await self._db.write_many_tx_status(
+                (tx_id, {'status': SwapProps.STATUS_GIVEN_AWAY}) for tx_id in given_away_ids
+            )
+
         if results:
             self.logger.info(f'Give away {len(results)} Txs.')
 
@@ -23,10 +23,16 @@ class SwapStartDetectorFromBlock(INotified, WithDelegates, WithLogger):
         super().__init__()
         self.deps = deps
         self.ph = None
+        self.block: Optional[BlockResult] = None  # the one being processed; its memo cache is shared by listeners
         self.observed_tx_deduplicator = EventDbTxDeduplicator(
             deps.db, self.OBSERVED_TX_DEDUP_COMPONENT
         ) if getattr(deps, 'db', None) else None
 
+    def _parse_memo(self, memo_str: str) -> Optional[THORMemo]:
+        if self.block:
+            return self.block.parse_memo(memo_str)
+        return THORMemo.parse_memo(memo_str, no_raise=True)
+
     @staticmethod
     def _coins_from_msg(msg: dict):
         return msg.get('coins') or safe_get(msg, 'tx', 'coins') or []
@@ -57,7 +63,7 @@ class SwapStartDetectorFromBlock(INotified, WithDelegates, WithLogger):
         if not ref_cache:
             return memo_str or None
 
-        parsed = THORMemo.parse_memo(memo_str, no_raise=True) if memo_str else None
+        parsed = self._parse_memo(memo_str) if memo_str else None
 
         reference_id = 0
         if parsed and parsed.action == ActionType.USE_REFERENCE:
@@ -89,7 +95,7 @@ class SwapStartDetectorFromBlock(INotified, WithDelegates, WithLogger):
             self.logger.debug(f'No memo in swap tx: {msg}')
             return None
 
-        memo = THORMemo.parse_memo(memo_str, no_raise=True)
+        memo = self._parse_memo(memo_str)
         if not memo:
             self.logger.error(f'Could not parse memo in swap tx: {msg}')
             return None
@@ -195,6 +201,7 @@ class SwapStartDetectorFromBlock(INotified, WithDelegates, WithLogger):
 
     async def detect_swaps(self, b: BlockResult, ph: PriceHolder):
         self.ph = ph
+        self.block = b
 
         deposit_swap_starts = await self.handle_deposits(b.deposits, b.block_no)
 
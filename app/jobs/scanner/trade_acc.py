@@ -7,7 +7,7 @@ from lib.constants import thor_to_float
 from lib.delegates import INotified, WithDelegates
 from lib.logs import WithLogger
 from models.asset import Asset
-from models.memo import THORMemo, ActionType
+from models.memo import ActionType
 from models.price import PriceHolder
 from models.trade_acc import AlertTradeAccountAction
 
@@ -28,7 +28,7 @@ class TradeAccEventDecoder(WithLogger, INotified, WithDelegates):
 
         # Observed In transactions
         for observed_tx in block.all_observed_txs:
-            if tr_dep_event := self._make_deposit(observed_tx, block.block_no, ph):
+            if tr_dep_event := self._make_deposit(observed_tx, block, ph):
                 all_events[observed_tx.tx_id] = tr_dep_event
 
         # We need to check all transactions in the block for MsgDeposit and plain "sends" with memo
@@ -36,7 +36,7 @@ class TradeAccEventDecoder(WithLogger, INotified, WithDelegates):
             for message in tx.messages:
                 if message.type == ThorMessageType.MsgDeposit or message.is_send:
                     # trade withdraw
-                    tx_events = self._make_withdrawals(message, block.block_no, tx.tx_hash, ph)
+                    tx_events = self._make_withdrawals(message, block, tx.tx_hash, ph)
                     for event in tx_events:
                         all_events[event.tx_hash] = event
 
@@ -48,11 +48,13 @@ class TradeAccEventDecoder(WithLogger, INotified, WithDelegates):
             await self.pass_data_to_listeners(event)
         return unique_events
 
-    def _make_deposit(self, obs_tx: ThorObservedTx, height, ph: PriceHolder) -> Optional[AlertTradeAccountAction]:
+    def _make_deposit(self, obs_tx: ThorObservedTx, block: BlockResult,
+                      ph: PriceHolder) -> Optional[AlertTradeAccountAction]:
         if not obs_tx.is_inbound:
             return None
 
-        memo = THORMemo.parse_memo(obs_tx.memo, no_raise=True)
+        height = block.block_no
+        memo = block.parse_memo(obs_tx.memo)
         if not memo or memo.action != ActionType.TRADE_ACC_DEPOSIT:
             return None
 
@@ -81,8 +83,10 @@ class TradeAccEventDecoder(WithLogger, INotified, WithDelegates):
             height=height,
         )
 
-    def _make_withdrawals(self, message: ThorTxMessage, height, tx_hash, ph: PriceHolder) -> Iterable[AlertTradeAccountAction]:
-        memo = THORMemo.parse_memo(message.memo, no_raise=True)
+    def _make_withdrawals(self, message: ThorTxMessage, block: BlockResult, tx_hash,
+                          ph: PriceHolder) -> Iterable[AlertTradeAccountAction]:
+        height = block.block_no
+        memo = block.parse_memo(message.memo)
         if not memo or memo.action != ActionType.TRADE_ACC_WITHDRAW:
             return
 
@@ -1,5 +1,6 @@
 import hashlib
 import math
+from typing import Iterable, List, Callable, Optional
 
 
 class BloomFilter:
@@ -38,25 +39,66 @@ class BloomFilter:
         sha3.update(f"{item}{seed}".encode('utf-8'))
         return sha3.hexdigest()
 
+    def positions(self, item) -> List[int]:
+        return [int(self.get_sha3_hash(item, i), 16) % self.size for i in range(self.hash_count)]
+
+    # BITFIELD gets/sets many bits in one command; big batches are split into several commands of one pipeline
+    BITFIELD_MAX_OPS = 10_000
+
+    def _queue_bitfield(self, pipe, op: str, positions: List[int]) -> int:
+        n_commands = 0
+        for i in range(0, len(positions), self.BITFIELD_MAX_OPS):
+            args = []
+            for position in positions[i:i + self.BITFIELD_MAX_OPS]:
+                args += [op, 'u1', position, 1] if op == 'SET' else [op, 'u1', position]
+            pipe.execute_command('BITFIELD', self.redis_key, *args)
+            n_commands += 1
+        return n_commands
+
+    async def add_many(self, items: Iterable, extra: Optional[Callable] = None):
+        """
+        Add all items in one round trip.
+        extra(pipe) may queue more commands into the same pipeline.
+        """
+        positions = [p for item in items for p in self.positions(item)]
+        async with self.redis.pipeline(transaction=False) as pipe:
+            self._queue_bitfield(pipe, 'SET', positions)
+            if extra:
+                extra(pipe)
+            await pipe.execute()
+
+    async def contains_many(self, items: Iterable, extra: Optional[Callable] = None) -> List[bool]:
+        """
+        Check all items in one round trip.
+        extra(pipe) may queue more commands into the same pipeline, their results are ignored.
+        """
+        items = list(items)
+        positions = [self.positions(item) for item in items]
+        flat = [p for item_positions in positions for p in item_positions]
+        async with self.redis.pipeline(transaction=False) as pipe:
+            n_bitfield_commands = self._queue_bitfield(pipe, 'GET', flat)
+            if extra:
+                extra(pipe)
+            results = await pipe.execute()
+
+        bits = [bit for chunk in results[:n_bitfield_commands] for bit in chunk]
+        answers, offset = [], 0
+        for item_positions in positions:
+            answers.append(all(bits[offset:offset + len(item_positions)]))
+            offset += len(item_positions)
+        return answers
+
     async def add(self, item):
         """
         Add an item to the Bloom filter.
         """
-        for i in range(self.hash_count):
-            sha3_hash = self.get_sha3_hash(item, i)
-            bit_position = int(sha3_hash, 16) % self.size
-            await self.redis.setbit(self.redis_key, bit_position, 1)
+        await self.add_many([item])
 
     async def contains(self, item):
         """
         Check if an item is in the Bloom filter.
         """
-        for i in range(self.hash_count):
-            sha3_hash = self.get_sha3_hash(item, i)
-            bit_position = int(sha3_hash, 16) % self.size
-            if not await self.redis.getbit(self.redis_key, bit_position):
-                return False
-        return True
+        return (await self.contains_many([item]))[0]
 
     async def bit_count(self):
         """
@@ -97,12 +139,18 @@ class BloomFilterV2(BloomFilter):
         for i in range(self.hash_count):
             yield (h1 + i * h2) % self.size
 
-    async def add(self, item):
-        for position in self._hashes(item):
-            await self.redis.setbit(self.redis_key, position, 1)
+    def positions(self, item) -> List[int]:
+        return list(self._hashes(item))
 
-    async def contains(self, item):
-        for position in self._hashes(item):
-            if not await self.redis.getbit(self.redis_key, position):
-                return False
-        return True
+
+class BloomFilterV3(BloomFilter):
+    """
+    Double hashing over a single 128-bit BLAKE2b digest: h1 + i * h2 (mod m) for i in 0..k-1.
+    One cheap hash per item instead of k SHA3 digests parsed as big ints.
+    """
+
+    def positions(self, item) -> List[int]:
+        digest = hashlib.blake2b(str(item).encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
@@ -0,0 +1,99 @@
+"""
+Compact encoding for a table of equally long columns (e.g. the history of one pool: heights + numbers).
+Integer columns are delta-encoded (monotonic heights and slowly changing balances become tiny numbers),
+string columns are dictionary-encoded, integers beyond int64 (an object column of ints) are stored raw
+as decimal strings, then everything is zlib-compressed.
+The result is an ASCII string, so it can be stored in Redis with decode_responses=True.
+"""
+import base64
+import json
+import struct
+import zlib
+from typing import Dict, Sequence
+
+import numpy as np
+
+COLUMNAR_MAGIC = 'C1:'
+
+_KIND_DELTA = 'd'
+_KIND_RAW = 'r'
+_KIND_DICT = 's'
+_KIND_BIG_INT = 'b'
+
+_HEADER_LEN = struct.Struct('<I')
+
+
+class ColumnarError(ValueError):
+    pass
+
+
+def _as_column(values) -> np.ndarray:
+    if isinstance(values, np.ndarray):
+        return values
+    values = list(values)
+    if values and isinstance(values[0], str):
+        return np.array(values, dtype=object)
+    return np.asarray(values)
+
+
+def _is_big_int_column(col: np.ndarray) -> bool:
+    return col.dtype == object and len(col) > 0 and all(
+        isinstance(v, (int, np.integer)) and not isinstance(v, bool) for v in col
+    )
+
+
+def encode_columns(columns: Dict[str, Sequence], level: int = 6) -> str:
+    header_cols, buffers = [], []
+    n = None
+    for name, values in columns.items():
+        col = _as_column(values)
+        if n is None:
+            n = len(col)
+        elif len(col) != n:
+            raise ColumnarError(f'Column {name!r} has {len(col)} rows, expected {n}')
+
+        if _is_big_int_column(col):
+            data = json.dumps([str(int(v)) for v in col], separators=(',', ':')).encode()
+            header_cols.append([name, _KIND_BIG_INT, 'uint8', len(data)])
+        elif col.dtype == object or col.dtype.kind in 'US':
+            table, codes = np.unique(col.astype(str), return_inverse=True)
+            data = codes.astype(np.uint16).tobytes()
+            header_cols.append([name, _KIND_DICT, 'uint16', len(data), table.tolist()])
+        elif col.dtype.kind in 'iu':
+            data = np.diff(col.astype(np.int64), prepend=np.int64(0)).tobytes()
+            header_cols.append([name, _KIND_DELTA, 'int64', len(data)])
+        else:
+            data = np.ascontiguousarray(col).tobytes()
+            header_cols.append([name, _KIND_RAW, col.dtype.str, len(data)])
+        buffers.append(data)
+
+    header = json.dumps({'n': n or 0, 'cols': header_cols}, separators=(',', ':')).encode()
+    raw = _HEADER_LEN.pack(len(header)) + header + b''.join(buffers)
+    return COLUMNAR_MAGIC + base64.b64encode(zlib.compress(raw, level)).decode('ascii')
+
+
+def decode_columns(blob: str) -> Dict[str, np.ndarray]:
+    if not blob or not blob.startswith(COLUMNAR_MAGIC):
+        raise ColumnarError('Not a columnar chunk')
+    try:
+        raw = zlib.decompress(base64.b64decode(blob[len(COLUMNAR_MAGIC):]))
+        header_len, = _HEADER_LEN.unpack_from(raw)
+        offset = _HEADER_LEN.size
+        header = json.loads(raw[offset:offset + header_len])
+    except (zlib.error, struct.error, ValueError) as e:
+        raise ColumnarError(f'Corrupted columnar chunk: {e}') from e
+
+    offset += header_len
+    columns = {}
+    for name, kind, dtype, size, *extra in header['cols']:
+        data = np.frombuffer(raw, dtype=np.dtype(dtype), count=size // np.dtype(dtype).itemsize, offset=offset)
+        offset += size
+        if kind == _KIND_DELTA:
+            columns[name] = np.cumsum(data, dtype=np.int64)
+        elif kind == _KIND_BIG_INT:
+            columns[name] = np.array([int(v) for v in json.loads(data.tobytes())], dtype=object)
+        elif kind == _KIND_DICT:
+            columns[name] = np.array(extra[0], dtype=object)[data] if len(data) else np.array([], dtype=object)
+        else:
+            columns[name] = data.copy()
+    return columns
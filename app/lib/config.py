@@ -94,6 +94,9 @@ class SubConfig:
         return str(self._root_config)
 
     def __getattr__(self, item) -> 'SubConfig':
+        if item.startswith('__') or item == '_root_config':
+            # not a config key; lets pickle/copy probe for special methods on a half-built instance
+            raise AttributeError(item)
         return self.get(item)
 
     def __getitem__(self, item) -> 'SubConfig':
@@ -1,17 +1,37 @@
 import asyncio
-from typing import List
+import uuid
+from typing import List, Dict, Set, Optional, Iterable
 
 from redis.asyncio import Redis
 
+from lib.date_utils import now_ts
 from lib.db import DB
+from lib.interchan import PubSubChannel
+from lib.logs import WithLogger
 
 
-class ManyToManySet:
-    def __init__(self, db: DB, left_prefix: str, right_prefix: str):
+class ManyToManySet(WithLogger):
+    DEFAULT_INDEX_TTL = 600.0
+
+    def __init__(self, db: DB, left_prefix: str, right_prefix: str, local_index=False, index_ttl=DEFAULT_INDEX_TTL):
+        super().__init__()
         self.db = db
         self.left_prefix = left_prefix
         self.right_prefix = right_prefix
 
+        # Optional in-process copy of the right -> lefts side (e.g. address -> users).
+        # Changes made by other processes come through the pub/sub channel;
+        # the whole index is reloaded after index_ttl just in case a message was lost.
+        self.local_index = local_index
+        self.index_ttl = index_ttl
+        self._index: Optional[Dict[str, Set[str]]] = None
+        self._index_loaded_at = 0.0
+        self._index_lock = asyncio.Lock()
+        self._origin = uuid.uuid4().hex
+        # every instance announces its changes, only those with the local index listen
+        self._changes = PubSubChannel(db, f'set:{left_prefix}-2-{right_prefix}:__changed', self._on_changed)
+        self._listening = False
+
     async def _redis(self) -> Redis:
         return await self.db.get_redis()
 
@@ -28,20 +48,26 @@ class ManyToManySet:
         keys = lefts + rights
         if keys:
             await r.delete(*keys)
+        await self._changed(None)
 
     async def associate_many(self, lefts: List[str], rights: List[str]):
+        if not lefts or not rights:
+            return
         r = await self._redis()
-        if rights:
+        async with r.pipeline(transaction=False) as pipe:
             for left_one in lefts:
-                await r.sadd(self.left_key(left_one), *rights)
-        if lefts:
+                pipe.sadd(self.left_key(left_one), *rights)
             for right_one in rights:
-                await r.sadd(self.right_key(right_one), *lefts)
+                pipe.sadd(self.right_key(right_one), *lefts)
+            await pipe.execute()
+        await self._changed(rights)
 
     async def associate(self, left_one: str, right_one: str):
         await self.associate_many([left_one], [right_one])
 
     async def all_lefts_for_right_one(self, right_one: str):
+        if self.local_index:
+            return set((await self._get_index()).get(right_one, ()))
         r = await self._redis()
         return set(await r.smembers(self.right_key(right_one)))
 
@@ -56,7 +82,6 @@ class ManyToManySet:
     @staticmethod
     async def all_items_for_many_other_side(inputs, getter: callable, flatten=True):
         inputs = set(inputs)
-        # fixme: use MGET?
         groups = await asyncio.gather(
             *(getter(item) for item in inputs)
         )
@@ -65,11 +90,32 @@ class ManyToManySet:
         else:
             return {name: group for name, group in zip(inputs, groups)}
 
+    async def _smembers_many(self, keys: List[str]) -> List[Set[str]]:
+        if not keys:
+            return []
+        r = await self._redis()
+        async with r.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.smembers(key)
+            return [set(group) for group in await pipe.execute()]
+
+    async def _all_for_many(self, inputs: Iterable, key_gen, flatten=True):
+        inputs = list(set(inputs))
+        groups = await self._smembers_many([key_gen(item) for item in inputs])
+        if flatten:
+            return set(item for group in groups for item in group)
+        else:
+            return {name: group for name, group in zip(inputs, groups)}
+
     async def all_lefts_for_many_rights(self, rights: iter, flatten=True):
-        return await self.all_items_for_many_other_side(rights, self.all_lefts_for_right_one, flatten)
+        if self.local_index:
+            index = await self._get_index()
+            groups = {right_one: set(index.get(right_one, ())) for right_one in set(rights)}
+            return set().union(*groups.values()) if flatten else groups
+        return await self._all_for_many(rights, self.right_key, flatten)
 
     async def all_rights_for_many_lefts(self, lefts: iter, flatten=True):
-        return await self.all_items_for_many_other_side(lefts, self.all_rights_for_left_one, flatten)
+        return await self._all_for_many(lefts, self.left_key, flatten)
 
     async def all_rights_for_left_one(self, left_one: str):
         r = await self._redis()
@@ -100,22 +146,85 @@ class ManyToManySet:
     async def remove_association(self, item: str, is_item_left: bool):
         r = await self._redis()
 
-        getter = self.all_rights_for_left_one if is_item_left else self.all_lefts_for_right_one
-        all_items = await getter(item)
-        other_side_key = self.left_key(item) if is_item_left else self.right_key(item)
-        if all_items:
-            await r.srem(other_side_key, *all_items)
-        for other_item in all_items:
-            this_side_key = self.right_key(other_item) if is_item_left else self.left_key(other_item)
-            await r.srem(this_side_key, item)
+        this_side_key = self.left_key(item) if is_item_left else self.right_key(item)
+        all_items = set(await r.smembers(this_side_key))
+        if not all_items:
+            return
+
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.srem(this_side_key, *all_items)
+            for other_item in all_items:
+                other_side_key = self.right_key(other_item) if is_item_left else self.left_key(other_item)
+                pipe.srem(other_side_key, item)
+            await pipe.execute()
+        await self._changed(list(all_items) if is_item_left else [item])
 
     async def remove_one_item(self, left_item, right_item):
         r = await self._redis()
-        await r.srem(self.left_key(left_item), right_item)
-        await r.srem(self.right_key(right_item), left_item)
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.srem(self.left_key(left_item), right_item)
+            pipe.srem(self.right_key(right_item), left_item)
+            await pipe.execute()
+        await self._changed([right_item])
 
     async def remove_all_rights(self, left_one: str):
         await self.remove_association(left_one, is_item_left=True)
 
     async def remove_all_lefts(self, right_one: str):
         await self.remove_association(right_one, is_item_left=False)
+
+    # ---- local index ----
+
+    async def _get_index(self) -> Dict[str, Set[str]]:
+        if self._index is None or now_ts() - self._index_loaded_at > self.index_ttl:
+            async with self._index_lock:
+                if self._index is None or now_ts() - self._index_loaded_at > self.index_ttl:
+                    await self.load_index()
+        return self._index
+
+    async def load_index(self):
+        """
+        Loads the whole right -> lefts side into memory and starts listening to changes of other processes.
+        """
+        if not self._listening:
+            self._changes.start()
+            self._listening = True
+
+        rights = list(await self.all_rights())
+        groups = await self._smembers_many([self.right_key(right_one) for right_one in rights])
+        self._index = {right_one: group for right_one, group in zip(rights, groups) if group}
+        self._index_loaded_at = now_ts()
+        self.logger.info(f'Loaded {len(self._index)} {self.right_prefix} items into the local index.')
+
+    async def _reload_index_items(self, rights: Optional[List[str]]):
+        if self._index is None:
+            return
+        if rights is None:
+            await self.load_index()
+            return
+        groups = await self._smembers_many([self.right_key(right_one) for right_one in rights])
+        for right_one, group in zip(rights, groups):
+            if group:
+                self._index[right_one] = group
+            else:
+                self._index.pop(right_one, None)
+
+    async def _changed(self, rights: Optional[List[str]]):
+        """
+        rights: the right items whose lefts have changed; None means everything.
+        """
+        await self._reload_index_items(rights)
+        try:
+            await self._changes.post_message({'origin': self._origin, 'rights': rights})
+        except Exception as e:
+            self.logger.error(f'Failed to publish the change of {self.right_prefix} items: {e!r}')
+
+    async def _on_changed(self, _channel, data: dict):
+        if data.get('origin') != self._origin:
+            await self._reload_index_items(data.get('rights'))
+
+    async def stop_index(self):
+        if self._listening:
+            await self._changes.stop()
+            self._listening = False
+        self._index = None
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import time
 from abc import ABC, abstractmethod
@@ -17,14 +18,36 @@ class WithDelegates:
     def __init__(self):
         super().__init__()
         self.delegates = []  # list for fixed order
+        self._delegate_prerequisites = {}  # id(delegate) -> delegates that must finish before it (concurrent mode)
+        self.concurrent_dispatch = False
+        self.delegate_timeout = None  # sec, only for the concurrent mode
 
-    def add_subscriber(self, delegate: INotified):
+    def add_subscriber(self, delegate: INotified, after=None):
         if not delegate:
             raise ValueError("Delegate is None")
         if delegate is self:
             raise ValueError("Cannot add self as delegate")
+
+        if after is not None:
+            after = list(after) if isinstance(after, (list, tuple, set)) else [after]
+            for prerequisite in after:
+                # prerequisites must be subscribed before, so there can be no dependency cycles
+                if prerequisite not in self.delegates:
+                    raise ValueError(f"Delegate {prerequisite} must be subscribed before {delegate}")
+
         if delegate not in self.delegates:
             self.delegates.append(delegate)
+            if after:
+                self._delegate_prerequisites[id(delegate)] = after
+        return self
+
+    def set_concurrent_dispatch(self, enabled=True, timeout=None):
+        """
+        In the concurrent mode all delegates receive the data at the same time (asyncio.gather),
+        except those that were subscribed with "after=..." – they wait for their prerequisites to finish.
+        """
+        self.concurrent_dispatch = enabled
+        self.delegate_timeout = timeout
         return self
 
     async def handle_error(self, e, sender=None):
@@ -32,6 +55,41 @@ class WithDelegates:
         for delegate in self.delegates:
             await delegate.on_error(sender, e)
 
+    async def _call_delegate(self, delegate: INotified, sender, data, summary: dict, timeout=None):
+        if not await self.is_passage_allowed(delegate):
+            logging.warning(f"Passage not allowed to delegate {delegate}")
+            return
+
+        t0 = time.monotonic()
+
+        try:
+            if timeout:
+                await asyncio.wait_for(delegate.on_data(sender, data), timeout)
+            else:
+                await delegate.on_data(sender, data)
+        except asyncio.TimeoutError:
+            logging.error(f"Delegate {delegate.__class__.__name__} timed out after {timeout:.1f} sec")
+        except Exception as e:
+            logging.exception(f"Exception in delegate {delegate.__class__.__name__}: {e!r}")
+
+        t1 = time.monotonic()
+        summary[str(delegate)] = t1 - t0
+
+    async def _pass_data_concurrently(self, data, sender, summary: dict):
+        tasks = {}
+
+        async def run(delegate):
+            prerequisites = self._delegate_prerequisites.get(id(delegate), ())
+            if prerequisites := [tasks[id(p)] for p in prerequisites if id(p) in tasks]:
+                await asyncio.gather(*prerequisites, return_exceptions=True)
+            await self._call_delegate(delegate, sender, data, summary, self.delegate_timeout)
+
+        # all the tasks are created before any of them starts, so "tasks" is complete by the time it is used
+        for delegate in self.delegates:
+            tasks[id(delegate)] = asyncio.create_task(run(delegate))
+
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
     async def pass_data_to_listeners(self, data, sender=None):
         if not data:
             return None
@@ -39,21 +97,12 @@ class WithDelegates:
 
         summary = {}
 
-        for delegate in self.delegates:
-            if not await self.is_passage_allowed(delegate):
-                logging.warning(f"Passage not allowed to delegate {delegate}")
-                continue
-
-            delegate: INotified
-            t0 = time.monotonic()
-
-            try:
-                await delegate.on_data(sender, data)
-            except Exception as e:
-                logging.exception(f"Exception in delegate {delegate.__class__.__name__}: {e!r}")
-
-            t1 = time.monotonic()
-            summary[str(delegate)] = t1 - t0
+        if self.concurrent_dispatch and len(self.delegates) > 1:
+            await self._pass_data_concurrently(data, sender, summary)
+        else:
+            for delegate in self.delegates:
+                delegate: INotified
+                await self._call_delegate(delegate, sender, data, summary)
 
         return summary
 
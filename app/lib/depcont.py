@@ -42,6 +42,8 @@ class DepContainer:
     loc_man = None  # type: 'LocalizationManager'
     broadcaster = None  # type: 'Broadcaster'
     alert_presenter = None
+    render_pool = None  # type: 'RenderPool'
+    picture_cache = None  # type: 'PictureCache'
     data_controller = None
     flagship: Flagship = None
 
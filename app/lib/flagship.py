@@ -1,9 +1,12 @@
-from typing import List
+import asyncio
+from typing import List, Dict, Tuple
 
 from pydantic import BaseModel
+from redis import WatchError
 
 from lib.date_utils import now_ts, format_time_ago
 from lib.db import DB
+from lib.interchan import PubSubChannel
 from lib.logs import WithLogger
 
 
@@ -32,12 +35,24 @@ class FlagDescriptor(BaseModel):
 
 
 class Flagship(WithLogger):
-    def __init__(self, db: DB):
+    DEFAULT_CACHE_TTL = 60.0
+    DEFAULT_FLUSH_INTERVAL = 30.0
+
+    def __init__(self, db: DB, cache_ttl=DEFAULT_CACHE_TTL):
         super().__init__()
         self.db = db
         self.default_value = True
 
+        # flag_name -> (flag, time when loaded). Remote changes come through the pub/sub channel,
+        # the TTL is just a safety net in case a message is lost or the listener is not running
+        self.cache_ttl = cache_ttl
+        self._cache: Dict[str, Tuple[FlagDescriptor, float]] = {}
+        self._pending_access: Dict[str, float] = {}  # flag_name -> last access ts, not yet saved to Redis
+        self._invalidation = PubSubChannel(db, self.CHANNEL_CHANGED, self._on_flag_changed)
+        self._flush_task = None
+
     DB_KEY_PREFIX = 'Flagship:'
+    CHANNEL_CHANGED = 'Flagship:__changed'
 
     def key(self, flag_name: str) -> str:
         return f'{self.DB_KEY_PREFIX}{flag_name}'
@@ -74,24 +89,114 @@ class Flagship(WithLogger):
         json_data = flag.model_dump_json()
         await self.db.redis.set(key, json_data)
 
-    async def is_flag_set(self, flag_name: str) -> bool:
-        flag = await self.get_flag_object(flag_name)
-        if flag:
-            flag.access()
-            await self.save_flag_object(flag_name, flag)
-            return flag.value
+    def _get_cached(self, flag_name: str) -> FlagDescriptor | None:
+        if entry := self._cache.get(flag_name):
+            flag, loaded_at = entry
+            if now_ts() - loaded_at < self.cache_ttl:
+                return flag
+            del self._cache[flag_name]
+        return None
+
+    def _put_cached(self, flag_name: str, flag: FlagDescriptor | None):
+        if flag is None:
+            self._cache.pop(flag_name, None)
+        else:
+            self._cache[flag_name] = (flag, now_ts())
+
+    def invalidate(self, flag_name: str | None = None):
+        if flag_name:
+            self._cache.pop(flag_name, None)
         else:
-            await self.set_flag(flag_name, self.default_value)
-            return self.default_value
+            self._cache.clear()
+
+    async def _notify_changed(self, flag_name: str):
+        if not self.db.redis:
+            return
+        try:
+            await self._invalidation.post_message({'flag': flag_name})
+        except Exception as e:
+            self.logger.error(f'Failed to publish flag change for "{flag_name}": {e}')
+
+    async def _on_flag_changed(self, _channel, data: dict):
+        self.invalidate(data.get('flag'))
+
+    async def is_flag_set(self, flag_name: str) -> bool:
+        flag = self._get_cached(flag_name)
+        if flag is None:
+            flag = await self.get_flag_object(flag_name)
+            if flag is None:  # (!) FlagDescriptor is falsy when its value is False
+                await self.set_flag(flag_name, self.default_value)
+                return self.default_value
+            self._put_cached(flag_name, flag)
+
+        # the access timestamp is saved in background (see flush_access_times)
+        flag.access()
+        self._pending_access[flag_name] = flag.last_access_ts
+        return flag.value
 
     async def set_flag(self, flag_name: str, value: bool):
         flag = await self.get_flag_object(flag_name)
-        if not flag:
+        if flag is None:
             flag = FlagDescriptor(value=value, last_changed_ts=now_ts(), last_access_ts=now_ts(),
                                   full_path=flag_name)
         else:
             flag.change_to(value)
         await self.save_flag_object(flag_name, flag)
+        self._put_cached(flag_name, flag)
+        await self._notify_changed(flag_name)
+
+    async def flush_access_times(self):
+        """
+        Saves the access timestamps collected by is_flag_set in one transaction.
+        If any of the flags is changed meanwhile, nothing is written and the timestamps stay pending.
+        """
+        if not self._pending_access or not self.db.redis:
+            return 0
+
+        pending = self._pending_access
+        self._pending_access = {}
+        names = list(pending.keys())
+        keys = [self.key(name) for name in names]
+
+        try:
+            async with self.db.redis.pipeline(transaction=True) as pipe:
+                await pipe.watch(*keys)
+                values = await pipe.mget(keys)
+                pipe.multi()
+                updated = 0
+                for name, key, json_data in zip(names, keys, values):
+                    if not json_data:
+                        continue  # deleted meanwhile
+                    flag = FlagDescriptor.model_validate_json(json_data)
+                    flag.last_access_ts = max(flag.last_access_ts, pending[name])
+                    pipe.set(key, flag.model_dump_json())
+                    updated += 1
+                await pipe.execute()
+                return updated
+        except WatchError:
+            self.logger.info('Flags changed while flushing the access times, will retry later')
+        except Exception as e:
+            self.logger.error(f'Failed to flush flag access times: {e!r}')
+
+        # put them back, newer accesses win
+        for name, ts in pending.items():
+            self._pending_access[name] = max(ts, self._pending_access.get(name, 0.0))
+        return 0
+
+    async def _flush_loop(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush_access_times()
+
+    def run_in_background(self, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        """
+        Starts listening to the flag changes made by other processes (e.g. the dashboard)
+        and periodically saves the access timestamps.
+        """
+        if self._flush_task:
+            return
+        self._invalidation.start()
+        self._flush_task = asyncio.create_task(self._flush_loop(flush_interval))
 
     async def get_all(self) -> List[FlagDescriptor]:
         if not self.db.redis:
@@ -134,4 +239,7 @@ class Flagship(WithLogger):
             return
 
         key = self.key(flag_name)
-        await self.db.redis.delete(key)
\ No newline at end of file
+        await self.db.redis.delete(key)
+        self._put_cached(flag_name, None)
+        self._pending_access.pop(flag_name, None)
+        await self._notify_changed(flag_name)
\ No newline at end of file
@@ -1,13 +1,17 @@
 import asyncio
+import base64
 import json
+from typing import Optional, List
 
 from lib.logs import WithLogger
+from lib.picture_cache import PictureCache
 from lib.utils import random_hex
 
 
 class InfographicRendererRPC(WithLogger):
-    def __init__(self, deps, url='http://127.0.0.1:8404/render', timeout=5.0):
+    def __init__(self, deps, url='http://127.0.0.1:8404/render', timeout=5.0, cache: Optional[PictureCache] = None):
         super().__init__()
+        self.cache = cache
         self._count = 10
         self.timeout = timeout
         self._step_timeout = 1.0
@@ -16,15 +20,79 @@ class InfographicRendererRPC(WithLogger):
         self.dbg_log_full_requests = False
 
     async def render(self, template_name: str, parameters: dict):
+        if self.cache:
+            # identical parameters give an identical picture, no matter the language or the channel
+            return await self.cache.get_or_render(
+                template_name, parameters,
+                lambda: self._render_with_retries(template_name, parameters)
+            )
+        return await self._render_with_retries(template_name, parameters)
+
+    @property
+    def batch_url(self):
+        # http://renderer:8404/render => http://renderer:8404/render_batch
+        return self.url.rstrip('/').rsplit('/', 1)[0] + '/render_batch'
+
+    async def render_batch(self, template_name: str, parameters_list: List[dict]) -> List[Optional[bytes]]:
+        """
+        Renders one template with several parameter sets in a single request to the renderer.
+        Cached pictures are not requested again. A failed item is None.
+        """
+        results: List[Optional[bytes]] = [None] * len(parameters_list)
+        to_render = {}  # cache key (or index if not cacheable) => list of indices
+        for i, parameters in enumerate(parameters_list):
+            key = self.cache.make_key(template_name, parameters) if self.cache else None
+            if key is not None:
+                cached = await self.cache.get(key)
+                if cached is not None:
+                    results[i] = cached
+                    continue
+            to_render.setdefault(key if key is not None else i, []).append(i)
+
+        if to_render:
+            groups = list(to_render.items())
+            images = await self._with_retries(
+                template_name,
+                lambda: self._render_batch(template_name, [parameters_list[indices[0]] for _, indices in groups])
+            )
+            for (key, indices), image in zip(groups, images):
+                for i in indices:
+                    results[i] = image
+                if self.cache and image and isinstance(key, str):
+                    await self.cache.put(key, image)
+        return results
+
+    async def _render_with_retries(self, template_name: str, parameters: dict):
+        return await self._with_retries(template_name, lambda: self._render(template_name, parameters))
+
+    async def _with_retries(self, template_name: str, func):
         for attempt in range(self._count):
             try:
-                return await self._render(template_name, parameters)
+                return await func()
             except Exception as e:
                 if attempt == self._count - 1:
                     raise
                 self.logger.error(f'#{attempt}: Failed to render {template_name = }. {e = }')
                 await asyncio.sleep(self._step_timeout)
 
+    async def _render_batch(self, template_name: str, parameters_list: List[dict]) -> List[Optional[bytes]]:
+        message = {
+            'template_name': template_name,
+            'parameters_list': parameters_list,
+        }
+
+        async with self.deps.session.post(self.batch_url, json=message) as response:
+            self.logger.info(f'Rendering a batch of {len(parameters_list)} {template_name = }')
+            if response.status != 200:
+                text = await response.text()
+                raise ValueError(f'Failed to render a batch. Code: {response.status}. Result: {text!r}')
+            data = await response.json()
+
+        for error in data.get('errors') or []:
+            if error:
+                self.logger.error(f'Failed to render {template_name = } in a batch: {error}')
+        return [base64.b64decode(image) if image else None for image in data['images']]
+
     async def _render(self, template_name: str, parameters: dict):
         correlation_id = str(random_hex())
 
@@ -42,6 +42,54 @@ class LRUCache:
         return self._cache.values()
 
 
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded dict whose entries expire after `ttl` seconds. When full, the oldest entry is dropped.
+    Stored values may be falsy (e.g. negative lookup results), so `get` takes a default.
+    """
+
+    def __init__(self, capacity: int, ttl: float):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._cache = {}  # key -> (expires_at, value), in insertion order
+
+    def get(self, key, default=None):
+        entry = self._cache.get(key)
+        if entry is None:
+            return default
+        if entry[0] < now_ts():
+            del self._cache[key]
+            return default
+        return entry[1]
+
+    def set(self, key, value, ttl=None):
+        if self.capacity <= 0:
+            return
+        self._cache.pop(key, None)
+        while len(self._cache) >= self.capacity:
+            del self._cache[next(iter(self._cache))]
+        self._cache[key] = (now_ts() + (self.ttl if ttl is None else ttl), value)
+
+    def pop(self, key, default=None):
+        entry = self._cache.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        self._cache.clear()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __repr__(self):
+        return f'TTLCache({self.capacity}, ttl={self.ttl}, size={len(self._cache)})'
+
+
 class WindowAverage:
     def __init__(self, window_size: int):
         self._values = deque(maxlen=window_size)
@@ -0,0 +1,116 @@
+import base64
+import datetime
+import hashlib
+import json
+from decimal import Decimal
+from enum import Enum
+from typing import Optional, Callable, Awaitable
+
+from api.aionode.coalesce import SingleFlight
+from lib.date_utils import now_ts
+from lib.db import DB
+from lib.logs import WithLogger
+from lib.lru import LRUCache
+from lib.utils import recursive_asdict
+
+
+def _stable_json(o):
+    # json.dumps fallback; it must never produce an address-based repr, or different data could share a key
+    if isinstance(o, (set, frozenset)):
+        return sorted(o, key=str)
+    if isinstance(o, (datetime.date, datetime.time, Decimal, Enum)):
+        return str(o)
+    if hasattr(o, '__dict__'):
+        return {'__class__': type(o).__qualname__, **vars(o)}
+    raise TypeError(f'{type(o).__name__} is not hashable for the picture cache')
+
+
+class PictureCache(WithLogger):
+    """
+    Rendered pictures (PNG bytes) keyed by a hash of (template, parameters, locale).
+    Entries live in memory (LRU) and, if a DB is given, in Redis with the same TTL,
+    so that other processes and restarts can reuse them.
+    Concurrent requests for the same key wait for a single render.
+    """
+
+    KEY_PREFIX = 'PictureCache'
+
+    DEFAULT_MAX_ITEMS = 64
+    DEFAULT_TTL = 120.0
+
+    def __init__(self, db: Optional[DB] = None, max_items=DEFAULT_MAX_ITEMS, ttl=DEFAULT_TTL):
+        super().__init__()
+        self.db = db
+        self.ttl = float(ttl)
+        self._memory = LRUCache(max_items)
+        self._single_flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(template: str, parameters=None, locale: str = '') -> Optional[str]:
+        try:
+            plain = recursive_asdict(parameters, add_properties=False, handle_datetime=True)
+            blob = json.dumps([template, plain, locale], sort_keys=True, default=_stable_json, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return None
+        return hashlib.blake2b(blob.encode(), digest_size=16).hexdigest()
+
+    def _redis_key(self, key):
+        return f'{self.KEY_PREFIX}:{key}'
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._memory.get(key)
+        if entry:
+            ts, data = entry
+            if now_ts() - ts < self.ttl:
+                return data
+
+        if self.db:
+            try:
+                r = await self.db.get_redis()
+                raw = await r.get(self._redis_key(key))
+                if raw:
+                    data = base64.b64decode(raw)
+                    self._memory.set(key, (now_ts(), data))
+                    return data
+            except Exception as e:
+                self.logger.warning(f'Failed to read picture {key} from Redis: {e!r}')
+
+    async def put(self, key: str, data: bytes):
+        if not data or self.ttl <= 0:
+            return
+        self._memory.set(key, (now_ts(), data))
+        if self.db:
+            try:
+                r = await self.db.get_redis()
+                await r.set(self._redis_key(key), base64.b64encode(data).decode(), ex=max(1, int(self.ttl)))
+            except Exception as e:
+                self.logger.warning(f'Failed to save picture {key} to Redis: {e!r}')
+
+    async def get_or_render(self, template: str, parameters, render: Callable[[], Awaitable[bytes]],
+                            locale: str = '') -> bytes:
+        """
+        Returns the cached picture or calls `render()` (once for all concurrent callers) and caches the result.
+        """
+        key = self.make_key(template, parameters, locale)
+        if key is None:
+            self.logger.warning(f'Parameters of {template!r} can not be hashed; not caching it')
+            return await render()
+
+        data = await self.get(key)
+        if data is not None:
+            self.hits += 1
+            return data
+
+        if key in self._single_flight:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        async def render_and_put():
+            picture = await render()
+            await self.put(key, picture)
+            return picture
+
+        return await self._single_flight.do(key, render_and_put)
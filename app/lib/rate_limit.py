@@ -1,8 +1,47 @@
-from lib.cooldown import Cooldown
+import asyncio
+import time
+
 from lib.db import DB
 
+# GCRA rate limiter + cooldown in one atomic step on the Redis side.
+# KEYS[1] = TAT (theoretical arrival time) key, KEYS[2] = cooldown key
+# ARGV = limit, period (sec), cooldown (sec, 0 = no cooldown)
+_RATE_LIMIT_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) * 1e-6
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local cd = tonumber(ARGV[3])
+
+if cd > 0 then
+    local cd_until = tonumber(redis.call('GET', KEYS[2]) or '0') or 0
+    if now < cd_until then
+        return 'on_cd'
+    end
+end
+
+local separation = period / limit
+local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or '0') or 0, now)
+if tat - now <= period - separation then
+    local new_tat = tat + separation
+    redis.call('SET', KEYS[1], string.format('%.6f', new_tat), 'PX', math.ceil((new_tat - now) * 1000) + 1000)
+    return 'good'
+end
+
+if cd > 0 then
+    redis.call('SET', KEYS[2], string.format('%.6f', now + cd), 'PX', math.ceil(cd * 1000))
+end
+return 'hit_limit'
+"""
+
 
 class RateLimiter:
+    ON_COOLDOWN = 'on_cd'
+    HIT_LIMIT = 'hit_limit'
+    GOOD = 'good'
+
+    _script = None
+
     def __init__(self, db: DB, key, limit: int, period: float):
         self.db = db
         self.key = key
@@ -19,6 +58,22 @@ class RateLimiter:
     def _full_key(k):
         return f'RateLimit:{k}'
 
+    @staticmethod
+    def _cooldown_key(k):
+        return f'RateLimit:{k}:cd'
+
+    @classmethod
+    async def _run_script(cls, db: DB, key: str, limit: int, period: float, cd_sec: float) -> str:
+        r = await db.get_redis()
+        if cls._script is None:
+            # EVALSHA; the script is (re)loaded automatically if the server does not know it
+            RateLimiter._script = r.register_script(_RATE_LIMIT_LUA)
+        return await cls._script(
+            keys=[cls._full_key(key), cls._cooldown_key(key)],
+            args=[limit, period, cd_sec],
+            client=r,
+        )
+
     @classmethod
     async def is_limited_s(cls, db: DB, key: str, limit: int, period: float):
         if not key:
@@ -27,41 +82,58 @@ class RateLimiter:
         if limit <= 0 or period <= 0:
             return False
 
-        key = cls._full_key(key)
-
-        r = db.redis
-        sec, micro_sec = (await r.time())
-        t = sec + micro_sec * 1e-6
-        separation = period / limit
-        await r.setnx(key, 0.0)
-        tat = max(float(await r.get(key)), t)
-        if tat - t <= period - separation:
-            new_tat = max(tat, t) + separation
-            await r.set(key, new_tat)
-            return False
-        return True
+        return await cls._run_script(db, key, limit, period, 0) != cls.GOOD
 
     @classmethod
     async def clear_s(cls, db: DB, key: str):
-        await db.redis.delete(cls._full_key(key))
+        r = await db.get_redis()
+        await r.delete(cls._full_key(key), cls._cooldown_key(key))
 
 
 class RateLimitCooldown(RateLimiter):
-    ON_COOLDOWN = 'on_cd'
-    HIT_LIMIT = 'hit_limit'
-    GOOD = 'good'
-
     def __init__(self, db: DB, key, limit: int, period: float, cd_sec: float):
         super().__init__(db, key, limit, period)
-        self.cd = Cooldown(db, f'RateLimitCooldown:{key}', cd_sec)
+        self.cd_sec = cd_sec
 
     async def hit(self):
-        if not await self.cd.can_do():
-            return self.ON_COOLDOWN
-        else:
-            good = not await self.is_limited()
-            if good:
-                return self.GOOD
-            else:
-                await self.cd.do()
-                return self.HIT_LIMIT
+        """
+        One atomic call: checks the cooldown, then the limit, and starts the cooldown if the limit is hit.
+        Returns ON_COOLDOWN, HIT_LIMIT or GOOD.
+        """
+        if self.limit <= 0 or self.period <= 0:
+            return self.GOOD
+        return await self._run_script(self.db, self.key, self.limit, self.period, self.cd_sec)
+
+
+class TokenBucket:
+    """
+    In-process token bucket: `rate` tokens per second, bursts up to `capacity`.
+    Waiters are served in FIFO order.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        assert rate > 0
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def is_full(self):
+        self._refill()
+        return self._tokens >= self.capacity and not self._lock.locked()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
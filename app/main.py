@@ -1,6 +1,8 @@
 import asyncio
+import os
 
 from api.aionode.connector import ThorConnector
+from api.aionode.height_cache import HeightResponseCache
 from api.midgard.connector import MidgardConnector
 from api.midgard.name_service import NameService
 from api.w3.aggregator import AggregatorDataExtractor
@@ -9,6 +11,7 @@ from comm.dialog.main import init_dialogs
 from comm.discord.discord_bot import DiscordBot
 from comm.localization.admin import AdminMessages
 from comm.localization.manager import LocalizationManager
+from comm.picture.render_pool import RenderPool
 from comm.slack.slack_bot import SlackBot
 from comm.telegram.sticker_downloader import TelegramStickerDownloader
 from comm.telegram.telegram import TelegramBot
@@ -67,6 +70,8 @@ from lib.emergency import EmergencyReport
 from lib.flagship import Flagship
 from lib.logs import WithLogger, setup_logs_from_config
 from lib.money import DepthCurve
+from lib.path import get_data_path, get_app_path
+from lib.picture_cache import PictureCache
 from lib.scheduler import PrivateScheduler
 from lib.settings_manager import SettingsManager, SettingsProcessorGeneralAlerts
 from models.memo import ActionType
@@ -77,6 +82,7 @@ from models.price import PriceHolder
 from notify.alert_presenter import AlertPresenter
 from notify.broadcast import Broadcaster
 from notify.channel import BoardMessage
+from notify.dup_stop import TxDeduplicator
 from notify.personal.balance import PersonalBalanceNotifier
 from notify.personal.bond_provider import PersonalBondProviderNotifier
 from notify.personal.personal_main import NodeChangePersonalNotifier
@@ -173,21 +179,55 @@ class App(WithLogger):
         d.loc_man = LocalizationManager(d.cfg)
         d.loc_man.set_mimir_rules(d.mimir_const_holder.mimir_rules)
         d.broadcaster = Broadcaster(d)
+        d.picture_cache = PictureCache(
+            d.db if d.cfg.get_pure('picture.cache.use_redis', True) else None,
+            max_items=d.cfg.as_int('picture.cache.max_items', PictureCache.DEFAULT_MAX_ITEMS),
+            ttl=d.cfg.as_interval('picture.cache.ttl', '2m'),
+        )
         d.alert_presenter = AlertPresenter(d)
         init_dialogs(d)
 
+        d.render_pool = RenderPool()
+        d.render_pool.start(
+            d.cfg.as_int('picture.render_pool.workers', 0),
+            start_method=d.cfg.as_str('picture.render_pool.start_method', RenderPool.DEFAULT_START_METHOD),
+        )
+
     async def create_thor_node_connector(self, thor_env=None):
         d = self.deps
 
         thor_env = thor_env or d.cfg.get_thor_env_by_network_id()
         thor_env_backup = d.cfg.get_thor_env_by_network_id(backup=True)
 
-        d.thor_connector = ThorConnector(thor_env, d.session, additional_envs=[
-            thor_env_backup
-        ])
+        pinned_ttl = d.cfg.as_interval('thor.node.pinned_cache.ttl', ThorConnector.DEFAULT_PINNED_TTL)
+        pinned_max_items = d.cfg.as_int('thor.node.pinned_cache.max_items', ThorConnector.DEFAULT_PINNED_MAX_ITEMS)
+
+        height_cache = None
+        if d.cfg.get_pure('thor.node.height_cache.enabled', False):
+            cache_path = d.cfg.as_str('thor.node.height_cache.path',
+                                      os.path.join(get_data_path(), 'cache', 'thornode_heights.sqlite3'))
+            height_cache = HeightResponseCache(
+                os.path.join(get_app_path(), cache_path),  # an absolute path stays as is
+                max_bytes=d.cfg.as_int('thor.node.height_cache.max_size_mb', 512) * 1024 * 1024,
+                memory_items=d.cfg.as_int('thor.node.height_cache.memory_items',
+                                          HeightResponseCache.DEFAULT_MEMORY_ITEMS),
+            )
+
+        d.thor_connector = ThorConnector(
+            thor_env, d.session, additional_envs=[
+                thor_env_backup
+            ],
+            hedge=d.cfg.get_pure('thor.node.hedge.enabled', False),
+            hedge_min_delay=d.cfg.as_interval('thor.node.hedge.min_delay', ThorConnector.DEFAULT_HEDGE_MIN_DELAY),
+            hedge_max_delay=d.cfg.as_interval('thor.node.hedge.max_delay', ThorConnector.DEFAULT_HEDGE_MAX_DELAY),
+            pinned_ttl=pinned_ttl, pinned_max_items=pinned_max_items, height_cache=height_cache,
+        )
         d.thor_connector.set_client_id_for_all(HTTP_CLIENT_ID)
 
-        d.thor_connector_archive = ThorConnector(thor_env_backup, d.session)
+        d.thor_connector_archive = ThorConnector(
+            thor_env_backup, d.session,
+            pinned_ttl=pinned_ttl, pinned_max_items=pinned_max_items, height_cache=height_cache,
+        )
         d.thor_connector_archive.set_client_id_for_all(HTTP_CLIENT_ID)
 
         cfg: SubConfig = d.cfg.get('thor.midgard')
@@ -306,7 +346,13 @@ class App(WithLogger):
         if d.cfg.get('native_scanner.enabled', True):
             # The block scanner itself
             max_attempts = d.cfg.as_int('native_scanner.max_attempts_per_block', 5)
-            d.block_scanner = BlockScanner(d, max_attempts=max_attempts, role='main')
+            prefetch_window = d.cfg.as_int('native_scanner.prefetch_window', BlockScanner.DEFAULT_PREFETCH_WINDOW)
+            d.block_scanner = BlockScanner(d, max_attempts=max_attempts, role='main',
+                                           prefetch_window=prefetch_window)
+            if d.cfg.get('native_scanner.concurrent_listeners.enabled', False):
+                d.block_scanner.set_concurrent_dispatch(
+                    timeout=d.cfg.as_float('native_scanner.concurrent_listeners.timeout', 30.0)
+                )
             tasks.append(d.block_scanner)
             d.ref_memo_cache = RefMemoCache(d)
             d.block_scanner.add_subscriber(d.ref_memo_cache)
@@ -420,7 +466,8 @@ class App(WithLogger):
                     swl.add_subscriber(start_detector_from_list)
 
                     swap_start_detector_from_block = SwapStartDetectorFromBlock(d)
-                    d.block_scanner.add_subscriber(swap_start_detector_from_block)
+                    # it resolves reference memos, so RefMemoCache must see the block first
+                    d.block_scanner.add_subscriber(swap_start_detector_from_block, after=d.ref_memo_cache)
 
                     stream_swap_notifier = StreamingSwapStartTxNotifier(d)
                     swap_start_detector_from_block.add_subscriber(stream_swap_notifier)
@@ -675,6 +722,10 @@ class App(WithLogger):
             tasks = await self._prepare_task_graph()
             await self._preloading()
 
+            self.deps.flagship.run_in_background(
+                flush_interval=self.deps.cfg.as_interval('flagship.flush_access_interval', '30s')
+            )
+
             self.deps.is_loading = False
             self._ev_loaded.set()
         except Exception as e:
@@ -711,8 +762,13 @@ class App(WithLogger):
         self._bg_task = asyncio.create_task(self._run_background_jobs())
 
     async def on_shutdown(self, _):
+        await TxDeduplicator.flush_all_stats()
+        if self.deps.pool_cache:
+            await self.deps.pool_cache.flush_history()
         if self.deps.session:
             await self.deps.session.close()
+        if self.deps.render_pool:
+            self.deps.render_pool.stop()
 
     def run_bot(self):
         # run_bot -> on_startup -> _run_background_jobs -> _prepare_task_graph -> _preloading -> start public scheduler
@@ -3,7 +3,8 @@ See: https://dev.thorchain.org/thorchain-dev/concepts/memos
 """
 from dataclasses import dataclass
 from enum import Enum
-from typing import Union, NamedTuple, Optional, List
+from functools import lru_cache
+from typing import Union, NamedTuple, Optional, List, Tuple
 
 from lib.constants import THOR_BASIS_POINT_MAX
 
@@ -151,12 +152,27 @@ def nothing_if_0(x):
 AUTO_OPTIMIZED = 0
 
 
+def _ith(components, index, default=None, is_number=False):
+    # hot path of the parser; the same as THORMemo.ith_or_default
+    if index < len(components):
+        r = components[index].strip()
+        if not r:
+            return default
+        if is_number:
+            try:
+                return int(float(r)) if 'e' in r or 'E' in r else int(r)
+            except ValueError:
+                return default
+        return r
+    return default
+
+
 class Affiliate(NamedTuple):
     address: str
     fee_bp: int
 
 
-@dataclass
+@dataclass(frozen=True)
 class THORMemo:
     action: ActionType
     asset: str = ''
@@ -164,7 +180,7 @@ class THORMemo:
     limit: int = 0
     s_swap_interval: int = 0
     s_swap_quantity: int = 0  # 0 = optimized, 1 = single, >1 = streaming, None = don't care
-    affiliates: list[Affiliate] = None
+    affiliates: Tuple[Affiliate, ...] = None
     dex_aggregator_address: str = ''
     final_asset_address: str = ''
     min_amount_out: int = 0
@@ -188,6 +204,11 @@ class THORMemo:
 
     payload: str = ''
 
+    def __post_init__(self):
+        # the parsed memos are cached and shared, so the affiliates are a tuple as well
+        if self.affiliates is not None and not isinstance(self.affiliates, tuple):
+            object.__setattr__(self, 'affiliates', tuple(self.affiliates))
+
     def __str__(self):
         return self.build()
 
@@ -258,179 +279,137 @@ class THORMemo:
 
     @classmethod
     def parse_memo(cls, memo: str, no_raise=False):
-        gist, *_comment = memo.split('|', maxsplit=2)  # ignore comments
-
-        components = [it for it in gist.split(':')]
-
-        ith = cls.ith_or_default
-
-        action = ith(components, 0, '').lower()
-        tx_type = MEMO_ACTION_TABLE.get(action)
-
-        if tx_type == ActionType.ADD_LIQUIDITY:
-            # ADD:POOL:PAIRED_ADDR:AFFILIATE:FEE
-            # 0   1    2           3         4
-            affiliates = cls._parse_affiliates(
-                ith(components, 3, ''),
-                ith(components, 4, ''),
-            )
-            return cls.add_liquidity(
-                pool=ith(components, 1, ''),
-                paired_address=ith(components, 2, ''),
-                affiliates=affiliates,
-            )
-
-        elif tx_type == ActionType.SWAP or tx_type == ActionType.LIMIT_ORDER:
-            # 0    1     2         3   4         5   6                   7                8
-            # SWAP:ASSET:DEST_ADDR:LIM:AFFILIATE:FEE:DEX Aggregator Addr:Final Asset Addr:MinAmountOut
-            limit_and_s_swap = ith(components, 3, '')
-            limit, s_swap_interval, s_swap_quantity = cls._parse_streaming_params(limit_and_s_swap)
-            dest_address, refund_address = cls.parse_dest_address(ith(components, 2, ''))
-            affiliates = cls._parse_affiliates(
-                ith(components, 4, ''),
-                ith(components, 5, ''),
-            )
-            return cls.swap(
-                ith(components, 1),
-                dest_address,  # 2
-                limit, s_swap_interval, s_swap_quantity,  # 3
-                affiliates=affiliates,
-                dex_aggregator_address=ith(components, 6, ''),
-                dex_final_asset_address=ith(components, 7, ''),
-                dex_min_amount_out=ith(components, 8, 0, is_number=True),
-                refund_address=refund_address,  # /2
-                is_limit_order=(tx_type == ActionType.LIMIT_ORDER),
-            )
-
-        elif tx_type == ActionType.LIMIT_ORDER_MODIFY:
-            # MODIFY format: m=<:SOURCE:TARGET:NEWAMOUNT
-            # Example: m=<:1234BTC.BTC:5678ETH.ETH:2500000000
-            source = ith(components, 1, '')
-            target = ith(components, 2, '')
-            new_amount = ith(components, 3, 0, is_number=True)
-            return cls(
-                ActionType.LIMIT_ORDER_MODIFY,
-                asset=source,
-                final_asset_address=target,
-                amount=new_amount,
-            )
-
-        elif tx_type == ActionType.WITHDRAW:
-            # WD:POOL:BASIS_POINTS:ASSET
-            # 0  1    2            3
-            return cls.withdraw(
-                pool=ith(components, 1, ''),
-                withdraw_portion_bp=ith(components, 2, THOR_BASIS_POINT_MAX, is_number=True),
-                asset=ith(components, 3, ''),
-            )
-
-        elif tx_type == ActionType.THORNAME:
-            # ~:name:chain:address:?owner:?preferredAsset:?expiry
-            # 0 1    2     3       4      5               6
-            return cls.thorname_register_or_renew(
-                name=ith(components, 1),
-                chain=ith(components, 2),
-                address=ith(components, 3),
-                thor_owner=ith(components, 4, ''),
-                preferred_asset=ith(components, 5, ''),
-                expiry=ith(components, 6, ''),
-            )
-
-        elif tx_type == ActionType.DONATE:
-            return cls.donate(
-                pool=ith(components, 1, '')
-            )
-
-        elif tx_type == ActionType.BOND:
-            # BOND:NODEADDR:PROVIDER:FEE
-            # 0    1        2        3
-            return cls.bond(
-                node_address=ith(components, 1, ''),
-                provider_address=ith(components, 2, ''),
-                fee_bp=ith(components, 3, is_number=True),
-            )
-
-        elif tx_type == ActionType.UNBOND:
-            # UNBOND:NODEADDR:AMOUNT:PROVIDER
-            # 0      1        2      3
-            return cls.unbond(
-                node_address=ith(components, 1, ''),
-                amount=ith(components, 2, 0, is_number=True),
-                provider_address=ith(components, 3, ''),
-            )
-
-        elif tx_type == ActionType.LEAVE:
-            # LEAVE:NODEADDR
-            # 0     1
-            return cls.leave(node_address=ith(components, 1, ''))
-
-        elif tx_type == ActionType.OUTBOUND:
-            return cls.outbound(tx_id=ith(components, 1, ''))
-
-        elif tx_type == ActionType.REFUND:
-            return cls.refund(tx_id=ith(components, 1, ''))
-
-        elif tx_type == ActionType.RESERVE:
-            return cls.reserve()
-
-        elif tx_type == ActionType.NOOP:
-            no_vault = ith(components, 1, default='').upper().strip() == 'NOVAULT'
-            return cls.noop(no_vault)
-
-        elif tx_type == ActionType.TRADE_ACC_DEPOSIT:
-            return cls.deposit_trade_account(dest_address=ith(components, 1, ''))
-
-        elif tx_type == ActionType.TRADE_ACC_WITHDRAW:
-            return cls.withdraw_trade_account(dest_address=ith(components, 1, ''))
-
-        elif tx_type == ActionType.SECURED_ASSET_ADD:
-            return cls.secured_asset_add(dest_address=ith(components, 1, ''))
+        """
+        Parses a memo. Results are kept in a process-wide LRU cache keyed by the memo string,
+        so the same THORMemo object (immutable) may be returned for repeated memos.
+        """
+        parsed = _parse_memo_cached(memo) if cls is THORMemo else cls._parse_memo_uncached(memo)
+        if parsed is None and not no_raise:
+            action = memo.split('|', maxsplit=1)[0].split(':', maxsplit=1)[0].lower()
+            raise NotImplementedError(f"Not able to parse memo '{memo}' for {action} yet")
+        return parsed
+
+    @classmethod
+    def _parse_memo_uncached(cls, memo: str):
+        gist = memo.split('|', maxsplit=1)[0]  # ignore comments
+        components = gist.split(':')
+        tx_type = MEMO_ACTION_TABLE.get(components[0].strip().lower())
+        parser = _MEMO_PARSERS.get(tx_type)
+        return parser(cls, components, gist) if parser else None
+
+    # Parsers of the particular actions. See _MEMO_PARSERS below.
+
+    @classmethod
+    def _parse_add(cls, c, _gist):
+        # ADD:POOL:PAIRED_ADDR:AFFILIATE:FEE
+        # 0   1    2           3         4
+        ith = _ith
+        return cls.add_liquidity(
+            pool=ith(c, 1, ''),
+            paired_address=ith(c, 2, ''),
+            affiliates=cls._parse_affiliates(ith(c, 3, ''), ith(c, 4, '')),
+        )
 
-        elif tx_type == ActionType.SECURED_ASSET_WITHDRAW:
-            return cls.secured_asset_withdraw(dest_address=ith(components, 1, ''))
+    @classmethod
+    def _parse_swap(cls, c, _gist, is_limit_order=False):
+        # 0    1     2         3   4         5   6                   7                8
+        # SWAP:ASSET:DEST_ADDR:LIM:AFFILIATE:FEE:DEX Aggregator Addr:Final Asset Addr:MinAmountOut
+        ith = _ith
+        limit, s_swap_interval, s_swap_quantity = cls._parse_streaming_params(ith(c, 3, ''))
+        dest_address, refund_address = cls.parse_dest_address(ith(c, 2, ''))
+        asset = ith(c, 1)
+        # the same as cls.swap(...), but _parse_affiliates has already validated the affiliates
+        return cls(
+            ActionType.LIMIT_ORDER if is_limit_order else ActionType.SWAP,
+            asset, dest_address,  # 1, 2
+            limit, s_swap_interval, s_swap_quantity,  # 3
+            pool=asset,
+            affiliates=cls._parse_affiliates(ith(c, 4, ''), ith(c, 5, '')),
+            dex_aggregator_address=ith(c, 6, ''),
+            final_asset_address=ith(c, 7, ''),
+            min_amount_out=ith(c, 8, 0, is_number=True),
+            refund_address=refund_address or dest_address,  # /2
+        )
 
-        elif tx_type == ActionType.WASM_EXECUTE:
-            return cls.wasm_execute(
-                contract_address=ith(components, 1, ''),
-                payload=ith(components, 2, ''),
-            )
+    @classmethod
+    def _parse_limit_order_modify(cls, c, _gist):
+        # MODIFY format: m=<:SOURCE:TARGET:NEWAMOUNT
+        # Example: m=<:1234BTC.BTC:5678ETH.ETH:2500000000
+        ith = _ith
+        return cls(
+            ActionType.LIMIT_ORDER_MODIFY,
+            asset=ith(c, 1, ''),
+            final_asset_address=ith(c, 2, ''),
+            amount=ith(c, 3, 0, is_number=True),
+        )
 
-        elif tx_type == ActionType.RUNEPOOL_ADD:
-            return cls.runepool_add()
+    @classmethod
+    def _parse_withdraw(cls, c, _gist):
+        # WD:POOL:BASIS_POINTS:ASSET
+        # 0  1    2            3
+        ith = _ith
+        return cls.withdraw(
+            pool=ith(c, 1, ''),
+            withdraw_portion_bp=ith(c, 2, THOR_BASIS_POINT_MAX, is_number=True),
+            asset=ith(c, 3, ''),
+        )
 
-        elif tx_type == ActionType.RUNEPOOL_WITHDRAW:
-            affiliate = ith(components, 2, '')
-            affiliate_fee_bp = ith(components, 3, 0)
-            return cls.runepool_withdraw(
-                bp=ith(components, 1, THOR_BASIS_POINT_MAX, is_number=True),
-                affiliates=cls._parse_affiliates(affiliate, affiliate_fee_bp)
-            )
+    @classmethod
+    def _parse_thorname(cls, c, _gist):
+        # ~:name:chain:address:?owner:?preferredAsset:?expiry
+        # 0 1    2     3       4      5               6
+        ith = _ith
+        return cls.thorname_register_or_renew(
+            name=ith(c, 1),
+            chain=ith(c, 2),
+            address=ith(c, 3),
+            thor_owner=ith(c, 4, ''),
+            preferred_asset=ith(c, 5, ''),
+            expiry=ith(c, 6, ''),
+        )
 
-        elif tx_type == ActionType.SWITCH:
-            destination_address = ith(components, 1, '')
-            return cls.switch(
-                destination_address=destination_address,
-            )
+    @classmethod
+    def _parse_bond(cls, c, _gist):
+        # BOND:NODEADDR:PROVIDER:FEE
+        # 0    1        2        3
+        ith = _ith
+        return cls.bond(
+            node_address=ith(c, 1, ''),
+            provider_address=ith(c, 2, ''),
+            fee_bp=ith(c, 3, is_number=True),
+        )
 
-        elif tx_type == ActionType.MIGRATE:
-            return cls(ActionType.MIGRATE)
+    @classmethod
+    def _parse_unbond(cls, c, _gist):
+        # UNBOND:NODEADDR:AMOUNT:PROVIDER
+        # 0      1        2      3
+        ith = _ith
+        return cls.unbond(
+            node_address=ith(c, 1, ''),
+            amount=ith(c, 2, 0, is_number=True),
+            provider_address=ith(c, 3, ''),
+        )
 
-        elif tx_type == ActionType.CONSOLIDATE:
-            return cls(ActionType.CONSOLIDATE)
+    @classmethod
+    def _parse_noop(cls, c, _gist):
+        return cls.noop(_ith(c, 1, default='').upper().strip() == 'NOVAULT')
 
-        elif tx_type == ActionType.REFERENCE:
-            reference_memo = gist.split(':', maxsplit=1)[1].strip()
-            return cls(ActionType.REFERENCE, reference_memo=reference_memo)
+    @classmethod
+    def _parse_runepool_withdraw(cls, c, _gist):
+        ith = _ith
+        return cls.runepool_withdraw(
+            bp=ith(c, 1, THOR_BASIS_POINT_MAX, is_number=True),
+            affiliates=cls._parse_affiliates(ith(c, 2, ''), ith(c, 3, ''))
+        )
 
-        elif tx_type == ActionType.USE_REFERENCE:
-            reference_id = ith(components, 1, 0, is_number=True)
-            return cls(ActionType.USE_REFERENCE, reference_memo=str(reference_id))
+    @classmethod
+    def _parse_reference(cls, _c, gist):
+        return cls(ActionType.REFERENCE, reference_memo=gist.split(':', maxsplit=1)[1].strip())
 
-        else:
-            if no_raise:
-                return None
-            else:
-                raise NotImplementedError(f"Not able to parse memo '{memo}' for {action} yet")
+    @classmethod
+    def _parse_use_reference(cls, c, _gist):
+        reference_id = _ith(c, 1, 0, is_number=True)
+        return cls(ActionType.USE_REFERENCE, reference_memo=str(reference_id))
 
     @property
     def _fee_or_empty(self):
@@ -645,7 +624,7 @@ class THORMemo:
             ActionType.BOND,
             node_address=node_address,
             provider_address=provider_address,
-            affiliates=[Affiliate(node_address, fee_bp)] if fee_bp else []
+            affiliates=(Affiliate(node_address, fee_bp),) if fee_bp else ()
         )
 
     @classmethod
@@ -756,7 +735,7 @@ class THORMemo:
     def _parse_streaming_params(cls, ss: str):
         s_swap_components = ss.split('/')
 
-        ith = cls.ith_or_default
+        ith = _ith
         limit = ith(s_swap_components, 0, 0, is_number=True)
         s_swap_interval = ith(s_swap_components, 1, 0, is_number=True)
         # 0 = optimized, 1 = single, >1 = streaming, None = don't care
@@ -790,7 +769,7 @@ class THORMemo:
         if n_names > MAX_AFF_LEVELS or n_fees > MAX_AFF_LEVELS:
             raise ValueError(f"Too many affiliates: {names_part}:{fees_part}. Max {MAX_AFF_LEVELS}")
 
-        return [Affiliate(name.strip(), fee) for name, fee in zip(names, fees) if name.strip()]
+        return tuple(Affiliate(name.strip(), fee) for name, fee in zip(names, fees) if name.strip())
 
     @property
     def _affiliate_part(self):
@@ -825,7 +804,7 @@ class THORMemo:
     @classmethod
     def _form_affiliates(cls,
                          affiliate_address: str = '', affiliate_fee_bp: int = 0,
-                         affiliates: Optional[List[Affiliate]] = None) -> List[Affiliate]:
+                         affiliates: Optional[List[Affiliate]] = None) -> Tuple[Affiliate, ...]:
         if affiliates and (affiliate_address or affiliate_fee_bp):
             raise ValueError("Can not have both affiliates and affiliate_address/fee")
 
@@ -838,8 +817,48 @@ class THORMemo:
                 cls._guard_affiliate_bp(int(aff[1]))
                 # we use indices to allow not only NamedTuple but also normal tuples
                 results.append(Affiliate(aff[0].strip(), int(aff[1])))
-            return results
+            return tuple(results)
         else:
             affiliate_fee_bp = int(affiliate_fee_bp)
             cls._guard_affiliate_bp(affiliate_fee_bp)
-            return [Affiliate(affiliate_address, affiliate_fee_bp)] if affiliate_address else []
+            return (Affiliate(affiliate_address, affiliate_fee_bp),) if affiliate_address else ()
+
+
+# ActionType => parser(cls, components, gist). The components are the gist split by ':'.
+_MEMO_PARSERS = {
+    ActionType.ADD_LIQUIDITY: THORMemo._parse_add.__func__,
+    ActionType.SWAP: THORMemo._parse_swap.__func__,
+    ActionType.LIMIT_ORDER: lambda cls, c, gist: cls._parse_swap(c, gist, is_limit_order=True),
+    ActionType.LIMIT_ORDER_MODIFY: THORMemo._parse_limit_order_modify.__func__,
+    ActionType.WITHDRAW: THORMemo._parse_withdraw.__func__,
+    ActionType.THORNAME: THORMemo._parse_thorname.__func__,
+    ActionType.DONATE: lambda cls, c, _: cls.donate(pool=_ith(c, 1, '')),
+    ActionType.BOND: THORMemo._parse_bond.__func__,
+    ActionType.UNBOND: THORMemo._parse_unbond.__func__,
+    ActionType.LEAVE: lambda cls, c, _: cls.leave(node_address=_ith(c, 1, '')),
+    ActionType.OUTBOUND: lambda cls, c, _: cls.outbound(tx_id=_ith(c, 1, '')),
+    ActionType.REFUND: lambda cls, c, _: cls.refund(tx_id=_ith(c, 1, '')),
+    ActionType.RESERVE: lambda cls, c, _: cls.reserve(),
+    ActionType.NOOP: THORMemo._parse_noop.__func__,
+    ActionType.TRADE_ACC_DEPOSIT: lambda cls, c, _: cls.deposit_trade_account(dest_address=_ith(c, 1, '')),
+    ActionType.TRADE_ACC_WITHDRAW: lambda cls, c, _: cls.withdraw_trade_account(dest_address=_ith(c, 1, '')),
+    ActionType.SECURED_ASSET_ADD: lambda cls, c, _: cls.secured_asset_add(dest_address=_ith(c, 1, '')),
+    ActionType.SECURED_ASSET_WITHDRAW: lambda cls, c, _: cls.secured_asset_withdraw(dest_address=_ith(c, 1, '')),
+    ActionType.WASM_EXECUTE: lambda cls, c, _: cls.wasm_execute(contract_address=_ith(c, 1, ''),
+                                                               payload=_ith(c, 2, '')),
+    ActionType.RUNEPOOL_ADD: lambda cls, c, _: cls.runepool_add(),
+    ActionType.RUNEPOOL_WITHDRAW: THORMemo._parse_runepool_withdraw.__func__,
+    ActionType.SWITCH: lambda cls, c, _: cls.switch(destination_address=_ith(c, 1, '')),
+    ActionType.MIGRATE: lambda cls, c, _: cls(ActionType.MIGRATE),
+    ActionType.CONSOLIDATE: lambda cls, c, _: cls(ActionType.CONSOLIDATE),
+    ActionType.REFERENCE: THORMemo._parse_reference.__func__,
+    ActionType.USE_REFERENCE: THORMemo._parse_use_reference.__func__,
+}
+
+MEMO_CACHE_SIZE = 16384
+
+
+@lru_cache(maxsize=MEMO_CACHE_SIZE)
+def _parse_memo_cached(memo: str) -> Optional[THORMemo]:
+    # None for unknown actions; exceptions (bad affiliates, etc.) are not cached
+    return THORMemo._parse_memo_uncached(memo)
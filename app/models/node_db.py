@@ -1,33 +1,85 @@
 import json
 from dataclasses import asdict
-from typing import List
+from typing import List, Optional
 
 from lib.depcont import DepContainer
 from lib.logs import WithLogger
+from .node_diff import NodeSnapshot, NodeSetDiff
 from .node_info import NodeInfo
 
 
 class NodeStateDatabase(WithLogger):
+    """
+    The last known node set, stored as a Redis hash: node address -> JSON of NodeInfo.
+    Only the nodes that have changed since the previous save are serialized and written.
+    The snapshot is also kept in memory, so the writer does not read it back on every tick.
+    """
+
     DB_KEY_OLD_NODE_LIST = 'NodeChurn:PreviousNodeInfo'
 
     def __init__(self, deps: DepContainer, key=None):
         super().__init__()
         self.deps = deps
         self.key = key or self.DB_KEY_OLD_NODE_LIST
+        self._snapshot: Optional[NodeSnapshot] = None
+        self._full_write = True  # the first save rewrites everything and drops the old format key
+
+    @property
+    def hash_key(self):
+        # the old format was one JSON list under self.key
+        return f'{self.key}:ByNode'
+
+    @staticmethod
+    def _encode(node: NodeInfo) -> str:
+        return json.dumps(asdict(node))
+
+    async def get_last_snapshot(self) -> NodeSnapshot:
+        if self._snapshot is None:
+            self._snapshot = NodeSnapshot.of(await self._load_nodes())
+        return self._snapshot
 
     async def get_last_node_info_list(self) -> List[NodeInfo]:
+        return (await self.get_last_snapshot()).node_list
+
+    async def _load_nodes(self) -> List[NodeInfo]:
         try:
-            db = self.deps.db
-            j = await db.redis.get(self.key)
-            raw_data_list = json.loads(j)
-            return [NodeInfo.from_db(d) for d in raw_data_list]
+            r = await self.deps.db.get_redis()
+            raw = await r.hgetall(self.hash_key)
+            if raw:
+                return [NodeInfo.from_db(json.loads(j)) for j in raw.values()]
+
+            j = await r.get(self.key)
+            return [NodeInfo.from_db(d) for d in json.loads(j)] if j else []
         except (TypeError, ValueError, AttributeError, json.decoder.JSONDecodeError):
             self.logger.exception('get_last_node_info db error')
             return []
 
-    async def save_node_info_list(self, info_list: List[NodeInfo]):
+    async def save_node_info_list(self, info_list: List[NodeInfo]) -> Optional[NodeSetDiff]:
+        """
+        Saves the new node set and returns its difference from the previous one.
+        """
         if not info_list:
-            return
+            return None
+
+        prev = await self.get_last_snapshot()
+        curr = NodeSnapshot.of(info_list)
+        diff = NodeSetDiff.compute(prev, curr)
+
+        dirty = list(curr.nodes) if self._full_write else diff.dirty_addresses
+
         r = await self.deps.db.get_redis()
-        data = [asdict(item) for item in info_list]
-        await r.set(self.key, json.dumps(data))
+        async with r.pipeline(transaction=True) as pipe:
+            if self._full_write:
+                pipe.delete(self.key, self.hash_key)
+            elif diff.removed:
+                pipe.hdel(self.hash_key, *(n.node_address for n in diff.removed))
+            if dirty:
+                pipe.hset(self.hash_key, mapping={address: self._encode(curr.nodes[address]) for address in dirty})
+            pipe.hlen(self.hash_key)
+            results = await pipe.execute()
+
+        self._snapshot = curr
+        # somebody else has touched the hash (or Redis was flushed): write it all next time
+        self._full_write = int(results[-1]) != len(curr)
+        self.logger.debug(f'Saved {len(curr)} nodes to {self.hash_key}: {diff}')
+        return diff
@@ -0,0 +1,98 @@
+from dataclasses import dataclass, field, fields
+from typing import Dict, List, Tuple, FrozenSet, Iterable
+
+from .node_info import NodeInfo, MapAddressToPrevAndCurrNode
+
+# ip_info is the geo data attached after the fetch; it is not a property of the node itself
+DIFF_FIELDS = tuple(f.name for f in fields(NodeInfo) if f.name != 'ip_info')
+
+
+def _freeze(value):
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def node_fingerprint(node: NodeInfo) -> int:
+    """
+    Hash of all the fields that matter for the diff. It is only compared within one process.
+    """
+    return hash(tuple(_freeze(getattr(node, name)) for name in DIFF_FIELDS))
+
+
+def changed_fields(prev: NodeInfo, curr: NodeInfo) -> FrozenSet[str]:
+    return frozenset(name for name in DIFF_FIELDS if getattr(prev, name) != getattr(curr, name))
+
+
+@dataclass
+class NodeSnapshot:
+    nodes: Dict[str, NodeInfo] = field(default_factory=dict)
+    fingerprints: Dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def of(cls, nodes: Iterable[NodeInfo]) -> 'NodeSnapshot':
+        node_map = {n.node_address: n for n in nodes if n.node_address}
+        return cls(node_map, {address: node_fingerprint(n) for address, n in node_map.items()})
+
+    @property
+    def node_list(self) -> List[NodeInfo]:
+        return list(self.nodes.values())
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+@dataclass
+class NodeSetDiff:
+    """
+    Keyed difference of two node snapshots. Only the nodes whose fingerprint has changed are compared field by field.
+    """
+    added: List[NodeInfo] = field(default_factory=list)
+    removed: List[NodeInfo] = field(default_factory=list)
+    changed: Dict[str, Tuple[NodeInfo, NodeInfo]] = field(default_factory=dict)  # address -> (prev, curr)
+    changed_fields: Dict[str, FrozenSet[str]] = field(default_factory=dict)  # address -> names of the fields
+
+    @classmethod
+    def compute(cls, prev: NodeSnapshot, curr: NodeSnapshot) -> 'NodeSetDiff':
+        diff = cls()
+        for address, node in curr.nodes.items():
+            old_fp = prev.fingerprints.get(address)
+            if old_fp is None:
+                diff.added.append(node)
+            elif old_fp != curr.fingerprints[address]:
+                prev_node = prev.nodes[address]
+                names = changed_fields(prev_node, node)
+                if names:
+                    diff.changed[address] = (prev_node, node)
+                    diff.changed_fields[address] = names
+
+        diff.removed = [node for address, node in prev.nodes.items() if address not in curr.nodes]
+        return diff
+
+    @property
+    def is_empty(self):
+        return not (self.added or self.removed or self.changed)
+
+    @property
+    def dirty_addresses(self) -> List[str]:
+        """
+        The nodes that must be written again.
+        """
+        return [n.node_address for n in self.added] + list(self.changed.keys())
+
+    def changed_in(self, *field_names) -> MapAddressToPrevAndCurrNode:
+        """
+        (prev, curr) of the nodes where any of the given fields has changed; all changed nodes if none is given.
+        """
+        if not field_names:
+            return dict(self.changed)
+        wanted = set(field_names)
+        return {
+            address: pair for address, pair in self.changed.items()
+            if not wanted.isdisjoint(self.changed_fields[address])
+        }
+
+    def __str__(self):
+        return f'NodeSetDiff(added={len(self.added)}, removed={len(self.removed)}, changed={len(self.changed)})'
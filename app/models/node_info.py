@@ -208,6 +208,8 @@ class NodeSetChanges:
     block_no: int = 0
     churn_duration: float = 0.0
 
+    diff: Optional[Any] = None  # NodeSetDiff (see models/node_diff.py), if the detector computed it
+
     @classmethod
     def empty(cls):
         return cls()
@@ -330,6 +332,16 @@ class NodeSetChanges:
         common_addresses = set(new.keys()) & set(old.keys())
         return {address: (old[address], new[address]) for address in common_addresses}
 
+    def changed_node_map(self, *field_names) -> MapAddressToPrevAndCurrNode:
+        """
+        (prev, curr) of the nodes where any of the given fields has changed.
+        Uses the precomputed diff if there is one, otherwise computes it once.
+        """
+        if self.diff is None:
+            from .node_diff import NodeSetDiff, NodeSnapshot
+            self.diff = NodeSetDiff.compute(NodeSnapshot.of(self.nodes_previous), NodeSnapshot.of(self.nodes_all))
+        return self.diff.changed_in(*field_names)
+
     @property
     def bond_churn_in(self):
         return sum(node.bond for node in self.nodes_activated)
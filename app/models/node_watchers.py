@@ -8,9 +8,10 @@ from lib.db_many2many import ManyToManySet
 
 
 class UserWatchlist:
-    def __init__(self, db: DB, watch_category_name):
+    def __init__(self, db: DB, watch_category_name, local_index=False):
         self.db = db
-        self.many2many = ManyToManySet(db, 'UserID', watch_category_name)
+        # local_index: keep "item -> users" in memory; good for the lookups made on every block
+        self.many2many = ManyToManySet(db, 'UserID', watch_category_name, local_index=local_index)
 
     async def add_user_to_node(self, user_id, node: str):
         if node and user_id:
@@ -93,8 +94,8 @@ class NamedNodeStorage:
 
 
 class NodeWatcherStorage(UserWatchlist):
-    def __init__(self, db: DB):
-        super().__init__(db, watch_category_name='WatchNodeIP')
+    def __init__(self, db: DB, local_index=False):
+        super().__init__(db, watch_category_name='WatchNodeIP', local_index=local_index)
         self.node_name_storage = NamedNodeStorage(db)
 
 
@@ -0,0 +1,258 @@
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from redis.asyncio import Redis
+
+from lib.columnar import encode_columns, decode_columns, ColumnarError
+from lib.date_utils import now_ts, MINUTE
+from lib.db import DB
+from lib.logs import WithLogger
+
+# address -> slash points
+SlashPointMap = Dict[str, int]
+
+
+class NodeSlashLog:
+    """
+    Slash points of one node as a step function: a new row is appended only when the value changes.
+    """
+
+    COL_TS = 'ts'
+    COL_PTS = 'pts'
+
+    __slots__ = ('ts', 'pts')
+
+    def __init__(self, ts: np.ndarray, pts: np.ndarray):
+        self.ts = ts
+        self.pts = pts
+
+    @classmethod
+    def start(cls, ts: int, pts: int) -> 'NodeSlashLog':
+        return cls(np.array([ts], dtype=np.int64), np.array([pts], dtype=np.int64))
+
+    @classmethod
+    def decode(cls, blob: str) -> 'NodeSlashLog':
+        columns = decode_columns(blob)
+        return cls(columns[cls.COL_TS], columns[cls.COL_PTS])
+
+    def encode(self) -> str:
+        return encode_columns({self.COL_TS: self.ts, self.COL_PTS: self.pts})
+
+    @property
+    def first_ts(self) -> int:
+        return int(self.ts[0])
+
+    @property
+    def last_ts(self) -> int:
+        return int(self.ts[-1])
+
+    @property
+    def last_value(self) -> int:
+        return int(self.pts[-1])
+
+    def append(self, ts: int, pts: int):
+        self.ts = np.append(self.ts, np.int64(ts))
+        self.pts = np.append(self.pts, np.int64(pts))
+
+    def trim(self, older_than: int):
+        """
+        Drops the rows before `older_than`, except the last of them: it is the value at `older_than`.
+        """
+        i = int(np.searchsorted(self.ts, older_than, side='right')) - 1
+        if i > 0:
+            self.ts = self.ts[i:]
+            self.pts = self.pts[i:]
+
+    def values_at(self, moments: np.ndarray) -> np.ndarray:
+        """
+        Values at the given moments in one pass. A moment before the log gets its first value.
+        """
+        i = np.searchsorted(self.ts, moments, side='right') - 1
+        return self.pts[np.maximum(i, 0)]
+
+    def __len__(self):
+        return len(self.ts)
+
+
+class SlashPointHistory(WithLogger):
+    """
+    Slash points of all nodes over the last `keep_sec` seconds.
+    Instead of a snapshot of every node per tick, each node has a log of its changes (NodeSlashLog),
+    so mostly unchanged nodes take one row. The logs are kept in memory and mirrored to Redis:
+    the hash "{name}:Log" holds one columnar blob per node, only the changed nodes are written.
+    The ticks the history has missed (e.g. the bot was down) are remembered as gaps in "{name}:Meta";
+    the values inside a gap are unknown.
+    """
+
+    DEFAULT_NAME = 'SlashPointHistory'
+    MAX_TICK_GAP = 2 * MINUTE
+    LEGACY_READ_BATCH = 1000
+
+    def __init__(self, db: DB, keep_sec: float, name=DEFAULT_NAME, max_tick_gap=MAX_TICK_GAP,
+                 legacy_keys: Iterable[str] = ()):
+        super().__init__()
+        self.db = db
+        self.name = name
+        self.keep_sec = keep_sec
+        self.max_tick_gap = max_tick_gap
+        self._logs: Dict[str, NodeSlashLog] = {}
+        self._gaps: List[Tuple[int, int]] = []
+        self._last_tick = 0
+        self._loaded = False
+        # the old storage: streams of full snapshots {address: points}, one entry per tick (see TimeSeries)
+        self.legacy_keys = tuple(legacy_keys)
+
+    @property
+    def key_log(self):
+        return f'{self.name}:Log'
+
+    @property
+    def key_meta(self):
+        return f'{self.name}:Meta'
+
+    async def load(self):
+        r: Redis = await self.db.get_redis()
+        raw = await r.hgetall(self.key_log)
+        self._logs = {}
+        for address, blob in raw.items():
+            try:
+                self._logs[address] = NodeSlashLog.decode(blob)
+            except (ColumnarError, KeyError) as e:
+                self.logger.warning(f'Bad slash log of {address}: {e}')
+
+        meta = await r.hgetall(self.key_meta)
+        try:
+            self._last_tick = int(meta.get('last_tick', 0))
+            self._gaps = [tuple(g) for g in json.loads(meta.get('gaps', '[]'))]
+        except (TypeError, ValueError):
+            self.logger.warning(f'Bad slash history meta: {meta}')
+            self._last_tick, self._gaps = 0, []
+
+        if self.legacy_keys:
+            if not self._logs and not self._last_tick:
+                await self._import_legacy(r)
+            await r.delete(*self.legacy_keys)
+
+        self._loaded = True
+        self.logger.info(f'Loaded slash logs of {len(self._logs)} nodes, {len(self._gaps)} gaps')
+
+    async def _import_legacy(self, r: Redis):
+        """
+        Replays the last `keep_sec` of the old snapshots into the logs and saves them,
+        so that the history is complete right after the upgrade.
+        """
+        since_ms = int((now_ts() - self.keep_sec) * 1000)
+        n_entries = 0
+        for key in self.legacy_keys:
+            start = since_ms
+            while True:
+                entries = await r.xrange(key, min=start, max='+', count=self.LEGACY_READ_BATCH)
+                for message_id, fields in entries:
+                    try:
+                        ts = int(str(message_id).split('-')[0]) // 1000
+                        points = {address: int(pts) for address, pts in fields.items()}
+                    except (TypeError, ValueError):
+                        continue
+                    self._apply(points, ts)
+                n_entries += len(entries)
+                if len(entries) < self.LEGACY_READ_BATCH:
+                    break
+                start = f'({entries[-1][0]}'
+
+        if n_entries:
+            async with r.pipeline(transaction=False) as pipe:
+                if self._logs:
+                    pipe.hset(self.key_log, mapping={a: log.encode() for a, log in self._logs.items()})
+                pipe.hset(self.key_meta, mapping=self._meta())
+                await pipe.execute()
+            self.logger.info(f'Imported {n_entries} old snapshots: logs of {len(self._logs)} nodes')
+
+    def _apply(self, points: SlashPointMap, ts: int) -> Tuple[List[str], List[str]]:
+        """
+        Records the points in memory; returns the changed and the dropped (stale) addresses.
+        """
+        older_than = ts - self.keep_sec
+
+        changed = []
+        for address, pts in points.items():
+            pts = int(pts)
+            log = self._logs.get(address)
+            if log is None:
+                self._logs[address] = NodeSlashLog.start(ts, pts)
+                changed.append(address)
+            elif log.last_value != pts:
+                log.append(ts, pts)
+                log.trim(older_than)
+                changed.append(address)
+
+        # the nodes that have left long ago
+        stale = [a for a, log in self._logs.items() if a not in points and log.last_ts < older_than]
+        for address in stale:
+            del self._logs[address]
+
+        if self._last_tick and ts - self._last_tick > self.max_tick_gap:
+            self._gaps.append((self._last_tick, ts))
+            self.logger.warning(f'Slash history has a gap of {ts - self._last_tick} sec')
+        if self._gaps and self._gaps[0][1] < older_than:
+            self._gaps = [g for g in self._gaps if g[1] >= older_than]
+        self._last_tick = ts
+        return changed, stale
+
+    def _meta(self) -> dict:
+        return {'gaps': json.dumps(self._gaps), 'last_tick': self._last_tick}
+
+    async def update(self, points: SlashPointMap, ts=None) -> List[str]:
+        """
+        Records the current slash points; returns the addresses whose value has changed.
+        """
+        if not self._loaded:
+            await self.load()
+
+        changed, stale = self._apply(points, int(ts or now_ts()))
+
+        r: Redis = await self.db.get_redis()
+        async with r.pipeline(transaction=False) as pipe:
+            if changed:
+                pipe.hset(self.key_log, mapping={a: self._logs[a].encode() for a in changed})
+            if stale:
+                pipe.hdel(self.key_log, *stale)
+            pipe.hset(self.key_meta, mapping=self._meta())
+            await pipe.execute()
+
+        return changed
+
+    def _in_gap(self, moment: float, tolerance: float) -> bool:
+        # a moment close enough to a tick on either side of the gap is fine
+        return any(start + tolerance < moment < end - tolerance for start, end in self._gaps)
+
+    def changes_over(self, intervals: Iterable[float], ts=None,
+                     tolerance_sec=20, tolerance_percent=1) -> Dict[str, List[Optional[int]]]:
+        """
+        The values `interval` seconds ago for every node that has changed within the longest interval.
+        address -> [old points for each interval or None if unknown]. The nodes that have not changed
+        in that time are skipped without a lookup.
+        """
+        intervals = list(intervals)
+        if not intervals:
+            return {}
+        ts = ts or now_ts()
+        moments = np.array([ts - ago for ago in intervals], dtype=np.float64)
+        tolerances = [max(tolerance_sec, ago * tolerance_percent * 0.01) for ago in intervals]
+        known = [not self._in_gap(m, tol) for m, tol in zip(moments, tolerances)]
+
+        since = ts - max(intervals)
+        results = {}
+        for address, log in self._logs.items():
+            if len(log) < 2 or log.last_ts <= since:
+                continue
+            values = log.values_at(moments)
+            results[address] = [
+                int(v) if ok and moment >= log.first_ts - tol else None
+                for v, ok, moment, tol in zip(values, known, moments, tolerances)
+            ]
+        return results
+
+    def current(self, address: str) -> Optional[int]:
+        log = self._logs.get(address)
+        return log.last_value if log else None
@@ -1,9 +1,10 @@
 import json
 import logging
-from typing import Tuple
+from typing import Tuple, Iterable, Optional, List, Dict
 
-from lib.date_utils import now_ts, MINUTE, convert_to_milliseconds
+from lib.date_utils import now_ts, MINUTE, HOUR, DAY, convert_to_milliseconds
 from lib.db import DB
+from lib.utils import expect_string
 
 MAX_POINTS_DEFAULT = 100000
 TOLERANCE_DEFAULT = 10  # sec
@@ -11,15 +12,33 @@ MS = 1000  # milliseconds in 1 second
 
 
 class TimeSeries:
-    def __init__(self, name: str, db: DB, max_len=MAX_POINTS_DEFAULT):
+    # Rollups: for every key in "rollup_keys" the series keeps min/max/avg/last per bucket
+    # of these resolutions. Each resolution is a sorted set "ts-rollup:{name}:{resolution}",
+    # score = bucket start timestamp, member = JSON of the bucket. They are updated on every add().
+    ROLLUP_RESOLUTIONS = (MINUTE, 15 * MINUTE, HOUR, DAY)
+    ROLLUP_MAX_BUCKETS = {
+        MINUTE: 3 * DAY // MINUTE,
+        15 * MINUTE: 60 * DAY // (15 * MINUTE),
+        HOUR: 400 * DAY // HOUR,
+        DAY: 20 * 366,
+    }
+    ROLLUP_AGGREGATES = ('min', 'max', 'avg', 'last')
+
+    def __init__(self, name: str, db: DB, max_len=MAX_POINTS_DEFAULT, rollup_keys: Iterable[str] = ()):
         self.db = db
         self.name = name
         self.max_len = max_len
+        self.rollup_keys = tuple(rollup_keys)
+        self._rollup_state: Dict[int, dict] = {}  # resolution => the latest bucket
+        self._rollup_loaded = False
 
     @property
     def stream_name(self):
         return f'ts-stream:{self.name}'
 
+    def rollup_name(self, resolution: int):
+        return f'ts-rollup:{self.name}:{resolution}'
+
     @staticmethod
     def range_ago(ago_sec, tolerance_sec=10):
         now_sec = now_ts()
@@ -53,10 +72,18 @@ class TimeSeries:
         exact_point = ref_ts - ago_sec
         if tolerance_percent is not None:
             tolerance_sec = max(tolerance_sec, ago_sec * tolerance_percent * 0.01)
-        points = await self.select(*self.range_ago(ago_sec, tolerance_sec))
+
+        # only the nearest neighbours of the exact point, no need to read the whole window
+        exact_ms = int(exact_point * MS)
+        r = await self.db.get_redis()
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.xrevrange(self.stream_name, max=exact_ms, min=int((exact_point - tolerance_sec) * MS), count=1)
+            pipe.xrange(self.stream_name, min=exact_ms, max=int((exact_point + tolerance_sec) * MS), count=1)
+            before, after = await pipe.execute()
+
         best_point = None
         best_diff = 1e30
-        for index, data in points:
+        for index, data in before + after:
             ts = self.get_ts_from_index(index)
             diff = abs(exact_point - ts)
             if diff < best_diff:
@@ -114,12 +141,22 @@ class TimeSeries:
 
     async def add(self, message_id=b'*', **kwargs):
         r = await self.db.get_redis()
-        await r.xadd(self.stream_name, kwargs, id=message_id, maxlen=self.max_len)
+        if not self.rollup_keys:
+            await r.xadd(self.stream_name, kwargs, id=message_id, maxlen=self.max_len)
+            return
+
+        message_id = expect_string(message_id)
+        ts = now_ts() if message_id == '*' else self.get_ts_from_index(message_id)
+        changed_buckets = await self._update_rollups(ts, kwargs)
+
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.xadd(self.stream_name, kwargs, id=message_id, maxlen=self.max_len)
+            self._queue_rollup_writes(pipe, changed_buckets)
+            await pipe.execute()
 
     async def add_ts(self, ts, **kwargs):
-        r = await self.db.get_redis()
         message_id = f'{convert_to_milliseconds(ts)}-0'
-        await r.xadd(self.stream_name, kwargs, id=message_id, maxlen=self.max_len)
+        await self.add(message_id, **kwargs)
 
     async def add_as_json(self, j: dict = None, message_id=b'*'):
         await self.add(message_id, json=json.dumps(j))
@@ -136,7 +173,8 @@ class TimeSeries:
 
     async def clear(self):
         r = await self.db.get_redis()
-        await r.delete(self.stream_name)
+        await r.delete(self.stream_name, *[self.rollup_name(res) for res in self.ROLLUP_RESOLUTIONS])
+        self._rollup_state.clear()
 
     @staticmethod
     def adjacent_difference_points(points: list):
@@ -166,13 +204,182 @@ class TimeSeries:
     async def get_length(self):
         return int(await self.db.redis.xlen(self.stream_name))
 
+    # ---- rollups ----
 
-class PriceTimeSeries(TimeSeries):
-    def __init__(self, coin: str, db: DB, max_len=MAX_POINTS_DEFAULT):
-        super().__init__(f'price-{coin}', db, max_len=max_len)
+    @staticmethod
+    def _new_bucket(start_ts):
+        return {'t': start_ts, 'v': {}}
 
+    @staticmethod
+    def _merge_into_bucket(bucket: dict, values: Dict[str, float]):
+        for key, value in values.items():
+            agg = bucket['v'].get(key)
+            if agg is None:
+                # min, max, sum, count, last
+                bucket['v'][key] = [value, value, value, 1, value]
+            else:
+                agg[0] = min(agg[0], value)
+                agg[1] = max(agg[1], value)
+                agg[2] += value
+                agg[3] += 1
+                agg[4] = value
+
+    def _rollup_values(self, fields: dict) -> Dict[str, float]:
+        values = {}
+        for key in self.rollup_keys:
+            if key in fields:
+                try:
+                    values[key] = float(fields[key])
+                except (TypeError, ValueError):
+                    continue
+        return values
+
+    async def _load_rollup_state(self):
+        if self._rollup_loaded:
+            return
+        self._rollup_loaded = True
+
+        r = await self.db.get_redis()
+        async with r.pipeline(transaction=False) as pipe:
+            for res in self.ROLLUP_RESOLUTIONS:
+                pipe.zrange(self.rollup_name(res), -1, -1)
+            pipe.xlen(self.stream_name)
+            *last_buckets, stream_len = await pipe.execute()
+
+        if not any(last_buckets) and int(stream_len or 0):
+            # rollups are enabled for an existing series: build them from the raw points once
+            await self.rebuild_rollups()
+            return
+
+        for res, last in zip(self.ROLLUP_RESOLUTIONS, last_buckets):
+            if last:
+                self._rollup_state[res] = json.loads(last[0])
+
+    async def _update_rollups(self, ts: float, fields: dict) -> List[Tuple[int, dict]]:
+        values = self._rollup_values(fields)
+        if not values:
+            return []
+
+        await self._load_rollup_state()
+        changed = []
+        for res in self.ROLLUP_RESOLUTIONS:
+            start = int(ts // res * res)
+            bucket = self._rollup_state.get(res)
+            if bucket is None or bucket['t'] < start:
+                bucket = self._rollup_state[res] = self._new_bucket(start)
+            elif bucket['t'] > start:
+                # a point from the past (backfill): update the stored bucket
+                stored = await self.get_rollup_buckets(res, start, start)
+                bucket = stored[0] if stored else self._new_bucket(start)
+            self._merge_into_bucket(bucket, values)
+            changed.append((res, bucket))
+        return changed
+
+    def _queue_rollup_writes(self, pipe, changed_buckets: List[Tuple[int, dict]]):
+        for res, bucket in changed_buckets:
+            name = self.rollup_name(res)
+            start = bucket['t']
+            pipe.zremrangebyscore(name, start, start)
+            pipe.zadd(name, {json.dumps(bucket, separators=(',', ':')): start})
+            pipe.zremrangebyrank(name, 0, -self.ROLLUP_MAX_BUCKETS[res] - 1)
+
+    async def rebuild_rollups(self, batch_size=10_000):
+        """
+        Recalculates all rollups from the raw stream, e.g., after some raw points have been deleted.
+        """
+        if not self.rollup_keys:
+            return
+
+        r = await self.db.get_redis()
+        buckets = {res: {} for res in self.ROLLUP_RESOLUTIONS}
+        start = '-'
+        while True:
+            points = await r.xrange(self.stream_name, min=start, max='+', count=batch_size)
+            for index, data in points:
+                values = self._rollup_values(data)
+                if not values:
+                    continue
+                ts = self.get_ts_from_index(index)
+                for res in self.ROLLUP_RESOLUTIONS:
+                    bucket_start = int(ts // res * res)
+                    bucket = buckets[res].setdefault(bucket_start, self._new_bucket(bucket_start))
+                    self._merge_into_bucket(bucket, values)
+            if len(points) < batch_size:
+                break
+            start = f'({points[-1][0]}'
+
+        await r.delete(*[self.rollup_name(res) for res in self.ROLLUP_RESOLUTIONS])
+        self._rollup_state.clear()
+        for res, res_buckets in buckets.items():
+            changed = [(res, b) for _, b in sorted(res_buckets.items())][-self.ROLLUP_MAX_BUCKETS[res]:]
+            for i in range(0, len(changed), batch_size):
+                async with r.pipeline(transaction=False) as pipe:
+                    pipe.zadd(self.rollup_name(res), {
+                        json.dumps(b, separators=(',', ':')): b['t'] for _, b in changed[i:i + batch_size]
+                    })
+                    await pipe.execute()
+            if changed:
+                self._rollup_state[res] = changed[-1][1]
+        self._rollup_loaded = True
+        logging.info(f'Rebuilt rollups of {self.stream_name}: '
+                     f'{ {res: len(b) for res, b in buckets.items()} } buckets.')
+
+    async def get_rollup_buckets(self, resolution: int, start_ts: float, end_ts: float) -> List[dict]:
+        r = await self.db.get_redis()
+        items = await r.zrangebyscore(self.rollup_name(resolution), start_ts, end_ts)
+        return [json.loads(item) for item in items]
+
+    def pick_rollup_resolution(self, period_sec: float, min_points: int) -> Optional[int]:
+        """
+        The coarsest resolution that still gives at least `min_points` points over the period.
+        None means that even the finest rollup is too coarse, so the raw points must be used.
+        """
+        best = None
+        for res in sorted(self.ROLLUP_RESOLUTIONS):
+            if period_sec / res >= min_points:
+                best = res
+        return best
+
+    async def get_last_values_rollup(self, period_sec, key, points=300, aggregate='avg', with_ts=False):
+        """
+        Like get_last_values but reads about `points` pre-aggregated buckets instead of all the raw points.
+        aggregate: one of min, max, avg, last.
+        """
+        if key not in self.rollup_keys:
+            raise ValueError(f'Key {key!r} is not rolled up in {self.name}')
+        if aggregate not in self.ROLLUP_AGGREGATES:
+            raise ValueError(f'Unknown aggregate {aggregate!r}')
+
+        res = self.pick_rollup_resolution(period_sec, points)
+        if res is None:
+            return await self.get_last_values(period_sec, key, with_ts=with_ts)
+
+        await self._load_rollup_state()
+        now = now_ts()
+        buckets = await self.get_rollup_buckets(res, (now - period_sec) // res * res, now)
+
+        results = []
+        for bucket in buckets:
+            agg = bucket['v'].get(key)
+            if not agg:
+                continue
+            min_v, max_v, sum_v, count, last_v = agg
+            value = {
+                'min': min_v,
+                'max': max_v,
+                'avg': sum_v / count,
+                'last': last_v,
+            }[aggregate]
+            results.append((float(bucket['t']), value) if with_ts else value)
+        return results
+
+
+class PriceTimeSeries(TimeSeries):
     KEY = 'price'
 
+    def __init__(self, coin: str, db: DB, max_len=MAX_POINTS_DEFAULT):
+        super().__init__(f'price-{coin}', db, max_len=max_len, rollup_keys=(self.KEY,))
+
     async def select_average_ago(self, ago, tolerance):
         items = await self.select(*self.range_ago(ago, tolerance))
         n, accum = 0, 0
@@ -1,25 +1,29 @@
 import asyncio
+from typing import Callable, Awaitable
 
 from api.midgard.name_service import NameService, NameMap, add_thor_suffix
 from api.w3.dex_analytics import DexReport
 from comm.localization.manager import BaseLocalization
 from comm.picture.achievement_picture import build_achievement_picture_generator
+from comm.picture.common import PictureAndName
 from comm.picture.block_height_picture import block_speed_chart
 from comm.picture.nodes_pictures import NodePictureGenerator
 from comm.picture.pools_picture import PoolPictureGenerator
 from comm.picture.price_picture import price_graph_from_db
 from comm.picture.queue_picture import queue_graph
+from comm.picture.render_pool import encode_png
 from comm.picture.supply_picture import SupplyPictureGenerator
 from jobs.achievement.ach_list import Achievement
 from jobs.fetch.cached.last_block import EventLastBlock
 from jobs.fetch.chain_id import AlertChainIdChange
 from lib.constants import THOR_BLOCKS_PER_MINUTE, thor_to_float, THOR_BASIS_POINT_MAX, Chains
-from lib.date_utils import DAY
+from lib.date_utils import DAY, today_str
 from lib.delegates import INotified
 from lib.depcont import DepContainer
 from lib.draw_utils import img_to_bio
 from lib.html_renderer import InfographicRendererRPC
 from lib.logs import WithLogger
+from lib.picture_cache import PictureCache
 from lib.texts import shorten_text, shorten_text_middle
 from lib.utils import namedtuple_to_dict, recursive_asdict
 from models.asset import Asset, is_ambiguous_asset
@@ -62,14 +66,31 @@ class AlertPresenter(INotified, WithLogger):
 
         r_cfg = deps.cfg.infographic_renderer
 
+        self.picture_cache: PictureCache = deps.picture_cache or PictureCache()
+
         self.renderer = InfographicRendererRPC(
             deps,
-            url=r_cfg.as_str('renderer_url', 'http://127.0.0.1:8404/render')
+            url=r_cfg.as_str('renderer_url', 'http://127.0.0.1:8404/render'),
+            cache=self.picture_cache,
         )
         self.use_renderer = r_cfg.get_pure('use_html_renderer', False)
         if self.use_renderer:
             self.logger.info(f'Using renderer: {self.use_renderer}; URL is {self.renderer.url}')
 
+    async def _cached_picture(self, template: str, parameters, loc: BaseLocalization,
+                              render: Callable[[], Awaitable[PictureAndName]]):
+        """
+        Picture as PNG bytes from the picture cache; `render` is only called on a miss.
+        """
+
+        async def _render():
+            pic, _ = await render()
+            if pic is None or isinstance(pic, bytes):
+                return pic
+            return await asyncio.get_running_loop().run_in_executor(None, encode_png, pic)
+
+        return await self.picture_cache.get_or_render(template, parameters, _render, locale=loc.name)
+
     async def on_data(self, sender, data):
         # noinspection PyAsyncCall
         asyncio.create_task(self.handle_data(data))
@@ -452,12 +473,28 @@ class AlertPresenter(INotified, WithLogger):
         photo_name = 'price.png'
         return photo, photo_name
 
+    async def render_price_graph_from_db(self, loc: BaseLocalization, period, last_points=None):
+        """
+        The graph reads the latest prices from the DB, so the cached one is only reused for the same
+        `last_points` (the newest points of the series); without them it is not cached at all.
+        """
+        if not last_points:
+            return await price_graph_from_db(self.deps, loc, period)
+
+        graph = await self._cached_picture(
+            'price_graph_from_db', {'period': period, 'last_points': last_points}, loc,
+            lambda: price_graph_from_db(self.deps, loc, period)
+        )
+        return graph, f'price-{today_str()}.jpg'
+
     async def _handle_price(self, event: AlertPrice):
         async def price_graph_gen(loc: BaseLocalization):
             if self.use_renderer:
                 graph, graph_name = await self.render_price_graph(loc, event)
             else:
-                graph, graph_name = await price_graph_from_db(self.deps, loc, event.price_graph_period)
+                last_points = [series[-1] for series in (event.pool_prices, event.cex_prices, event.det_prices)
+                               if series]
+                graph, graph_name = await self.render_price_graph_from_db(loc, event.price_graph_period, last_points)
             caption = loc.notification_text_price_update(event)
             return BoardMessage.make_photo(graph, caption=caption, photo_file_name=graph_name)
 
@@ -480,10 +517,14 @@ class AlertPresenter(INotified, WithLogger):
             data.holder,
         )
 
+    async def render_best_pools(self, loc: BaseLocalization, event: EventPools):
+        pic_gen = PoolPictureGenerator(loc, event)
+        pic = await self._cached_picture('best_pools', event, loc, pic_gen.get_picture)
+        return pic, pic_gen.generate_picture_filename()
+
     async def _handle_best_pools(self, data: EventPools):
         async def generate_pool_picture(loc: BaseLocalization, event: EventPools):
-            pic_gen = PoolPictureGenerator(loc, event)
-            pic, pic_name = await pic_gen.get_picture()
+            pic, pic_name = await self.render_best_pools(loc, event)
             caption = loc.notification_text_best_pools(event)
             return BoardMessage.make_photo(pic, caption=caption, photo_file_name=pic_name)
 
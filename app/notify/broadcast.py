@@ -1,16 +1,19 @@
 import asyncio
 import random
-from contextlib import contextmanager
+from collections import defaultdict
+from contextlib import contextmanager, asynccontextmanager
 from contextvars import ContextVar
-from typing import List, Tuple, Any
+from typing import List, Tuple, Any, Dict
 
 from comm.localization.eng_base import BaseLocalization
 from comm.localization.manager import LocalizationManager
 from lib.date_utils import parse_timespan_to_seconds, now_ts, DAY
 from lib.depcont import DepContainer
+from lib.config import SubConfig
 from lib.logs import WithLogger
 from lib.rate_limit import RateLimitCooldown
 from lib.texts import shorten_text
+from notify.broadcast_queue import BroadcastQueue, PersonalSendQueue
 from notify.channel import Messengers, ChannelDescriptor, CHANNEL_INACTIVE, BoardMessage
 
 
@@ -22,8 +25,8 @@ class Broadcaster(WithLogger):
         super().__init__()
         self.deps = d
 
-        self._broadcast_lock = asyncio.Lock()
-        self._rate_limit_lock = asyncio.Lock()
+        # personal messages: one at a time per channel (to keep the order), many channels concurrently
+        self._channel_locks: Dict[str, list] = {}
         self._rng = random.Random(now_ts())
         self._public_channel_scope: ContextVar[Any] = ContextVar('public_broadcast_channels', default=self._ALL_CHANNELS)
 
@@ -38,6 +41,21 @@ class Broadcaster(WithLogger):
         self._limit_number = _rate_limit_cfg.as_int('number', 10)
         self._limit_period = parse_timespan_to_seconds(_rate_limit_cfg.as_str('period', '1m'))
         self._limit_cooldown = parse_timespan_to_seconds(_rate_limit_cfg.as_str('cooldown', '5m'))
+        max_concurrent_sends = d.cfg.as_int('personal.max_concurrent_sends', 10)
+        self._personal_semaphore = asyncio.Semaphore(max_concurrent_sends)
+
+        # personal notifications are handed to this queue; it has a fixed number of workers and a size limit
+        self.personal_queue = PersonalSendQueue(
+            self.safe_send_message_rate,
+            workers=max_concurrent_sends,
+            max_size=d.cfg.as_int('personal.send_queue_size', PersonalSendQueue.DEFAULT_MAX_SIZE),
+        )
+
+        # public broadcasts go through the queue: concurrent, throttled per messenger, prioritized
+        self.queue = BroadcastQueue(
+            self._form_message, self._safe_send_message, self._is_broadcast_allowed,
+            d.cfg.get('broadcasting.queue', SubConfig({})),
+        )
 
     def get_channels(self, channel_type):
         return [c for c in self.channels if c.type == channel_type]
@@ -139,15 +157,21 @@ class Broadcaster(WithLogger):
         }
 
         if not callable(f):  # if constant
-            await self._broadcast_to(all_channels, f, msg_type, *args, **kwargs)
+            await self._broadcast_to(all_channels, f, msg_type, **kwargs)
             return
 
         # not to generate same content for different channels with the same languages. test it!
         results_cached_by_lang = {}
+        lang_locks = defaultdict(asyncio.Lock)
 
         async def message_gen(chat_id):
             locale: BaseLocalization = user_lang_map[chat_id]
 
+            # the queue workers run concurrently, so the same language must not be rendered twice
+            async with lang_locks[locale.name]:
+                return await make_content(locale)
+
+        async def make_content(locale: BaseLocalization):
             if prev_content := results_cached_by_lang.get(locale.name):
                 return prev_content
 
@@ -215,12 +239,26 @@ class Broadcaster(WithLogger):
 
         return result
 
+    @asynccontextmanager
+    async def _channel_lock(self, channel_info: ChannelDescriptor):
+        key = channel_info.short_coded
+        entry = self._channel_locks.setdefault(key, [asyncio.Lock(), 0])  # lock, number of users
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._channel_locks[key]
+
     async def safe_send_message_rate(self, channel_info: ChannelDescriptor,
                                      message: BoardMessage, **kwargs) -> Tuple[str, bool]:
-        async with self._rate_limit_lock:
+        async with self._channel_lock(channel_info), self._personal_semaphore:
             # message is already BoarMessage!
             # message = await self._form_message(message, channel_info, message.msg_type)
 
+            # rate limit and cooldown are checked atomically in Redis, no global lock needed
             limiter = RateLimitCooldown(self.deps.db,
                                         f'SendMessage:{channel_info.short_coded}',
                                         self._limit_number,
@@ -264,37 +302,29 @@ class Broadcaster(WithLogger):
         else:
             raise ValueError(f'Unsupported message data source: {data_source!r}')
 
-    async def _broadcast_to(self, channels: List[ChannelDescriptor], message, msg_type, delay=0.075, **kwargs) -> int:
+    async def _is_broadcast_allowed(self, msg_type, channel_info: ChannelDescriptor) -> bool:
+        return await self.deps.flagship.is_flag_set(f"{msg_type}:broadcast:{channel_info.type}")
+
+    async def _broadcast_to(self, channels: List[ChannelDescriptor], message, msg_type, **kwargs) -> int:
         if now_ts() < self._skip_all_before:
             self.logger.warning('Skip message.')
             return 0
 
-        async with self._broadcast_lock:
-            count = 0
-
-            try:
-                for channel_info in channels:
-                    # make from any message a BoardMessage
-                    b_message = await self._form_message(message, channel_info, msg_type, **kwargs)
-                    if b_message.is_empty:
-                        continue
+        futures = [
+            self.queue.put(
+                channel_info, message, msg_type,
+                form_kwargs=kwargs,
+                send_kwargs=dict(disable_web_page_preview=True, disable_notification=False, **kwargs),
+            )
+            for channel_info in channels
+        ]
 
-                    if not await self.deps.flagship.is_flag_set(f"{msg_type}:broadcast:{channel_info.type}"):
-                        self.logger.warning(
-                            f"Flag is not set for broadcasting {msg_type} to "
-                            f"{channel_info.type} ({channel_info.short_coded})! Skipping.")
-                        continue
-
-                    send_results = await self._safe_send_message(
-                        channel_info, b_message,
-                        disable_web_page_preview=True,
-                        disable_notification=False, **kwargs)
-
-                    if send_results:
-                        count += 1
-
-                    await asyncio.sleep(delay)  # 10 messages per second (Limit: 30 messages per second)
-            finally:
-                self.logger.info(f"{count} messages successful sent (of {len(channels)})")
+        count = 0
+        try:
+            results = await asyncio.gather(*futures, return_exceptions=True)
+            count = sum(1 for r in results if r is True)
+        finally:
+            self.logger.info(f"{count} messages successful sent (of {len(channels)}), "
+                             f"{msg_type} {self.queue.latency_summary(msg_type)}")
 
-            return count
+        return count
@@ -0,0 +1,312 @@
+import asyncio
+import heapq
+import itertools
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Callable, Awaitable, List
+
+from lib.config import SubConfig
+from lib.date_utils import now_ts
+from lib.logs import WithLogger
+from lib.rate_limit import TokenBucket
+from notify.channel import ChannelDescriptor, Messengers, BoardMessage
+
+
+class Priority:
+    HIGH = 0
+    NORMAL = 5
+    LOW = 9
+
+
+# msg_type prefix => priority; the longest matching prefix wins. Can be overridden in the config.
+DEFAULT_PRIORITIES = {
+    'public:chain_halt': Priority.HIGH,
+    'public:block_speed': Priority.HIGH,
+    'public:chain_id_change': Priority.HIGH,
+    'public:mimir_change': Priority.HIGH,
+    'public:version:changed': Priority.HIGH,
+    'public:node_churn': Priority.HIGH,
+    'public:key_stats': Priority.LOW,
+    'public:best_pools': Priority.LOW,
+    'public:network_stats': Priority.LOW,
+    'public:dex_report': Priority.LOW,
+    'public:runepool_stats': Priority.LOW,
+    'public:pol': Priority.LOW,
+    'public:rune_supply': Priority.LOW,
+    'public:tcy:summary': Priority.LOW,
+    'public:trade_account:summary': Priority.LOW,
+    'public:secured_asset:summary': Priority.LOW,
+    'public:rapid_swaps:stats': Priority.LOW,
+    'public:limit_swaps:stats': Priority.LOW,
+    'public:app_layer:stats': Priority.LOW,
+    'public:rujira:merge_stats': Priority.LOW,
+    'debug': Priority.LOW,
+}
+
+# messenger => (global messages per second, messages per second to one chat)
+DEFAULT_LIMITS = {
+    Messengers.TELEGRAM: (30.0, 1.0),
+    Messengers.DISCORD: (40.0, 5.0),
+    Messengers.SLACK: (20.0, 1.0),
+    Messengers.TWITTER: (1.0, 1.0),
+}
+
+
+@dataclass
+class LatencyStats:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    last: float = 0.0
+
+    def add(self, latency: float):
+        self.count += 1
+        self.total += latency
+        self.max = max(self.max, latency)
+        self.last = latency
+
+    @property
+    def avg(self):
+        return self.total / self.count if self.count else 0.0
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    channel: ChannelDescriptor = field(compare=False)
+    source: Any = field(compare=False)
+    msg_type: str = field(compare=False)
+    form_kwargs: dict = field(compare=False)
+    send_kwargs: dict = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_ts: float = field(compare=False, default_factory=now_ts)
+
+
+class BroadcastQueue(WithLogger):
+    """
+    Outbound queue of the public broadcasts.
+    Several workers send concurrently. Every messenger has a global token bucket and a bucket per chat,
+    so we stay within the platform limits without a fixed sleep between messages.
+    The jobs are ordered by priority (see DEFAULT_PRIORITIES), then by arrival.
+    One channel is served by one worker at a time, so its messages arrive in that order:
+    a job for a busy channel is handed over to the worker that is sending there.
+    """
+
+    DEFAULT_WORKERS = 8
+    MAX_IDLE_CHAT_BUCKETS = 1000
+
+    def __init__(self,
+                 form_message: Callable[..., Awaitable[BoardMessage]],
+                 send_message: Callable[..., Awaitable[bool]],
+                 is_allowed: Callable[[str, ChannelDescriptor], Awaitable[bool]],
+                 cfg: Optional[SubConfig] = None):
+        super().__init__()
+        self._form_message = form_message
+        self._send_message = send_message
+        self._is_allowed = is_allowed
+
+        self.workers = cfg.as_int('workers', self.DEFAULT_WORKERS) if cfg else self.DEFAULT_WORKERS
+
+        self.priorities = dict(DEFAULT_PRIORITIES)
+        self.limits = dict(DEFAULT_LIMITS)
+        if cfg:
+            self.priorities.update({k: int(v) for k, v in cfg.get_pure('priorities', {}).items()})
+            for messenger, limits in cfg.get_pure('limits', {}).items():
+                default_global, default_per_chat = self.limits.get(messenger, (1.0, 1.0))
+                self.limits[messenger] = (
+                    float(limits.get('global', default_global)),
+                    float(limits.get('per_chat', default_per_chat)),
+                )
+
+        self._global_buckets: Dict[str, TokenBucket] = {}
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._worker_tasks = []
+        self._seq = itertools.count()
+        # channel => heap of the jobs waiting for the worker that is sending to this channel now
+        self._busy_channels: Dict[str, List[_Job]] = {}
+        self.latency: Dict[str, LatencyStats] = {}
+
+    def priority_of(self, msg_type: str) -> int:
+        msg_type = msg_type or ''
+        best_len, priority = -1, Priority.NORMAL
+        for prefix, p in self.priorities.items():
+            if msg_type.startswith(prefix) and len(prefix) > best_len:
+                best_len, priority = len(prefix), p
+        return priority
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+        if not self._worker_tasks:
+            self._worker_tasks = [asyncio.create_task(self._worker(i)) for i in range(max(1, self.workers))]
+
+    async def stop(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def put(self, channel: ChannelDescriptor, source, msg_type: str,
+            priority: Optional[int] = None, form_kwargs=None, send_kwargs=None) -> asyncio.Future:
+        """
+        Enqueues one message to one channel. The returned future resolves to True if it was sent.
+        """
+        self._ensure_started()
+        job = _Job(
+            priority=self.priority_of(msg_type) if priority is None else priority,
+            seq=next(self._seq),
+            channel=channel,
+            source=source,
+            msg_type=msg_type,
+            form_kwargs=form_kwargs or {},
+            send_kwargs=send_kwargs or {},
+            future=asyncio.get_running_loop().create_future(),
+        )
+        self._queue.put_nowait(job)
+        return job.future
+
+    @property
+    def size(self):
+        queued = self._queue.qsize() if self._queue else 0
+        return queued + sum(len(waiting) for waiting in self._busy_channels.values())
+
+    def _buckets_for(self, channel: ChannelDescriptor):
+        global_rate, chat_rate = self.limits.get(channel.type, (1.0, 1.0))
+
+        global_bucket = self._global_buckets.get(channel.type)
+        if global_bucket is None:
+            global_bucket = self._global_buckets[channel.type] = TokenBucket(global_rate)
+
+        key = channel.short_coded
+        chat_bucket = self._chat_buckets.get(key)
+        if chat_bucket is None:
+            if len(self._chat_buckets) >= self.MAX_IDLE_CHAT_BUCKETS:
+                self._chat_buckets = {k: b for k, b in self._chat_buckets.items() if not b.is_full}
+            # no bursts to a single chat
+            chat_bucket = self._chat_buckets[key] = TokenBucket(chat_rate, capacity=1.0)
+        return global_bucket, chat_bucket
+
+    async def _worker(self, index):
+        while True:
+            job: _Job = await self._queue.get()
+            key = job.channel.short_coded
+            waiting = self._busy_channels.get(key)
+            if waiting is not None:
+                heapq.heappush(waiting, job)
+                continue
+
+            waiting = self._busy_channels[key] = []
+            try:
+                while job is not None:
+                    await self._run(job, index)
+                    job = heapq.heappop(waiting) if waiting else None
+            except asyncio.CancelledError:
+                for left in waiting:
+                    left.future.cancel()
+                raise
+            finally:
+                del self._busy_channels[key]
+
+    async def _run(self, job: _Job, index):
+        try:
+            result = await self._process(job)
+        except asyncio.CancelledError:
+            if not job.future.done():
+                job.future.cancel()
+            raise
+        except Exception:
+            self.logger.exception(f'Broadcast worker #{index} failed to process {job.msg_type}')
+            result = False
+        finally:
+            self._queue.task_done()
+        if not job.future.done():
+            job.future.set_result(result)
+
+    async def _process(self, job: _Job) -> bool:
+        message = await self._form_message(job.source, job.channel, job.msg_type, **job.form_kwargs)
+        if message.is_empty:
+            return False
+
+        if not await self._is_allowed(job.msg_type, job.channel):
+            self.logger.warning(f"Flag is not set for broadcasting {job.msg_type} to "
+                                f"{job.channel.type} ({job.channel.short_coded})! Skipping.")
+            return False
+
+        global_bucket, chat_bucket = self._buckets_for(job.channel)
+        await chat_bucket.acquire()
+        await global_bucket.acquire()
+
+        result = await self._send_message(job.channel, message, **job.send_kwargs)
+        if result:
+            self.latency.setdefault(job.msg_type, LatencyStats()).add(now_ts() - job.enqueued_ts)
+        return bool(result)
+
+    def latency_summary(self, msg_type: str) -> str:
+        stats = self.latency.get(msg_type)
+        if not stats:
+            return 'no deliveries'
+        return f'delivery latency: avg {stats.avg:.2f}s, max {stats.max:.2f}s, last {stats.last:.2f}s'
+
+
+class PersonalSendQueue(WithLogger):
+    """
+    Bounded queue of the personal messages, sent by a fixed number of workers.
+    put() waits while the queue is full, so a node churn that touches thousands of users
+    slows down the message generation instead of spawning a task per message.
+    """
+
+    DEFAULT_WORKERS = 10
+    DEFAULT_MAX_SIZE = 1000
+
+    def __init__(self, send_message: Callable[..., Awaitable[Any]],
+                 workers=DEFAULT_WORKERS, max_size=DEFAULT_MAX_SIZE):
+        super().__init__()
+        self._send_message = send_message
+        self.workers = workers
+        self.max_size = max_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks = []
+        self.sent = 0
+        self.errors = 0
+        self.max_depth = 0
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=max(1, self.max_size))
+        if not self._worker_tasks:
+            self._worker_tasks = [asyncio.create_task(self._worker(i)) for i in range(max(1, self.workers))]
+
+    async def put(self, channel: ChannelDescriptor, message: BoardMessage, **send_kwargs):
+        self._ensure_started()
+        await self._queue.put((channel, message, send_kwargs))
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    @property
+    def size(self):
+        return self._queue.qsize() if self._queue else 0
+
+    async def join(self):
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    async def _worker(self, index):
+        while True:
+            channel, message, send_kwargs = await self._queue.get()
+            try:
+                await self._send_message(channel, message, **send_kwargs)
+                self.sent += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.errors += 1
+                self.logger.exception(f'Personal worker #{index} failed to send {message.msg_type} '
+                                      f'to {channel.short_coded}')
+            finally:
+                self._queue.task_done()
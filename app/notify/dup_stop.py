@@ -1,9 +1,11 @@
-import asyncio
-from typing import List
+import weakref
+from collections import Counter
+from typing import List, Optional
 
 from redis import Redis
 
-from lib.bloom_filt import BloomFilter
+from lib.bloom_filt import BloomFilter, BloomFilterV3
+from lib.date_utils import now_ts, DAY
 from lib.cooldown import Cooldown
 from lib.db import DB
 from lib.logs import WithLogger
@@ -17,17 +19,34 @@ MAX_SIZE = 2 * 1024 * 1024 * 1024  # 2 GiB
 
 
 class TxDeduplicator(WithLogger):
+    STATS_FLUSH_INTERVAL = 30.0  # sec
+    LEGACY_KEY_PREFIX = 'tx:dedup_v2'
+    # after the switch to v3, the v2 bitmap is still read for this long, then it is dropped
+    LEGACY_READ_PERIOD = 30 * DAY
+
+    # live instances, their pending stats are written on shutdown (see flush_all_stats)
+    _instances = weakref.WeakSet()
+
     def __init__(self, db: DB, key, capacity=BLOOM_TX_CAPACITY, error_rate=BLOOM_TX_ERROR_RATE):
         super().__init__()
         self.db = db
+        # request counters are accumulated here and written along with a later bloom query or on shutdown
+        self._pending_stats = Counter()
+        self._last_stats_flush = now_ts()
 
         assert capacity > 10
         assert 0.0001 < error_rate < 0.1
         assert key and isinstance(key, str)
 
-        full_key = f'tx:dedup_v2:{key}'
-        self._stats_key = f'tx:dedup_v2:{key}:stats'
-        self._bf = BloomFilter(self.db.redis, full_key, capacity, error_rate)
+        # v3: double hashing positions (see BloomFilterV3), incompatible with the SHA3-based v2 bitmaps
+        full_key = f'tx:dedup_v3:{key}'
+        self._stats_key = f'tx:dedup_v3:{key}:stats'
+        self._bf = BloomFilterV3(self.db.redis, full_key, capacity, error_rate)
+
+        # hashes marked before the upgrade live in the v2 bitmap (same size, SHA3 positions)
+        self._legacy_bf = BloomFilter(self.db.redis, f'{self.LEGACY_KEY_PREFIX}:{key}', capacity, error_rate)
+        self._legacy_keys = [self._legacy_bf.redis_key, f'{self.LEGACY_KEY_PREFIX}:{key}:stats']
+        self._legacy_until: Optional[float] = None  # None = not checked yet, 0 = no v2 bitmap to read
         if self._bf.size > MAX_SIZE:
             self.logger.critical(f'Bloom filter size {sizeof_fmt(self.size_bytes)} '
                                  f'exceeds max allowed {sizeof_fmt(MAX_SIZE)}!')
@@ -37,15 +56,62 @@ class TxDeduplicator(WithLogger):
             f'Initialized with key={key}, capacity={capacity}, error_rate={error_rate}. Size is {self._bf.size} bits or '
             f'{sizeof_fmt(self.size_bytes)}.')
 
+        self._instances.add(self)
+
     async def load_stats(self):
         r: Redis = self.db.redis
         stats = await r.hgetall(self._stats_key)
         return {
-            'total_requests': int(stats.get('total_requests', 0)),
-            'positive_requests': int(stats.get('positive_requests', 0)),
-            'write_requests': int(stats.get('write_requests', 0)),
+            name: int(stats.get(name, 0)) + self._pending_stats[name]
+            for name in ('total_requests', 'positive_requests', 'write_requests')
         }
 
+    def _queue_stats_flush(self, pipe, force=False):
+        if not self._pending_stats:
+            return
+        if not force and now_ts() - self._last_stats_flush < self.STATS_FLUSH_INTERVAL:
+            return
+        for name, value in self._pending_stats.items():
+            pipe.hincrby(self._stats_key, name, value)
+        self._pending_stats.clear()
+        self._last_stats_flush = now_ts()
+
+    async def flush_stats(self):
+        if not self._pending_stats:
+            return
+        async with self.db.redis.pipeline(transaction=False) as pipe:
+            self._queue_stats_flush(pipe, force=True)
+            await pipe.execute()
+
+    @classmethod
+    async def flush_all_stats(cls):
+        for dedup in list(cls._instances):
+            await dedup.flush_stats()
+
+    async def _get_legacy_filter(self) -> Optional[BloomFilter]:
+        """
+        The v2 bitmap is read along with v3 for LEGACY_READ_PERIOD since the first v3 query, so that
+        the hashes marked before the upgrade are still reported as seen. Then it is dropped.
+        """
+        r: Redis = self.db.redis
+        if self._legacy_until is None:
+            async with r.pipeline(transaction=False) as pipe:
+                pipe.exists(self._legacy_bf.redis_key)
+                pipe.hget(self._stats_key, 'v3_since')
+                has_legacy, v3_since = await pipe.execute()
+            if has_legacy and not v3_since:
+                v3_since = int(now_ts())
+                await r.hsetnx(self._stats_key, 'v3_since', v3_since)
+            self._legacy_until = float(v3_since) + self.LEGACY_READ_PERIOD if has_legacy else 0.0
+
+        if self._legacy_until and now_ts() >= self._legacy_until:
+            # UNLINK frees the memory in the background, a big bitmap does not block Redis
+            await r.unlink(*self._legacy_keys)
+            self._legacy_until = 0.0
+            self.logger.info(f'Dropped the legacy bitmap {self._legacy_bf.redis_key}.')
+
+        return self._legacy_bf if self._legacy_until else None
+
     async def bit_count(self):
         return await self._bf.bit_count()
 
@@ -68,16 +134,17 @@ class TxDeduplicator(WithLogger):
         return f'<TxDeduplicator key={self.key}, size={self._bf.size}, hashes={self._bf.hash_count}>'
 
     async def mark_as_seen(self, tx_id):
-        if not tx_id:
-            return
-        await self._bf.add(tx_id)
+        await self.mark_as_seen_hashes([tx_id])
 
-        await self.db.redis.hincrby(self._stats_key, 'write_requests', 1)
+    async def mark_as_seen_hashes(self, tx_ids: List[str]):
+        tx_ids = [tx_id for tx_id in tx_ids if tx_id]
+        if not tx_ids:
+            return
+        self._pending_stats['write_requests'] += len(tx_ids)
+        await self._bf.add_many(tx_ids, extra=self._queue_stats_flush)
 
     async def mark_as_seen_txs(self, txs: List[ThorAction]):
-        for tx in txs:
-            if tx and tx.tx_hash:
-                await self.mark_as_seen(tx.tx_hash)
+        await self.mark_as_seen_hashes([tx.tx_hash for tx in txs if tx])
 
     async def forget(self, tx_id):
         raise NotImplementedError
@@ -88,18 +155,29 @@ class TxDeduplicator(WithLogger):
         return await self.have_ever_seen_hash(tx.tx_hash)
 
     async def have_ever_seen_hash(self, tx_id):
-        if not tx_id:
-            return True
-
-        r = await self._bf.contains(tx_id)
-        await self.db.redis.hincrby(self._stats_key, 'total_requests', 1)
-        if r:
-            await self.db.redis.hincrby(self._stats_key, 'positive_requests', 1)
-
-        return r
+        return (await self.batch_ever_seen_hashes([tx_id]))[0]
 
     async def batch_ever_seen_hashes(self, txs: List[str]):
-        return await asyncio.gather(*[self.have_ever_seen_hash(tx_hash) for tx_hash in txs])
+        """
+        One round trip for the whole batch: a single BITFIELD command (+ the stats if it is time to flush them).
+        While the v2 bitmap is read, the misses are looked up there in one more round trip.
+        Empty hashes are reported as seen.
+        """
+        valid = [tx_id for tx_id in txs if tx_id]
+        legacy_bf = await self._get_legacy_filter()
+        flags = dict(zip(valid, await self._bf.contains_many(valid, extra=self._queue_stats_flush))) if valid else {}
+
+        misses = [tx_id for tx_id, flag in flags.items() if not flag]
+        if legacy_bf and misses:
+            seen_before = [tx_id for tx_id, flag in zip(misses, await legacy_bf.contains_many(misses)) if flag]
+            if seen_before:
+                # copy them to v3, so they stay seen after the v2 bitmap is dropped
+                await self._bf.add_many(seen_before)
+                flags.update(dict.fromkeys(seen_before, True))
+
+        self._pending_stats['total_requests'] += len(valid)
+        self._pending_stats['positive_requests'] += sum(1 for f in flags.values() if f)
+        return [flags.get(tx_id, True) for tx_id in txs]
 
     async def only_hashes_having_certain_flag(self, txs: List[str], desired_flag) -> List[str]:
         flags = await self.batch_ever_seen_hashes(txs)
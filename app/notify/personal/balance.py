@@ -13,15 +13,15 @@ from .helpers import GeneralSettings, Props
 
 
 class WalletWatchlist(UserWatchlist):
-    def __init__(self, db: DB):
-        super().__init__(db, 'Wallet')
+    def __init__(self, db: DB, local_index=False):
+        super().__init__(db, 'Wallet', local_index)
 
 
 class PersonalBalanceNotifier(BasePersonalNotifier):
     MAX_TRANSFER_PER_MESSAGE = 3
 
     def __init__(self, d: DepContainer):
-        watcher = WalletWatchlist(d.db)
+        watcher = WalletWatchlist(d.db, local_index=bool(d.cfg.get_pure('personal.watchlist_local_index', False)))
         super().__init__(d, watcher)
 
     async def on_data(self, sender, transfers: List[NativeTokenTransfer]):
@@ -3,6 +3,7 @@ import asyncio
 from abc import ABC
 from collections import defaultdict
 
+from api.midgard.name_service import NameMap
 from lib.delegates import INotified
 from lib.depcont import DepContainer
 from lib.logs import WithLogger
@@ -12,23 +13,26 @@ from notify.channel import ChannelDescriptor, BoardMessage
 
 
 class BasePersonalNotifier(INotified, WithLogger, ABC):
+    DEFAULT_MAX_CONCURRENT_USERS = 20
+
     def __init__(self, d: DepContainer, watcher, max_events_per_message=3):
         super().__init__()
         self.deps = d
         self.watcher = watcher
         self.max_events_per_message = max_events_per_message
+        self.max_concurrent_users = d.cfg.as_int('personal.max_concurrent_users', self.DEFAULT_MAX_CONCURRENT_USERS)
 
     async def _send_message(self, message, settings, user, msg_type):
         platform = SettingsManager.get_platform(settings)
 
         message = message.strip()
         if message:
-            task = self.deps.broadcaster.safe_send_message_rate(
+            # waits if the send queue is full
+            await self.deps.broadcaster.personal_queue.put(
                 ChannelDescriptor(platform, user),
                 BoardMessage(message, msg_type=msg_type),
                 disable_web_page_preview=True
             )
-            asyncio.create_task(task)
 
     async def group_and_send_messages(self, addresses, events, glue='\n\n', msg_type='personal:generic'):
         if not addresses:
@@ -56,39 +60,54 @@ class BasePersonalNotifier(INotified, WithLogger, ABC):
         # Load their settings
         settings_dic = await self.deps.settings_manager.get_settings_multi(user_events.keys())
 
-        for user, event_list in user_events.items():
-            settings = settings_dic.get(user, {})
+        user_events = {
+            user: event_list for user, event_list in user_events.items()
+            if not SettingsContext.is_inactive_s(settings_dic.get(user, {}))  # paused
+        }
+        if not user_events:
+            return
 
-            if SettingsContext.is_inactive_s(settings):
-                continue  # paused
+        # Languages and local wallet names of all the users in bulk
+        loc_dic = await self.deps.loc_man.get_from_db_many(user_events.keys(), self.deps.db)
+        local_name_maps = await self.deps.name_service.get_local_name_maps(user_events.keys())
 
-            # filter events according to the user's preferences
-            filtered_event_list = await self.filter_events(event_list, user, settings)
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrent_users))
 
-            # split to several messages
-            groups = list(grouper(self.max_events_per_message, filtered_event_list))
+        async def process_user(user, event_list):
+            async with semaphore:
+                try:
+                    await self._process_user(
+                        user, event_list, settings_dic.get(user, {}), loc_dic[user],
+                        user_to_address.get(user, []),
+                        name_map.joined_with(local_name_maps.get(user) or NameMap.empty()),
+                        glue, msg_type,
+                    )
+                except Exception as e:
+                    self.logger.exception(f'Failed to notify user {user}: {e!r}')
 
-            if groups:
-                self.logger.info(f'Sending personal notifications to user: {user}: '
-                                 f'{len(event_list)} events grouped to {len(groups)} groups...')
+        await asyncio.gather(*(process_user(user, event_list) for user, event_list in user_events.items()))
 
-                loc = await self.deps.loc_man.get_from_db(user, self.deps.db)
+    async def _process_user(self, user, event_list, settings, loc, user_watch_addy_list, name_map_for_user,
+                            glue, msg_type):
+        # filter events according to the user's preferences
+        filtered_event_list = await self.filter_events(event_list, user, settings)
 
-                user_watch_addy_list = user_to_address.get(user, [])
+        # split to several messages
+        groups = list(grouper(self.max_events_per_message, filtered_event_list))
 
-                for group in groups:
-                    if group:
-                        local_ns = self.deps.name_service.get_local_service(user)
-                        local_name_map = await local_ns.get_name_map()
-                        name_map_for_user = name_map.joined_with(local_name_map)
+        if groups:
+            self.logger.info(f'Sending personal notifications to user: {user}: '
+                             f'{len(event_list)} events grouped to {len(groups)} groups...')
 
-                        message = await self.generate_message_text(
-                            loc, group, settings, user, user_watch_addy_list, name_map_for_user)
+            for group in groups:
+                if group:
+                    message = await self.generate_message_text(
+                        loc, group, settings, user, user_watch_addy_list, name_map_for_user)
 
-                        if not isinstance(message, str):
-                            message = glue.join(message)
+                    if not isinstance(message, str):
+                        message = glue.join(message)
 
-                        await self._send_message(message, settings, user, msg_type)
+                    await self._send_message(message, settings, user, msg_type)
 
     async def filter_events(self, event_list, user, settings):
         # no operation
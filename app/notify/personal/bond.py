@@ -11,7 +11,7 @@ class BondTracker(BaseChangeTracker):
         self.deps = deps
 
     async def get_events_unsafe(self) -> List[NodeEvent]:
-        return list(self._changes_of_bond(self.prev_and_curr_node_map))
+        return list(self._changes_of_bond(self.node_set_change.changed_node_map('bond')))
 
     def _changes_of_bond(self, pc_node_map: MapAddressToPrevAndCurrNode):
         for a, (prev, curr) in pc_node_map.items():
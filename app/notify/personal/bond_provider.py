@@ -13,13 +13,13 @@ from .base import BasePersonalNotifier
 
 
 class BondWatchlist(UserWatchlist):
-    def __init__(self, db: DB):
-        super().__init__(db, 'BondProvider')
+    def __init__(self, db: DB, local_index=False):
+        super().__init__(db, 'BondProvider', local_index)
 
 
 class PersonalBondProviderNotifier(BasePersonalNotifier):
     def __init__(self, deps: DepContainer):
-        watcher = BondWatchlist(deps.db)
+        watcher = BondWatchlist(deps.db, local_index=bool(deps.cfg.get_pure('personal.watchlist_local_index', False)))
         super().__init__(deps, watcher, max_events_per_message=20)
         self.min_bond_delta_to_react = deps.cfg.as_float(
             'node_info.bond_tools.min_bond_delta_to_react_rune',
@@ -84,7 +84,7 @@ class PersonalBondProviderNotifier(BasePersonalNotifier):
 
     @staticmethod
     def _extract_fee_changes(data: NodeSetChanges):
-        pairs = data.prev_and_curr_node_map
+        pairs = data.changed_node_map('node_operator_fee')
         for address, (old_node, curr_node) in pairs.items():
             old_node: NodeInfo
             curr_node: NodeInfo
@@ -12,7 +12,7 @@ class IpAddressTracker(BaseChangeTracker):
 
     async def get_events_unsafe(self) -> List[NodeEvent]:
         changes = []
-        for a, (prev, curr) in self.prev_and_curr_node_map.items():
+        for a, (prev, curr) in self.node_set_change.changed_node_map('ip_address').items():
             if prev.ip_address != curr.ip_address:
                 changes.append(NodeEvent(
                     prev.node_address, NodeEventType.IP_ADDRESS_CHANGED,
@@ -33,7 +33,9 @@ class NodeChangePersonalNotifier(INotified, WithLogger):
         super().__init__()
 
         self.deps = deps
-        self.watchers = NodeWatcherStorage(deps.db)
+        self.watchers = NodeWatcherStorage(
+            deps.db, local_index=bool(deps.cfg.get_pure('personal.watchlist_local_index', False))
+        )
         self.settings_man = self.deps.settings_manager
 
         # trackers
@@ -171,6 +173,8 @@ class NodeChangePersonalNotifier(INotified, WithLogger):
 
         settings_dic = await self.settings_man.get_settings_multi(user_events.keys())
 
+        loc_dic = await loc_man.get_from_db_many(user_events.keys(), self.deps.db)
+
         # for every user
         for user, event_list in user_events.items():
             settings = settings_dic.get(user, {})
@@ -190,7 +194,7 @@ class NodeChangePersonalNotifier(INotified, WithLogger):
                 self.logger.info(f'Sending personal notifications to user: {user}: '
                                  f'{len(event_list)} changes grouped to {len(groups)} groups...')
 
-                loc = await loc_man.get_from_db(user, self.deps.db)
+                loc = loc_dic[user]
                 platform = SettingsManager.get_platform(settings)
 
                 for group in groups:
@@ -198,13 +202,12 @@ class NodeChangePersonalNotifier(INotified, WithLogger):
                     text = '\n\n'.join(m for m in messages if m)
                     text = text.strip()
                     if text:
-                        task = self.deps.broadcaster.safe_send_message_rate(
+                        # waits if the send queue is full
+                        await self.deps.broadcaster.personal_queue.put(
                             ChannelDescriptor(platform, user),
                             BoardMessage(text, msg_type='personal:node_op_change'),
                             disable_web_page_preview=True
                         )
-                        # noinspection PyAsyncCall
-                        asyncio.create_task(task)
 
     @staticmethod
     async def _filter_events(event_list: List[NodeEvent], user_id, settings: dict) -> List[NodeEvent]:
@@ -1,64 +1,51 @@
-import asyncio
 from typing import List
 
 from lib.date_utils import MINUTE, parse_timespan_to_seconds
 from lib.depcont import DepContainer
 from lib.logs import WithLogger
 from models.node_info import NodeEvent, NodeEventType, EventDataSlash, NodeInfo
-from models.time_series import TimeSeries
+from models.slash_history import SlashPointHistory
 from .helpers import BaseChangeTracker, NodeOpSetting, STANDARD_INTERVALS
 
 
 class SlashPointTracker(BaseChangeTracker, WithLogger):
-    HISTORY_MAX_POINTS = 100_000
     EXTRA_COOLDOWN_MULT = 1.1
+    HISTORY_MARGIN = 10 * MINUTE
+    DB_KEY_OLD_SERIES = 'ts-stream:SlashPointTracker'  # every node on every tick, replaced by SlashPointHistory
 
     def __init__(self, deps: DepContainer):
         super().__init__()
         self.deps = deps
-        self.series = TimeSeries('SlashPointTracker', self.deps.db, self.HISTORY_MAX_POINTS)
         self.std_intervals_sec = [parse_timespan_to_seconds(s) for s in STANDARD_INTERVALS]
         intervals = list(zip(STANDARD_INTERVALS, self.std_intervals_sec))
         self.logger.info(f'{intervals = }')
+        self.history = SlashPointHistory(
+            self.deps.db,
+            keep_sec=max(self.std_intervals_sec) + self.HISTORY_MARGIN,
+            legacy_keys=[self.DB_KEY_OLD_SERIES],
+        )
 
     @staticmethod
     def _extract_slash_points(nodes: List[NodeInfo]):
         return {n.node_address: n.slash_points for n in nodes if n.node_address}
 
-    async def _save_point(self, nodes: List[NodeInfo]):
-        data = self._extract_slash_points(nodes)
-        if data:
-            await self.series.add(**data)
-        # await self.series.trim_oldest(self.HISTORY_MAX_POINTS)
-
-    async def _read_points(self, intervals):
-        tasks = [
-            self.series.get_best_point_ago(ago, tolerance_percent=1, tolerance_sec=20)
-            for ago in intervals
-        ]
-        return await asyncio.gather(*tasks)
-
     async def get_events_unsafe(self) -> List[NodeEvent]:
         nodes = self.node_set_change.nodes_all
-
-        await self._save_point(nodes)
-
-        points = await self._read_points(intervals=self.std_intervals_sec)
         current_state = self._extract_slash_points(nodes)
 
+        await self.history.update(current_state)
+        past_points = self.history.changes_over(self.std_intervals_sec, tolerance_sec=20, tolerance_percent=1)
+
         node_map = {node.node_address: node for node in nodes}
 
         events = []
-        for interval, (data, _) in zip(self.std_intervals_sec, points):
-            if data is None:
-                continue
-
-            for address, slash_pts in data.items():
+        for interval_index, interval in enumerate(self.std_intervals_sec):
+            for address, past in past_points.items():
                 node = node_map.get(address)
-                if not node:
+                slash_pts = past[interval_index]
+                if not node or slash_pts is None:
                     continue
 
-                slash_pts = int(slash_pts)
                 current_slash_pts = int(current_state.get(address, 0))
                 if slash_pts != current_slash_pts:
                     events.append(NodeEvent(
@@ -14,7 +14,7 @@ class VersionTracker(BaseChangeTracker):
 
     async def get_events_unsafe(self) -> List[NodeEvent]:
         changes = []
-        changes += self._changes_of_version(self.node_set_change.prev_and_curr_node_map)
+        changes += self._changes_of_version(self.node_set_change.changed_node_map('version'))
         changes += await self._changes_of_detected_new_version(self.node_set_change)
 
         # # fixme: debug
@@ -1,6 +1,10 @@
+import asyncio
 import logging
+import os
+import time
+from bisect import bisect_left
 from datetime import datetime
-from typing import NamedTuple
+from typing import NamedTuple, Dict, Optional, Tuple, List
 
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 from playwright.async_api import async_playwright, Page, ConsoleMessage
@@ -15,15 +19,54 @@ class HTMLRenderResult(NamedTuple):
     viewport_height: int
 
 
+class RenderTimeHistogram:
+    """
+    Cumulative histogram of render times (seconds), Prometheus style.
+    """
+    BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def to_dict(self):
+        buckets, running = {}, 0
+        for bound, n in zip(self.BUCKETS + (float('inf'),), self.counts):
+            running += n
+            buckets[f'le_{bound}'] = running
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 4),
+            'avg': round(self.sum / self.count, 4) if self.count else 0.0,
+            'max': round(self.max, 4),
+            'buckets': buckets,
+        }
+
+
 class RendererEngine:
     """
     Renderer class to manage Playwright browser instance and render HTML to PNG.
     Supports dynamic viewport sizes per rendering request.
+    Pages are reused: a pool of pages is kept, and no more than `max_concurrency` renders run at the same time.
+    The static assets are served by the same app, so the pages are warmed (assets loaded into the browser cache)
+    by `warm_up` once the server is listening, not in `start`.
     """
 
     def __init__(self, templates_dir: str,
                  device_scale_factor: int = 1,
-                 resource_base_url=''):
+                 resource_base_url='',
+                 static_dir: Optional[str] = None,
+                 page_pool_size: int = 4,
+                 max_concurrency: int = 4,
+                 page_max_uses: int = 200):
         self.templates_dir = templates_dir
         self.default_width = 1280
         self.default_height = 720
@@ -42,6 +85,21 @@ class RendererEngine:
         )
         self.setup_helper_functions()
         self._resource_base_url = resource_base_url
+
+        self.static_dir = static_dir
+        self.page_pool_size = max(0, page_pool_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.page_max_uses = page_max_uses
+        self.warmup_timeout = 10_000  # mSec
+        self._warmup_urls = self._static_asset_urls()
+        self._warmup_html = self._make_warmup_html(self._warmup_urls)
+        self._assets_served = False
+        self._idle_pages: Optional[asyncio.Queue] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.pages_created = 0
+        self.histograms: Dict[str, RenderTimeHistogram] = {}
+
         logging.info(f"Renderer initialized with templates directory: {self.templates_dir}")
 
     def _set_viewport(self, width: int, height: int):
@@ -79,10 +137,51 @@ class RendererEngine:
         logging.info(
             f"Browser launched and context created with default viewport: {self._viewport_w}x{self._viewport_h}")
 
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._idle_pages = asyncio.Queue()
+        pages = await asyncio.gather(*[self._new_page() for _ in range(self.page_pool_size)])
+        for page in pages:
+            self._idle_pages.put_nowait((page, 0))
+        logging.info(f"Page pool is ready: {len(pages)} pages, max concurrency is {self.max_concurrency}.")
+
+    async def warm_up(self, attempts=60, delay=0.5):
+        """
+        Waits until the static assets are served, then loads them into the browser cache with the idle pages.
+        Run it in the background after the start: the server is not listening yet while the app starts.
+        """
+        if not self._warmup_html:
+            return
+
+        probe = self._warmup_urls[0]
+        for _ in range(attempts):
+            try:
+                response = await self.browser_context.request.get(probe, timeout=self.warmup_timeout)
+                if response.ok:
+                    break
+            except Exception as e:
+                logging.debug(f"Static assets are not served yet: {e}")
+            await asyncio.sleep(delay)
+        else:
+            logging.warning(f"Static assets are not served at {probe}; the page pool stays cold.")
+            return
+
+        self._assets_served = True
+        pages = []
+        while not self._idle_pages.empty():
+            pages.append(self._idle_pages.get_nowait())
+        await asyncio.gather(*[self._warm_page(page) for page, _ in pages])
+        for page, uses in pages:
+            await self._release_page(page, uses, healthy=True)
+        logging.info(f"Page pool is warm: {len(pages)} pages.")
+
     async def stop(self):
         """
         Close the browser and Playwright.
         """
+        if self._idle_pages:
+            while not self._idle_pages.empty():
+                page, _ = self._idle_pages.get_nowait()
+                await page.close()
         if self.browser_context:
             await self.browser_context.close()
             logging.info("Browser context closed.")
@@ -118,36 +217,114 @@ class RendererEngine:
             logging.error(f"Error rendering template '{template_name}': {e}")
             raise e
 
-    async def render_html_to_png(self, r: HTMLRenderResult) -> bytes:
+    def _static_asset_urls(self) -> List[str]:
+        if not self.static_dir or not os.path.isdir(self.static_dir):
+            return []
+
+        base = f'{self._resource_base_url}/static'
+        return [
+            f'{base}/{sub_dir}/{file_name}' if sub_dir else f'{base}/{file_name}'
+            for sub_dir, file_names in sorted(self._walk_static())
+            for file_name in file_names
+            if file_name.endswith(('.css', '.js', '.ttf', '.otf', '.woff', '.woff2'))
+        ]
+
+    @staticmethod
+    def _make_warmup_html(urls: List[str]) -> str:
         """
-        Render HTML content to PNG using Playwright with dynamic viewport sizes.
-        If width and height are not provided, use the default viewport from the context.
+        A blank page that references the static styles, scripts and fonts,
+        so that a fresh page loads them into the browser cache before the first real render.
         """
+        if not urls:
+            return ''
+
+        head = []
+        for url in urls:
+            if url.endswith('.css'):
+                head.append(f'<link rel="stylesheet" href="{url}">')
+            elif url.endswith('.js'):
+                head.append(f'<script src="{url}"></script>')
+            else:
+                head.append(f'<link rel="preload" as="font" crossorigin href="{url}">')
+        return f'<html><head>{"".join(head)}</head><body></body></html>'
+
+    def _walk_static(self):
+        for root, _, file_names in os.walk(self.static_dir):
+            sub_dir = os.path.relpath(root, self.static_dir).replace(os.sep, '/')
+            yield ('' if sub_dir == '.' else sub_dir), sorted(file_names)
+
+    async def _new_page(self) -> Page:
+        page: Page = await self.browser_context.new_page()
+        self.pages_created += 1
+        if self._assets_served:
+            await self._warm_page(page)
+        return page
+
+    async def _warm_page(self, page: Page):
         try:
-            # Create a new page
-            page: Page = await self.browser_context.new_page()
-
-            width, height = r.viewport_width, r.viewport_height
-
-            # If width and height are specified, set the viewport for this page
-            await page.set_viewport_size({'width': int(width), 'height': int(height)})
-            logging.info(f"Set viewport size to {width} x {height}")
-
-            # Set the HTML content
-            await page.set_content(r.html_content, wait_until='networkidle', timeout=self.render_timeout)
-
-            # Take a screenshot
-            png_bytes = await page.screenshot(full_page=True)
+            await page.set_content(self._warmup_html, wait_until='networkidle', timeout=self.warmup_timeout)
+        except Exception as e:
+            logging.warning(f"Failed to warm up a page: {e}")
 
-            # Close the page
+    async def _acquire_page(self) -> Tuple[Page, int]:
+        try:
+            return self._idle_pages.get_nowait()
+        except asyncio.QueueEmpty:
+            return await self._new_page(), 0
+
+    async def _release_page(self, page: Page, uses: int, healthy: bool):
+        if healthy and uses < self.page_max_uses and self._idle_pages.qsize() < self.page_pool_size:
+            self._idle_pages.put_nowait((page, uses))
+        else:
             await page.close()
 
-            logging.info(f"HTML content {len(r.html_content)} bytes long rendered to PNG successfully"
-                         f" with viewport size: {width} x {height}")
-            return png_bytes
-        except Exception as e:
-            logging.error(f"Error rendering HTML to PNG: {e}")
-            raise e
+    async def render_html_to_png(self, r: HTMLRenderResult, template_name: str = '') -> bytes:
+        """
+        Render HTML content to PNG using Playwright with dynamic viewport sizes.
+        A warm page is taken from the pool and returned there afterward.
+        """
+        async with self._semaphore:
+            page, uses = await self._acquire_page()
+            healthy = False
+            self.in_flight += 1
+            start_time = time.monotonic()
+            try:
+                width, height = r.viewport_width, r.viewport_height
+
+                # If width and height are specified, set the viewport for this page
+                await page.set_viewport_size({'width': int(width), 'height': int(height)})
+                logging.info(f"Set viewport size to {width} x {height}")
+
+                # Set the HTML content
+                await page.set_content(r.html_content, wait_until='networkidle', timeout=self.render_timeout)
+
+                # Take a screenshot
+                png_bytes = await page.screenshot(full_page=True)
+                healthy = True
+
+                elapsed = time.monotonic() - start_time
+                self.histograms.setdefault(template_name or 'unknown', RenderTimeHistogram()).observe(elapsed)
+
+                logging.info(f"HTML content {len(r.html_content)} bytes long rendered to PNG successfully"
+                             f" with viewport size: {width} x {height} in {elapsed:.2f} sec")
+                return png_bytes
+            except Exception as e:
+                logging.error(f"Error rendering HTML to PNG: {e}")
+                raise e
+            finally:
+                self.in_flight -= 1
+                await self._release_page(page, uses + 1, healthy)
+
+    def stats(self):
+        return {
+            'page_pool_size': self.page_pool_size,
+            'pages_idle': self._idle_pages.qsize() if self._idle_pages else 0,
+            'pages_created': self.pages_created,
+            'warm': self._assets_served,
+            'max_concurrency': self.max_concurrency,
+            'in_flight': self.in_flight,
+            'render_time': {name: h.to_dict() for name, h in sorted(self.histograms.items())},
+        }
 
     async def on_new_page(self, page: Page):
         """
@@ -1,3 +1,5 @@
+import asyncio
+import base64
 import json
 import logging
 import os
@@ -6,7 +8,7 @@ import sys
 import time
 import traceback
 from contextlib import asynccontextmanager
-from typing import Dict
+from typing import Dict, List
 
 from fastapi import FastAPI, Response, Request
 from fastapi.staticfiles import StaticFiles
@@ -23,6 +25,12 @@ TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templa
 # todo: get it from env or something like that...
 LOC_HOST_BASE = 'http://127.0.0.1:8404'
 
+STATIC_DIR = 'data/renderer/static'
+
+# how many warm pages are kept open and how many renders may run at once
+PAGE_POOL_SIZE = int(os.environ.get('RENDERER_PAGE_POOL_SIZE', 4))
+MAX_CONCURRENCY = int(os.environ.get('RENDERER_MAX_CONCURRENCY', 4))
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -39,8 +47,17 @@ class RenderRequest(BaseModel):
         "example": {"title": "Test", "heading": "Hello", "message": "This is a test."}})
 
 
+class RenderBatchRequest(BaseModel):
+    template_name: str = Field(..., json_schema_extra={"example": "example.jinja2"})
+    parameters_list: List[Dict] = Field(..., json_schema_extra={
+        "example": [{"title": "Test", "heading": "Hello"}, {"title": "Тест", "heading": "Привет"}]})
+
+
 renderer = RendererEngine(templates_dir=TEMPLATES_DIR, device_scale_factor=DEVICE_SCALE_FACTOR,
-                          resource_base_url=LOC_HOST_BASE)
+                          resource_base_url=LOC_HOST_BASE,
+                          static_dir=STATIC_DIR,
+                          page_pool_size=PAGE_POOL_SIZE,
+                          max_concurrency=MAX_CONCURRENCY)
 
 
 # Initialize FastAPI with Lifespan
@@ -56,9 +73,13 @@ async def lifespan(_: FastAPI):
     await renderer.start()
     logging.info("Renderer started.")
 
+    # the static assets are served by this app, so the pages are warmed once it is listening
+    warm_up_task = asyncio.create_task(renderer.warm_up())
+
     try:
         yield  # This is where the application runs
     finally:
+        warm_up_task.cancel()
         # Stop Renderer
         await renderer.stop()
         logging.info("Renderer stopped.")
@@ -68,7 +89,7 @@ async def lifespan(_: FastAPI):
 app = FastAPI(title="HTML to PNG Renderer", lifespan=lifespan)
 
 # Mount the static directory
-app.mount("/static", StaticFiles(directory="data/renderer/static"), name="static")
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 app.mount("/logo", StaticFiles(directory="data/asset_logo"), name="asset_logo")
 
 
@@ -81,7 +102,7 @@ async def render_full_pipeline(template_name, parameters):
 
     # Render the HTML to PNG
     start_time = time.monotonic()
-    png_bytes = await renderer.render_html_to_png(result)
+    png_bytes = await renderer.render_html_to_png(result, template_name)
     end_time = time.monotonic()
     print(f"Rendered Demo PNG image {template_name!r} in {end_time - start_time:.2f} seconds.")
     return Response(png_bytes)
@@ -137,6 +158,45 @@ async def render_html_to_png(request: RenderRequest):
     return await render_full_pipeline(template_name, parameters)
 
 
+@app.post("/render_batch")
+async def render_batch(request: RenderBatchRequest):
+    """
+    Renders one template with several parameter sets (e.g. one alert in several languages) in one call.
+    Returns base64 encoded PNG images in the same order; a failed item has null image and an error text.
+    """
+    template_name = request.template_name
+    try:
+        renderer.jinja_env.get_template(template_name)
+    except TemplateNotFound:
+        return Response(status_code=404, content=f"Template '{template_name}' not found.")
+
+    logging.info(f"Rendering a batch of {len(request.parameters_list)} '{template_name}' pictures")
+
+    async def _render_one(parameters):
+        result = renderer.render_template_to_html(template_name, parameters)
+        return await renderer.render_html_to_png(result, template_name)
+
+    results = await asyncio.gather(*map(_render_one, request.parameters_list), return_exceptions=True)
+    return JSONResponse({
+        "images": [
+            None if isinstance(r, BaseException) else base64.b64encode(r).decode()
+            for r in results
+        ],
+        "errors": [
+            repr(r) if isinstance(r, BaseException) else None
+            for r in results
+        ],
+    })
+
+
+@app.get("/stats")
+async def render_stats():
+    """
+    Page pool state and per-template render time histograms.
+    """
+    return JSONResponse(renderer.stats())
+
+
 @app.get("/render/demo/{name}", response_class=Response, responses={200: {"content": {"image/png": {}}}})
 async def render_demo_template(name: str, req: Request):
     """
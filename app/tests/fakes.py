@@ -1,3 +1,5 @@
+import asyncio
+import time
 from collections import defaultdict
 from fnmatch import fnmatch
 
@@ -5,6 +7,54 @@ from models.pool_info import PoolInfo
 from models.price import PriceHolder
 
 
+class FakePipeline:
+    """Queues the calls and runs them against FakeRedis on execute(), like redis-py pipelines do."""
+
+    def __init__(self, redis: 'FakeRedis'):
+        self._redis = redis
+        self._commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self._commands.clear()
+        return False
+
+    def __getattr__(self, name):
+        method = getattr(self._redis, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self):
+        commands, self._commands = self._commands, []
+        self._redis.pipelines_executed += 1
+        return [await method(*args, **kwargs) for method, args, kwargs in commands]
+
+
+class FakePubSub:
+    def __init__(self, redis: 'FakeRedis'):
+        self._redis = redis
+        self._queue = asyncio.Queue()
+
+    async def subscribe(self, *channels):
+        for channel in channels:
+            self._redis.subscribers[channel].append(self._queue)
+
+    async def listen(self):
+        while True:
+            yield await self._queue.get()
+
+    async def close(self):
+        for queues in self._redis.subscribers.values():
+            if self._queue in queues:
+                queues.remove(self._queue)
+
+
 class FakeRedis:
     def __init__(self):
         self.hashes = defaultdict(dict)
@@ -12,6 +62,45 @@ class FakeRedis:
         self.values = self.strings
         self.expirations = {}
         self.hll = defaultdict(set)
+        self.zsets = defaultdict(dict)
+        self.streams = defaultdict(list)
+        self.bitmaps = defaultdict(set)  # name -> positions of the bits set to 1
+        self.sets = defaultdict(set)
+        self.subscribers = defaultdict(list)  # channel -> queues of FakePubSub
+        self.commands_executed = 0
+        self.pipelines_executed = 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    async def publish(self, channel, message):
+        queues = self.subscribers.get(channel, [])
+        for queue in queues:
+            queue.put_nowait({'type': 'message', 'channel': channel, 'data': message})
+        return len(queues)
+
+    async def sadd(self, name, *values):
+        members = self.sets[name]
+        added = sum(1 for value in values if value not in members)
+        members.update(values)
+        return added
+
+    async def srem(self, name, *values):
+        members = self.sets.get(name, set())
+        removed = sum(1 for value in values if value in members)
+        members.difference_update(values)
+        if not members:
+            self.sets.pop(name, None)
+        return removed
+
+    async def smembers(self, name):
+        return set(self.sets.get(name, ()))
+
+    async def sismember(self, name, value):
+        return value in self.sets.get(name, ())
 
     async def hincrbyfloat(self, name, key, value):
         bucket = self.hashes[name]
@@ -30,6 +119,9 @@ class FakeRedis:
             return 1
         raise TypeError('Unsupported hset call')
 
+    async def hlen(self, name):
+        return len(self.hashes.get(name, {}))
+
     async def hget(self, name, field):
         return self.hashes.get(name, {}).get(field)
 
@@ -40,6 +132,54 @@ class FakeRedis:
             for key, value in bucket.items()
         }
 
+    async def hkeys(self, name):
+        return list(self.hashes.get(name, {}))
+
+    async def hsetnx(self, name, key, value):
+        bucket = self.hashes[name]
+        if key in bucket:
+            return 0
+        bucket[key] = value
+        return 1
+
+    async def hincrby(self, name, key, amount=1):
+        bucket = self.hashes[name]
+        bucket[key] = int(bucket.get(key, 0)) + int(amount)
+        return bucket[key]
+
+    async def execute_command(self, *args):
+        command, name, *ops = args
+        if command != 'BITFIELD':
+            raise NotImplementedError(command)
+        self.commands_executed += 1
+        bits = self.bitmaps[name]
+        results = []
+        while ops:
+            op = ops[0]
+            if op == 'GET':
+                _, _, position = ops[:3]
+                results.append(int(position in bits))
+                ops = ops[3:]
+            elif op == 'SET':
+                _, _, position, value = ops[:4]
+                results.append(int(position in bits))
+                if value:
+                    bits.add(position)
+                else:
+                    bits.discard(position)
+                ops = ops[4:]
+            else:
+                raise NotImplementedError(op)
+        return results
+
+    async def bitcount(self, name):
+        return len(self.bitmaps.get(name, ()))
+
+    async def hmget(self, name, keys, *args):
+        bucket = self.hashes.get(name, {})
+        keys = list(keys) if isinstance(keys, (list, tuple)) else [keys]
+        return [bucket.get(key) for key in keys + list(args)]
+
     async def hdel(self, name, *fields):
         bucket = self.hashes.get(name, {})
         deleted = 0
@@ -49,21 +189,31 @@ class FakeRedis:
                 deleted += 1
         return deleted
 
-    async def set(self, name, value):
+    async def set(self, name, value, ex=None):
         self.strings[name] = value
+        if ex is not None:
+            self.expirations[name] = int(ex)
         return True
 
     async def get(self, name):
         return self.strings.get(name)
 
+    async def mget(self, keys, *args):
+        keys = list(keys) if isinstance(keys, (list, tuple)) else [keys]
+        return [self.strings.get(key) for key in keys + list(args)]
+
     async def expire(self, name, seconds):
         self.expirations[name] = int(seconds)
         return 1
 
     async def keys(self, pattern):
-        all_keys = set(self.hashes.keys()) | set(self.strings.keys()) | set(self.hll.keys())
+        all_keys = set(self.hashes.keys()) | set(self.strings.keys()) | set(self.hll.keys()) | set(self.zsets.keys()) | set(self.streams.keys()) | set(self.sets.keys())
         return [key for key in all_keys if fnmatch(key, pattern)]
 
+    async def exists(self, *names):
+        stores = (self.hashes, self.strings, self.hll, self.zsets, self.streams, self.bitmaps, self.sets)
+        return sum(1 for name in names if any(store.get(name) for store in stores))
+
     async def delete(self, *names):
         deleted = 0
         for name in names:
@@ -73,12 +223,115 @@ class FakeRedis:
                 deleted += 1
             if name in self.hll:
                 deleted += 1
+            if name in self.zsets:
+                deleted += 1
+            if name in self.streams:
+                deleted += 1
+            if name in self.sets:
+                deleted += 1
+            self.sets.pop(name, None)
+            self.zsets.pop(name, None)
+            self.streams.pop(name, None)
+            self.bitmaps.pop(name, None)
             self.hashes.pop(name, None)
             self.strings.pop(name, None)
             self.hll.pop(name, None)
             self.expirations.pop(name, None)
         return deleted
 
+    unlink = delete
+
+    async def zadd(self, name, mapping):
+        zset = self.zsets[name]
+        added = sum(1 for member in mapping if member not in zset)
+        zset.update({member: float(score) for member, score in mapping.items()})
+        return added
+
+    async def zrem(self, name, *members):
+        zset = self.zsets.get(name, {})
+        return sum(1 for member in members if zset.pop(member, None) is not None)
+
+    def _zsorted(self, name):
+        return sorted(self.zsets.get(name, {}).items(), key=lambda kv: (kv[1], kv[0]))
+
+    async def zrange(self, name, start, end):
+        members = [member for member, _ in self._zsorted(name)]
+        return members[start:(end + 1) or None]
+
+    async def zremrangebyscore(self, name, min, max):
+        return await self.zrem(name, *await self.zrangebyscore(name, min, max))
+
+    async def zremrangebyrank(self, name, start, end):
+        members = [member for member, _ in self._zsorted(name)]
+        n = len(members)
+        start, end = (start + n if start < 0 else start), (end + n if end < 0 else end)
+        return await self.zrem(name, *members[max(0, start):end + 1])
+
+    async def zrangebyscore(self, name, min, max):
+        def bound(value):
+            value = str(value)
+            if value in ('-inf', '+inf'):
+                return float(value), False
+            if value.startswith('('):
+                return float(value[1:]), True
+            return float(value), False
+
+        lo, lo_excl = bound(min)
+        hi, hi_excl = bound(max)
+        items = sorted(self.zsets.get(name, {}).items(), key=lambda kv: kv[1])
+        return [
+            member for member, score in items
+            if (score > lo if lo_excl else score >= lo) and (score < hi if hi_excl else score <= hi)
+        ]
+
+    @staticmethod
+    def _stream_id(message_id):
+        ms, _, seq = str(message_id).partition('-')
+        return int(ms), int(seq or 0)
+
+    def _stream_bound(self, value, default):
+        value = str(value)
+        if value in ('-', '+'):
+            return default, False
+        if value.startswith('('):
+            return self._stream_id(value[1:]), True
+        return self._stream_id(value), False
+
+    async def xadd(self, name, fields, id='*', maxlen=None):
+        stream = self.streams[name]
+        if isinstance(id, bytes):
+            id = id.decode()
+        if id == '*':
+            ms = int(time.time() * 1000)
+            last = self._stream_id(stream[-1][0]) if stream else (0, 0)
+            id = f'{ms}-{last[1] + 1 if last[0] == ms else 0}'
+        in_order = not stream or self._stream_id(id) > self._stream_id(stream[-1][0])
+        stream.append((id, {k: str(v) for k, v in fields.items()}))
+        if not in_order:
+            stream.sort(key=lambda item: self._stream_id(item[0]))
+        if maxlen:
+            del stream[:-maxlen]
+        return id
+
+    async def xrange(self, name, min='-', max='+', count=None):
+        lo, lo_excl = self._stream_bound(min, (0, 0))
+        hi, hi_excl = self._stream_bound(max, (2 ** 63, 0))
+        if str(max) != '+' and '-' not in str(max):
+            hi = (hi[0], 2 ** 63)  # a bare timestamp includes all the sequence numbers
+        result = [
+            (i, d) for i, d in self.streams.get(name, [])
+            if (self._stream_id(i) > lo if lo_excl else self._stream_id(i) >= lo)
+            and (self._stream_id(i) < hi if hi_excl else self._stream_id(i) <= hi)
+        ]
+        return result[:count] if count else result
+
+    async def xrevrange(self, name, max='+', min='-', count=None):
+        result = list(reversed(await self.xrange(name, min, max)))
+        return result[:count] if count else result
+
+    async def xlen(self, name):
+        return len(self.streams.get(name, []))
+
     async def pfadd(self, name, *values):
         self.hll[name].update(str(v) for v in values)
         return 1
@@ -2,8 +2,9 @@ from datetime import datetime
 from pathlib import Path
 
 from jobs.scanner.block_result import BlockResult, ScannerError
-from jobs.scanner.tx import NativeThorTx, ThorMessageType, ThorTxMessage
+from jobs.scanner.tx import NativeThorTx, ThorMessageType, ThorTxMessage, ThorEvent
 from lib.utils import load_json
+from models.events import EventSwap, EventOutbound
 
 BLOCK_NO = 0
 TARGET_TX_ID = '44546C04AB742EC86F3380C7647CEC6D0496CF6F20E00BDD8E17E50CB23A84A8'
@@ -101,3 +102,42 @@ def test_all_observed_txs_keeps_first_duplicate_observation():
     assert observed_txs[0].from_address == 'first-source'
     assert observed_txs[0].memo == '=:ETH.ETH:thor1first'
 
+
+
+def test_derived_data_is_built_once():
+    block = BlockResult.load_block(load_json(SAMPLE_BLOCK_PATH), BLOCK_NO)
+
+    assert block.all_observed_txs is block.all_observed_txs
+    assert block.typed_end_block_events is block.typed_end_block_events
+
+    observed_txs_by_id = {tx.tx_id: tx for tx in block.all_observed_txs}
+    memo_str = observed_txs_by_id[TARGET_TX_ID].memo
+    assert block.parse_memo(memo_str) is block.parse_memo(memo_str)
+
+
+def test_typed_events_are_grouped_by_type():
+    swap = ThorEvent.from_dict({'type': 'swap', 'id': 'TX1', 'coin': '100 BTC.BTC', 'memo': '=:ETH.ETH:0xabc'})
+    outbound = ThorEvent.from_dict({'type': 'outbound', 'in_tx_id': 'TX1', 'coin': '200 ETH.ETH', 'memo': 'OUT:TX1'})
+    other = ThorEvent.from_dict({'type': 'rewards', 'bond_reward': '1'})
+
+    block = BlockResult(
+        block_no=BLOCK_NO,
+        txs=[],
+        end_block_events=[swap, other, outbound],
+        begin_block_events=[],
+        error=ScannerError(0, ''),
+    )
+
+    assert [type(e) for e in block.typed_end_block_events] == [EventSwap, EventOutbound]
+    assert block.typed_events_of_type('swap') == [block.typed_end_block_events[0]]
+    assert block.typed_events_of_type('rewards') == []
+    assert len(block.typed_events_of_type('swap', 'outbound')) == 2
+
+
+def test_parse_memo_is_memoized_and_safe():
+    block = BlockResult(BLOCK_NO, [], [], [], ScannerError(0, ''))
+
+    memo = block.parse_memo('=:ETH.ETH:0xabc')
+    assert memo is not None
+    assert memo is block.parse_memo('=:ETH.ETH:0xabc')
+    assert block.parse_memo('') is None
@@ -0,0 +1,133 @@
+import asyncio
+import random
+from typing import cast
+
+import pytest
+
+from jobs.scanner.block_result import BlockResult, ScannerError
+from jobs.scanner.native_scan import BlockScanner
+from lib.db import DB
+from lib.delegates import INotified
+from lib.depcont import DepContainer
+from tests.fakes import FakeDB, FakeRedis
+
+
+class FakeLastBlockCache:
+    def __init__(self, height):
+        self.height = height
+
+    async def get_thor_block(self):
+        return self.height
+
+
+class FakeEmergency:
+    def __init__(self):
+        self.reports = []
+
+    def report(self, *args, **kwargs):
+        self.reports.append((args, kwargs))
+
+
+class FakeThorConnector:
+    def __init__(self, tip):
+        self.tip = tip
+
+    async def query_native_status_raw(self):
+        return {'result': {'sync_info': {'latest_block_height': str(self.tip)}}}
+
+
+class Collector(INotified):
+    def __init__(self):
+        self.heights = []
+
+    async def on_data(self, sender, data):
+        self.heights.append(data.block_no)
+
+
+class FakeScanner(BlockScanner):
+    def __init__(self, deps, tip, first_available=0, **kwargs):
+        super().__init__(deps, **kwargs)
+        self.tip = tip
+        self.first_available = first_available
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.fetched = []
+
+    async def fetch_one_block(self, block_index):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            # random latency, so the responses arrive out of order
+            await asyncio.sleep(random.uniform(0.0, 0.005))
+            self.fetched.append(block_index)
+            if block_index > self.tip:
+                return BlockResult(block_index, [], [], [], ScannerError(ScannerError.CODE_FUTURE, 'future'))
+            if block_index < self.first_available:
+                err = ScannerError(ScannerError.CODE_ANCIENT, f'too old, min {self.first_available}',
+                                   self.first_available)
+                return BlockResult(block_index, [], [], [], err)
+            return BlockResult(block_index, [], [], [], ScannerError(0, ''))
+        finally:
+            self.in_flight -= 1
+
+
+def make_scanner(tip, last_block, **kwargs):
+    deps = DepContainer()
+    deps.db = cast(DB, cast(object, FakeDB(FakeRedis())))
+    deps.last_block_cache = FakeLastBlockCache(tip)
+    deps.emergency = FakeEmergency()
+    deps.thor_connector = FakeThorConnector(tip)
+    scanner = FakeScanner(deps, tip, last_block=last_block, **kwargs)
+    collector = Collector()
+    scanner.add_subscriber(collector)
+    return scanner, collector
+
+
+@pytest.mark.asyncio
+async def test_catch_up_is_concurrent_and_ordered():
+    scanner, collector = make_scanner(tip=150, last_block=100, prefetch_window=8)
+
+    await scanner.fetch()
+
+    assert collector.heights == list(range(100, 151))
+    assert 1 < scanner.max_in_flight <= 8
+    # never asked for a block beyond the known node height except for the one that stops the loop
+    assert max(scanner.fetched) == 151
+    assert not scanner._prefetched
+
+
+@pytest.mark.asyncio
+async def test_no_prefetch_when_window_is_one():
+    scanner, collector = make_scanner(tip=120, last_block=100, prefetch_window=1)
+
+    await scanner.fetch()
+
+    assert collector.heights == list(range(100, 121))
+    assert scanner.max_in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_catch_up_respects_stop_block():
+    scanner, collector = make_scanner(tip=150, last_block=100, prefetch_window=8)
+    scanner.stop_block = 110
+
+    with pytest.raises(asyncio.CancelledError):
+        await scanner.fetch()
+
+    assert collector.heights == list(range(100, 110))
+    assert max(scanner.fetched) < 110
+
+
+@pytest.mark.asyncio
+async def test_jump_drops_prefetched_blocks():
+    scanner, collector = make_scanner(tip=130, last_block=100, first_available=120, prefetch_window=4)
+
+    await scanner.fetch()
+
+    # the first (failed) block is reported before the jump, then the scan continues in order
+    assert collector.heights[0] == 100
+    tail = collector.heights[1:]
+    assert tail == list(range(tail[0], 131))
+    assert tail[0] >= 120
+    assert scanner.deps.emergency.reports
+    assert not scanner._prefetched
@@ -0,0 +1,111 @@
+import time
+from typing import cast
+
+import pytest
+
+from lib.bloom_filt import BloomFilter, BloomFilterV3
+from lib.db import DB
+from notify.dup_stop import TxDeduplicator
+from tests.fakes import FakeRedis, FakeDB
+
+
+def make_dedup():
+    redis = FakeRedis()
+    dedup = TxDeduplicator(cast(DB, cast(object, FakeDB(redis))), 'test', capacity=10_000, error_rate=0.001)
+    return dedup, redis
+
+
+def test_v3_positions_are_stable_and_spread():
+    bf = BloomFilterV3(None, 'k', capacity=10_000, error_rate=0.001)
+    p1 = bf.positions('TX1')
+    assert p1 == bf.positions('TX1')
+    assert len(p1) == bf.hash_count
+    assert len(set(p1)) == bf.hash_count
+    assert all(0 <= p < bf.size for p in p1)
+    assert p1 != bf.positions('TX2')
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('cls', [BloomFilter, BloomFilterV3])
+async def test_batch_add_and_contains(cls):
+    redis = FakeRedis()
+    bf = cls(redis, 'bloom', capacity=10_000, error_rate=0.001)
+    seen = [f'SEEN{i}' for i in range(50)]
+    await bf.add_many(seen)
+    assert redis.pipelines_executed == 1
+
+    unseen = [f'NEW{i}' for i in range(50)]
+    flags = await bf.contains_many(seen + unseen)
+    assert redis.pipelines_executed == 2
+    assert flags[:50] == [True] * 50
+    assert sum(flags[50:]) <= 1  # false positives are possible, but rare
+
+    assert await bf.contains('SEEN7')
+    assert not await bf.contains('NEW-NEW')
+
+
+@pytest.mark.asyncio
+async def test_dedup_page_is_one_round_trip():
+    dedup, redis = make_dedup()
+    page = [f'HASH{i}' for i in range(50)]
+
+    await dedup.mark_as_seen_hashes(page[:20])
+    await dedup.have_ever_seen_hash(page[0])  # the first query also checks for a v2 bitmap
+    redis.pipelines_executed = 0
+    redis.commands_executed = 0
+
+    new_hashes = await dedup.only_new_hashes(page)
+
+    assert new_hashes == page[20:]
+    assert redis.pipelines_executed == 1
+    assert redis.commands_executed == 1
+
+
+@pytest.mark.asyncio
+async def test_dedup_stats_are_flushed_periodically():
+    dedup, redis = make_dedup()
+    await dedup.mark_as_seen('A')
+    assert await dedup.have_ever_seen_hash('A')
+    assert not await dedup.have_ever_seen_hash('B')
+    assert await dedup.have_ever_seen_hash('') is True
+
+    # not written yet, but visible
+    assert not redis.hashes.get(dedup._stats_key)
+    assert await dedup.load_stats() == {'total_requests': 2, 'positive_requests': 1, 'write_requests': 1}
+
+    dedup.STATS_FLUSH_INTERVAL = 0.0
+    await dedup.have_ever_seen_hash('A')
+    assert redis.hashes[dedup._stats_key] == {'total_requests': 2, 'positive_requests': 1, 'write_requests': 1}
+    assert await dedup.load_stats() == {'total_requests': 3, 'positive_requests': 2, 'write_requests': 1}
+
+    await dedup.flush_stats()
+    assert redis.hashes[dedup._stats_key]['total_requests'] == 3
+
+
+@pytest.mark.asyncio
+async def test_pending_stats_are_flushed_on_shutdown():
+    dedup, redis = make_dedup()
+    await dedup.mark_as_seen_hashes(['A', 'B'])
+    assert not redis.hashes.get(dedup._stats_key)
+
+    await TxDeduplicator.flush_all_stats()
+    assert redis.hashes[dedup._stats_key]['write_requests'] == 2
+
+
+@pytest.mark.asyncio
+async def test_hashes_marked_under_v2_are_still_seen_after_upgrade():
+    dedup, redis = make_dedup()
+    v2 = BloomFilter(redis, 'tx:dedup_v2:test', capacity=10_000, error_rate=0.001)
+    await v2.add_many(['OLD'])
+    redis.hashes['tx:dedup_v2:test:stats']['total_requests'] = 5
+
+    assert await dedup.batch_ever_seen_hashes(['OLD', 'NEW']) == [True, False]
+    assert redis.bitmaps['tx:dedup_v2:test']
+    assert await dedup._bf.contains('OLD')  # copied to v3
+
+    # the read period is over: v2 is dropped, but the hash stays seen
+    redis.hashes[dedup._stats_key]['v3_since'] = int(time.time() - dedup.LEGACY_READ_PERIOD - 1)
+    dedup._legacy_until = None
+    assert await dedup.batch_ever_seen_hashes(['OLD', 'NEW']) == [True, False]
+    assert not redis.bitmaps.get('tx:dedup_v2:test')
+    assert 'tx:dedup_v2:test:stats' not in redis.hashes
@@ -0,0 +1,143 @@
+import asyncio
+import time
+
+import pytest
+
+from lib.config import SubConfig
+from lib.rate_limit import TokenBucket
+from notify.broadcast_queue import BroadcastQueue, Priority
+from notify.channel import ChannelDescriptor, BoardMessage
+
+
+class Sink:
+    def __init__(self, delay=0.0, allowed=True):
+        self.sent = []
+        self.delay = delay
+        self.allowed = allowed
+
+    async def form(self, source, channel, msg_type, **kwargs):
+        if callable(source):
+            return BoardMessage(await source(channel.channel_id), msg_type=msg_type)
+        return BoardMessage(source, msg_type=msg_type)
+
+    async def send(self, channel, message, **kwargs):
+        await asyncio.sleep(self.delay)
+        self.sent.append((channel.name, message.text))
+        return True
+
+    async def is_allowed(self, msg_type, channel):
+        return self.allowed
+
+
+def make_queue(sink, **cfg):
+    return BroadcastQueue(sink.form, sink.send, sink.is_allowed, SubConfig(cfg))
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_rate():
+    bucket = TokenBucket(rate=50, capacity=5)
+    t0 = time.monotonic()
+    for _ in range(15):
+        await bucket.acquire()
+    # 5 immediately, then 10 more at 50 per second
+    assert 0.15 <= time.monotonic() - t0 < 0.5
+
+
+@pytest.mark.asyncio
+async def test_priority_order():
+    sink = Sink()
+    queue = make_queue(sink, workers=1)
+    channel = ChannelDescriptor('discord', 'c1')
+
+    # occupy the only worker, so the rest is queued
+    blocker = asyncio.Event()
+
+    async def slow_source(_):
+        await blocker.wait()
+        return 'first'
+
+    futures = [queue.put(channel, slow_source, 'public:whatever')]
+    await asyncio.sleep(0)
+    futures.append(queue.put(channel, 'report', 'public:key_stats'))
+    futures.append(queue.put(channel, 'normal', 'public:large_tx'))
+    futures.append(queue.put(channel, 'halt', 'public:chain_halt'))
+    blocker.set()
+
+    assert await asyncio.gather(*futures) == [True] * 4
+    assert [text for _, text in sink.sent] == ['first', 'halt', 'normal', 'report']
+    await queue.stop()
+
+
+def test_priority_of():
+    queue = make_queue(Sink(), priorities={'public:pol': 1})
+    assert queue.priority_of('public:chain_halt') == Priority.HIGH
+    assert queue.priority_of('public:node_churn:finish') == Priority.HIGH
+    assert queue.priority_of('public:pol') == 1
+    assert queue.priority_of('public:swap_finished') == Priority.NORMAL
+    assert queue.priority_of('') == Priority.NORMAL
+
+
+@pytest.mark.asyncio
+async def test_concurrent_sends_and_latency():
+    sink = Sink(delay=0.05)
+    queue = make_queue(sink, workers=10)
+    channels = [ChannelDescriptor('discord', f'c{i}') for i in range(10)]
+
+    t0 = time.monotonic()
+    results = await asyncio.gather(*[queue.put(c, 'hi', 'public:large_tx') for c in channels])
+    assert all(results)
+    assert time.monotonic() - t0 < 0.3
+
+    stats = queue.latency['public:large_tx']
+    assert stats.count == 10
+    assert 0.04 <= stats.max < 0.3
+    assert 'avg' in queue.latency_summary('public:large_tx')
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_per_chat_limit():
+    sink = Sink()
+    queue = make_queue(sink, workers=4, limits={'telegram': {'global': 100, 'per_chat': 20}})
+    channel = ChannelDescriptor('telegram', 'chat')
+
+    t0 = time.monotonic()
+    await asyncio.gather(*[queue.put(channel, str(i), 'public:large_tx') for i in range(5)])
+    # the first message goes at once, the other 4 wait for the per-chat bucket (20/s)
+    assert time.monotonic() - t0 >= 0.15
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_not_allowed_or_empty_is_not_sent():
+    sink = Sink(allowed=False)
+    queue = make_queue(sink)
+    assert await queue.put(ChannelDescriptor('discord', 'c'), 'hi', 'public:large_tx') is False
+
+    sink.allowed = True
+    assert await queue.put(ChannelDescriptor('discord', 'c'), '', 'public:large_tx') is False
+    assert not sink.sent
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_one_channel_keeps_the_order():
+    sink = Sink()
+    queue = make_queue(sink, workers=8)
+    channel, other = ChannelDescriptor('discord', 'c1'), ChannelDescriptor('discord', 'c2')
+
+    async def slow_source(_):
+        await asyncio.sleep(0.05)
+        return 'churn started'
+
+    futures = [queue.put(channel, slow_source, 'public:node_churn')]
+    await asyncio.sleep(0)
+    futures.append(queue.put(channel, 'churn finished', 'public:node_churn'))
+    futures.append(queue.put(other, 'other channel', 'public:large_tx'))
+
+    assert await asyncio.gather(*futures) == [True] * 3
+    assert [text for name, text in sink.sent if name == channel.name] == ['churn started', 'churn finished']
+    # the other channel is not held by the slow one
+    assert sink.sent[0] == (other.name, 'other channel')
+    assert queue.size == 0
+    await queue.stop()
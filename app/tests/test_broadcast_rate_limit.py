@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+import pytest
+
+from lib.rate_limit import RateLimitCooldown
+from notify.channel import ChannelDescriptor, BoardMessage
+from tests.test_broadcast_channel_filter import make_broadcaster
+
+
+@pytest.fixture
+def no_redis_limiter(monkeypatch):
+    async def hit(self):
+        return self.GOOD
+
+    monkeypatch.setattr(RateLimitCooldown, 'hit', hit)
+
+
+def install_slow_sender(broadcaster, log, delay=0.05):
+    broadcaster.deps.db = None  # the limiter is patched
+
+    async def fake_send(channel_info, message, **kwargs):
+        log.append(('start', channel_info.name, message.text))
+        await asyncio.sleep(delay)
+        log.append(('end', channel_info.name, message.text))
+        return True
+
+    broadcaster._safe_send_message = fake_send
+
+
+@pytest.mark.asyncio
+async def test_personal_sends_to_different_users_are_concurrent(no_redis_limiter):
+    broadcaster = make_broadcaster()
+    log = []
+    install_slow_sender(broadcaster, log)
+
+    t0 = time.monotonic()
+    results = await asyncio.gather(*[
+        broadcaster.safe_send_message_rate(ChannelDescriptor('telegram', f'user{i}'), BoardMessage('hi'))
+        for i in range(8)
+    ])
+
+    assert time.monotonic() - t0 < 0.3
+    assert all(outcome == RateLimitCooldown.GOOD and sent for outcome, sent in results)
+    assert not broadcaster._channel_locks
+
+
+@pytest.mark.asyncio
+async def test_personal_sends_to_one_user_keep_order(no_redis_limiter):
+    broadcaster = make_broadcaster()
+    log = []
+    install_slow_sender(broadcaster, log, delay=0.01)
+    channel = ChannelDescriptor('telegram', 'user')
+
+    await asyncio.gather(*[
+        broadcaster.safe_send_message_rate(channel, BoardMessage(str(i)))
+        for i in range(5)
+    ])
+
+    assert log == [(event, 'user', str(i)) for i in range(5) for event in ('start', 'end')]
+    assert not broadcaster._channel_locks
@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import pytest
+
+from lib.delegates import WithDelegates, INotified
+
+
+class SlowDelegate(INotified):
+    def __init__(self, name, delay, log):
+        self.name = name
+        self.delay = delay
+        self.log = log
+
+    async def on_data(self, sender, data):
+        self.log.append(('start', self.name))
+        await asyncio.sleep(self.delay)
+        self.log.append(('end', self.name))
+
+    def __str__(self):
+        return self.name
+
+
+class FailingDelegate(SlowDelegate):
+    async def on_data(self, sender, data):
+        await super().on_data(sender, data)
+        raise ValueError('boom')
+
+
+@pytest.mark.asyncio
+async def test_sequential_dispatch_is_default():
+    log = []
+    emitter = WithDelegates()
+    emitter.add_subscriber(SlowDelegate('a', 0.01, log))
+    emitter.add_subscriber(SlowDelegate('b', 0.01, log))
+
+    summary = await emitter.pass_data_to_listeners('data')
+
+    assert log == [('start', 'a'), ('end', 'a'), ('start', 'b'), ('end', 'b')]
+    assert set(summary.keys()) == {'a', 'b'}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_dispatch_takes_the_slowest():
+    log = []
+    emitter = WithDelegates().set_concurrent_dispatch()
+    for i in range(5):
+        emitter.add_subscriber(SlowDelegate(f'd{i}', 0.05, log))
+    emitter.add_subscriber(FailingDelegate('bad', 0.0, log))
+
+    t0 = time.monotonic()
+    summary = await emitter.pass_data_to_listeners('data')
+    elapsed = time.monotonic() - t0
+
+    assert elapsed < 0.2
+    assert len(summary) == 6
+    assert all(v >= 0.04 for k, v in summary.items() if k != 'bad')
+
+
+@pytest.mark.asyncio
+async def test_concurrent_dispatch_respects_order():
+    log = []
+    emitter = WithDelegates().set_concurrent_dispatch()
+    first = SlowDelegate('first', 0.03, log)
+    emitter.add_subscriber(first)
+    emitter.add_subscriber(SlowDelegate('free', 0.01, log))
+    emitter.add_subscriber(SlowDelegate('second', 0.0, log), after=first)
+
+    await emitter.pass_data_to_listeners('data')
+
+    assert log.index(('end', 'first')) < log.index(('start', 'second'))
+    assert log.index(('start', 'free')) < log.index(('end', 'first'))
+
+
+@pytest.mark.asyncio
+async def test_concurrent_dispatch_timeout():
+    log = []
+    emitter = WithDelegates().set_concurrent_dispatch(timeout=0.02)
+    emitter.add_subscriber(SlowDelegate('stuck', 10.0, log))
+    emitter.add_subscriber(SlowDelegate('ok', 0.0, log))
+
+    t0 = time.monotonic()
+    summary = await emitter.pass_data_to_listeners('data')
+
+    assert time.monotonic() - t0 < 1.0
+    assert ('end', 'ok') in log
+    assert ('end', 'stuck') not in log
+    assert set(summary.keys()) == {'stuck', 'ok'}
+
+
+def test_prerequisite_must_be_subscribed_first():
+    emitter = WithDelegates()
+    with pytest.raises(ValueError):
+        emitter.add_subscriber(SlowDelegate('a', 0, []), after=SlowDelegate('b', 0, []))
@@ -6,7 +6,7 @@ import pytest
 from jobs.scanner.event_db import EventDatabase, EventDbTxDeduplicator
 from lib.db import DB
 from models.tx import ThorAction
-from tests.fakes import FakeDB
+from tests.fakes import FakeDB, FakeRedis
 
 
 @pytest.mark.asyncio
@@ -176,3 +176,43 @@ async def test_event_db_tx_deduplicator_can_ignore_all_checks_for_tx_objects():
     assert await dedup.have_ever_seen(tx_empty) is True
 
 
+
+
+@pytest.mark.asyncio
+async def test_event_db_batch_write_and_read_is_one_round_trip_each():
+    redis = FakeRedis()
+    db = cast(DB, cast(object, FakeDB(redis)))
+    ev_db = EventDatabase(db, expiration_sec=100)
+
+    await ev_db.write_many_tx_status([
+        ('tx-1', {'status': 'observed_in', 'in_asset': 'BTC.BTC'}),
+        ('tx-2', {'status': 'observed_in'}),
+        ('tx-1', {'ev_swap_abc': {'type': 'swap'}, 'status': 'given_away'}),
+        ('tx-3', {}),
+    ])
+    assert redis.pipelines_executed == 1
+    assert redis.expirations == {ev_db.key_to_tx('tx-1'): 100, ev_db.key_to_tx('tx-2'): 100}
+
+    statuses = await ev_db.read_many_tx_status(['tx-1', 'tx-2', 'tx-none', '', 'tx-1'])
+    assert redis.pipelines_executed == 2
+
+    assert statuses['tx-1'].status == 'given_away'
+    assert statuses['tx-1'].attrs['in_asset'] == 'BTC.BTC'
+    assert statuses['tx-2'].status == 'observed_in'
+    assert not statuses['tx-none']
+    assert set(statuses.keys()) == {'tx-1', 'tx-2', 'tx-none'}
+
+
+@pytest.mark.asyncio
+async def test_event_db_tx_deduplicator_batch_check_is_one_round_trip():
+    redis = FakeRedis()
+    db = cast(DB, cast(object, FakeDB(redis)))
+    dedup = EventDbTxDeduplicator(db, 'volume_recorded')
+
+    await dedup.mark_as_seen_txs(cast(list[ThorAction], cast(object, [
+        SimpleNamespace(tx_hash='tx-a'), SimpleNamespace(tx_hash='tx-c'),
+    ])))
+    redis.pipelines_executed = 0
+
+    assert await dedup.batch_ever_seen_hashes(['tx-a', 'tx-b', '', 'tx-c']) == [True, False, False, True]
+    assert redis.pipelines_executed == 1
@@ -0,0 +1,143 @@
+from typing import cast
+
+import pytest
+from redis import WatchError
+
+from lib.db import DB
+from lib.flagship import Flagship, FlagDescriptor
+from tests.fakes import FakeDB, FakeRedis
+
+
+class FakePipeline:
+    def __init__(self, redis: 'CountingRedis'):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def watch(self, *keys):
+        self.redis.round_trips += 1
+
+    async def mget(self, keys):
+        self.redis.round_trips += 1
+        return [self.redis.strings.get(k) for k in keys]
+
+    def multi(self):
+        pass
+
+    def set(self, key, value):
+        self.commands.append((key, value))
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        if self.redis.conflict:
+            raise WatchError()
+        for key, value in self.commands:
+            self.redis.strings[key] = value
+
+
+class CountingRedis(FakeRedis):
+    def __init__(self):
+        super().__init__()
+        self.round_trips = 0
+        self.published = []
+        self.conflict = False
+
+    async def get(self, name):
+        self.round_trips += 1
+        return await super().get(name)
+
+    async def set(self, name, value):
+        self.round_trips += 1
+        return await super().set(name, value)
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+def make_flagship():
+    redis = CountingRedis()
+    return Flagship(cast(DB, cast(object, FakeDB(redis)))), redis
+
+
+def load_flag(redis, flagship, name) -> FlagDescriptor:
+    return FlagDescriptor.model_validate_json(redis.strings[flagship.key(name)])
+
+
+@pytest.mark.asyncio
+async def test_flag_is_cached_locally():
+    flagship, redis = make_flagship()
+    await flagship.set_flag('pass:A:B', False)
+    redis.round_trips = 0
+
+    for _ in range(100):
+        assert await flagship.is_flag_set('pass:A:B') is False
+
+    assert redis.round_trips == 0
+
+
+@pytest.mark.asyncio
+async def test_remote_change_invalidates_cache():
+    flagship, redis = make_flagship()
+    dashboard = Flagship(flagship.db)
+
+    assert await flagship.is_flag_set('x') is True
+
+    await dashboard.set_flag('x', False)
+    assert redis.published
+    assert await flagship.is_flag_set('x') is True  # the message has not arrived yet
+
+    channel, message = redis.published[-1]
+    assert channel == Flagship.CHANNEL_CHANGED
+    await flagship._on_flag_changed(channel, {'flag': 'x'})
+    assert await flagship.is_flag_set('x') is False
+
+
+@pytest.mark.asyncio
+async def test_cache_ttl():
+    flagship, redis = make_flagship()
+    flagship.cache_ttl = 0.0
+    await flagship.set_flag('x', True)
+    redis.round_trips = 0
+
+    await flagship.is_flag_set('x')
+    await flagship.is_flag_set('x')
+    assert redis.round_trips == 2
+
+
+@pytest.mark.asyncio
+async def test_access_times_are_flushed_in_batch():
+    flagship, redis = make_flagship()
+    for name in ('a', 'b', 'c'):
+        await flagship.set_flag(name, True)
+    before = load_flag(redis, flagship, 'a').last_access_ts
+
+    for name in ('a', 'b', 'c'):
+        await flagship.is_flag_set(name)
+    redis.round_trips = 0
+
+    assert await flagship.flush_access_times() == 3
+    assert redis.round_trips == 3  # watch, mget, exec
+    assert load_flag(redis, flagship, 'a').last_access_ts >= before
+    assert await flagship.flush_access_times() == 0
+
+
+@pytest.mark.asyncio
+async def test_flush_conflict_keeps_pending():
+    flagship, redis = make_flagship()
+    await flagship.set_flag('a', True)
+    await flagship.is_flag_set('a')
+
+    redis.conflict = True
+    assert await flagship.flush_access_times() == 0
+    assert 'a' in flagship._pending_access
+
+    redis.conflict = False
+    assert await flagship.flush_access_times() == 1
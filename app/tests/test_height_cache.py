@@ -0,0 +1,81 @@
+import asyncio
+from typing import cast
+
+import pytest
+from aiohttp import ClientSession
+
+from api.aionode.connector import ThorConnector
+from api.aionode.env import ThorEnvironment
+from api.aionode.height_cache import HeightResponseCache
+
+MIMIR = {'HALTTRADING': 0, 'MAXSYNTHPERPOOLDEPTH': 3500}
+
+
+def make_connector(cache):
+    connector = ThorConnector(ThorEnvironment(thornode_url='https://node'), cast(ClientSession, cast(object, None)),
+                              pinned_ttl=0, height_cache=cache)
+    calls = []
+
+    async def request(path, is_rpc=False, height=None):
+        calls.append((path, height))
+        await asyncio.sleep(0)
+        if is_rpc:
+            if height < 100:
+                return {'jsonrpc': '2.0', 'id': -1,
+                        'error': {'code': -32603, 'data': f'height {height} is not available, lowest height is 100'}}
+            return {'jsonrpc': '2.0', 'id': -1, 'result': {'block': {'header': {'height': str(height)}}}}
+        if height and height > 1000:
+            return {'code': 3, 'message': 'height is in the future'}
+        return dict(MIMIR, height=height)
+
+    connector._clients[0].request = request
+    return connector, calls
+
+
+@pytest.mark.asyncio
+async def test_height_pinned_responses_survive_restart(tmp_path):
+    path = str(tmp_path / 'cache' / 'heights.sqlite3')
+    cache = HeightResponseCache(path, memory_items=2)
+    connector, calls = make_connector(cache)
+
+    for _ in range(3):
+        mimir = await connector.query_mimir(height=500)
+        assert mimir.constants['MAXSYNTHPERPOOLDEPTH'] == 3500
+    await connector.query_mimir()
+    await connector.query_mimir()
+    assert calls == [('/thorchain/mimir', 500), ('/thorchain/mimir', None), ('/thorchain/mimir', None)]
+    assert cache.misses == 1 and cache.hits_memory == 2
+
+    # errors (e.g. a future height) are not stored
+    await connector.query_mimir(height=2000)
+    await connector.query_mimir(height=2000)
+    assert calls[-2:] == [('/thorchain/mimir', 2000)] * 2
+
+    # so are Tendermint RPC errors, e.g. a height pruned on this node
+    calls.clear()
+    for _ in range(2):
+        await connector.query_tendermint_block_raw(50)
+        await connector.query_tendermint_block_raw(500)
+    assert calls == [('/block', 50), ('/block', 500), ('/block', 50)]
+    cache.close()
+
+    # another process or a restart reads it from disk
+    cache = HeightResponseCache(path)
+    connector, calls = make_connector(cache)
+    assert (await connector.query_mimir(height=500)).constants['HALTTRADING'] == 0
+    assert calls == []
+    assert cache.hits_disk == 1
+    cache.close()
+
+
+def test_height_cache_is_size_bounded():
+    cache = HeightResponseCache(':memory:', max_bytes=20_000, memory_items=10)
+    for height in range(300):
+        # random-ish payload, so it does not compress to nothing
+        cache.put(cache.make_key('/thorchain/pools', height), [{'h': height, 'v': str(i * height ** 3)} for i in range(20)])
+
+    assert cache.total_bytes <= 20_000
+    assert 0 < len(cache) < 300
+    assert cache.get(cache.make_key('/thorchain/pools', 0)) is None  # the oldest is gone
+    assert cache.get(cache.make_key('/thorchain/pools', 299))[0] == {'h': 299, 'v': '0'}
+    assert cache.hit_rate == 0.5
@@ -0,0 +1,91 @@
+import re
+from typing import cast
+
+import pytest
+
+from jobs.runeyield.lp_history import LPActionLog
+from lib.config import SubConfig
+from lib.db import DB
+from lib.depcont import DepContainer
+from models.pool_member import PoolMemberDetails
+from tests.fakes import FakeRedis, FakeDB
+
+ADDRESS = 'thor1whale'
+
+
+def raw_action(i, status='success', tx_type='addLiquidity'):
+    return {
+        'date': str((1_700_000_000 + i) * 10 ** 9),
+        'height': str(10_000 + i),
+        'status': status,
+        'type': tx_type,
+        'pools': ['BTC.BTC'],
+        'in': [{'address': ADDRESS, 'coins': [{'amount': '100', 'asset': 'THOR.RUNE'}], 'txID': f'{i:064X}'}],
+        'out': [],
+        'metadata': {'addLiquidity': {'liquidityUnits': '10'}},
+    }
+
+
+class FakeMidgard:
+    def __init__(self, n):
+        self.actions = [raw_action(i) for i in range(n)]
+        self.requests = []
+        self.units = 1000
+
+    async def query_pool_membership(self, _address):
+        return [PoolMemberDetails(pool='BTC.BTC', liquidity_units=self.units, date_last_added=len(self.actions))]
+
+    async def request(self, url):
+        self.requests.append(url)
+        offset, limit = (int(x) for x in re.search(r'offset=(\d+)&limit=(\d+)', url).groups())
+        assert 'type=withdraw,addLiquidity' in url
+        newest_first = sorted(self.actions, key=lambda a: int(a['height']), reverse=True)
+        return {'actions': newest_first[offset:offset + limit], 'count': str(len(self.actions))}
+
+
+def make_log(midgard, redis=None):
+    d = DepContainer()
+    d.cfg = SubConfig({'network_id': 'mainnet'})
+    d.db = cast(DB, cast(object, FakeDB(redis or FakeRedis())))
+    d.midgard_connector = midgard
+    return LPActionLog(d, page_size=50)
+
+
+@pytest.mark.asyncio
+async def test_history_is_cached_and_appended():
+    midgard = FakeMidgard(230)
+    log = make_log(midgard)
+
+    actions = await log.get_actions(ADDRESS)
+    assert len(actions) == 230
+    assert len(midgard.requests) == 5
+
+    # nothing has changed: no action requests at all, even for a new connector instance
+    midgard.requests.clear()
+    again = await make_log(midgard, log.deps.db.redis).get_actions(ADDRESS)
+    assert midgard.requests == []
+    assert sorted(a.tx_hash for a in again) == sorted(a.tx_hash for a in actions)
+
+    # a new addition: only the first page is read
+    midgard.actions.append(raw_action(500))
+    actions = await log.get_actions(ADDRESS)
+    assert len(actions) == 231
+    assert len(midgard.requests) == 1
+    assert log.hits == 0 and log.misses == 2
+
+
+@pytest.mark.asyncio
+async def test_pending_actions_are_refetched():
+    midgard = FakeMidgard(120)
+    midgard.actions[100] = raw_action(100, status='pending')
+    log = make_log(midgard)
+    assert sum(a.is_pending for a in await log.get_actions(ADDRESS)) == 1
+
+    # it has settled and the units have changed: everything from the pending one up is read again
+    midgard.actions[100] = raw_action(100)
+    midgard.units += 10
+    midgard.requests.clear()
+    actions = await log.get_actions(ADDRESS)
+    assert len(actions) == 120
+    assert not any(a.is_pending for a in actions)
+    assert len(midgard.requests) == 1
@@ -0,0 +1,94 @@
+import asyncio
+from typing import cast
+
+import pytest
+
+from lib.db import DB
+from lib.db_many2many import ManyToManySet
+from models.node_watchers import UserWatchlist
+from tests.fakes import FakeRedis, FakeDB
+
+
+def make_set(redis, local_index=False):
+    db = cast(DB, cast(object, FakeDB(redis)))
+    return ManyToManySet(db, 'UserID', 'Wallet', local_index=local_index)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_bulk_reads_and_writes_are_pipelined():
+    redis = FakeRedis()
+    mm = make_set(redis)
+
+    await mm.associate_many(['u1', 'u2'], ['a1', 'a2', 'a3'])
+    await mm.associate('u3', 'a3')
+    assert redis.pipelines_executed == 2
+
+    addresses = [f'x{i}' for i in range(500)] + ['a1', 'a3']
+    assert await mm.all_lefts_for_many_rights(addresses) == {'u1', 'u2', 'u3'}
+    assert redis.pipelines_executed == 3
+
+    groups = await mm.all_lefts_for_many_rights(['a3', 'x1'], flatten=False)
+    assert groups == {'a3': {'u1', 'u2', 'u3'}, 'x1': set()}
+    assert await mm.all_rights_for_many_lefts(['u3'], flatten=False) == {'u3': {'a3'}}
+
+    await mm.remove_all_rights('u1')
+    assert await mm.all_lefts_for_right_one('a1') == {'u2'}
+    await mm.remove_all_lefts('a3')
+    assert await mm.all_rights_for_left_one('u3') == set()
+    assert await mm.all_rights_for_left_one('u2') == {'a1', 'a2'}
+
+
+@pytest.mark.asyncio
+async def test_local_index_follows_other_processes():
+    redis = FakeRedis()
+    bot = make_set(redis, local_index=True)
+    dashboard = make_set(redis)
+    other_bot = make_set(redis, local_index=True)
+
+    await dashboard.associate_many(['u1'], ['a1', 'a2'])
+    assert await bot.all_lefts_for_many_rights(['a1', 'a9']) == {'u1'}
+    await settle()  # subscribed
+
+    # watchlist lookups don't touch Redis anymore
+    pipelines = redis.pipelines_executed
+    for _ in range(10):
+        await bot.all_lefts_for_many_rights([f'x{i}' for i in range(500)] + ['a2'])
+    assert redis.pipelines_executed == pipelines
+
+    # changes from other processes are published
+    await dashboard.associate('u2', 'a2')
+    await settle()
+    assert await bot.all_lefts_for_right_one('a2') == {'u1', 'u2'}
+
+    await other_bot.remove_one_item('u1', 'a2')
+    await settle()
+    assert await bot.all_lefts_for_right_one('a2') == {'u2'}
+    assert await other_bot.all_lefts_for_right_one('a2') == {'u2'}
+
+    await dashboard.clear()
+    await settle()
+    assert await bot.all_lefts_for_many_rights(['a1', 'a2']) == set()
+
+    await bot.stop_index()
+    await other_bot.stop_index()
+
+
+@pytest.mark.asyncio
+async def test_watchlist_with_local_index():
+    db = cast(DB, cast(object, FakeDB(FakeRedis())))
+    watchlist = UserWatchlist(db, 'Wallet', local_index=True)
+    await watchlist.add_user_to_node_list('u1', ['a1', 'a2'])
+    await watchlist.add_user_to_node('u2', 'a2')
+
+    address_to_user = await watchlist.all_users_for_many_nodes(['a1', 'a2', 'a3'])
+    assert address_to_user == {'a1': {'u1'}, 'a2': {'u1', 'u2'}, 'a3': set()}
+    assert watchlist.all_affected_users(address_to_user) == {'u1', 'u2'}
+
+    await watchlist.remove_user_node('u1', 'a2')
+    assert await watchlist.all_users_for_node('a2') == {'u2'}
+    await watchlist.many2many.stop_index()
@@ -0,0 +1,80 @@
+import dataclasses
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from models.memo import THORMemo, ActionType
+
+SAMPLE_DATA_PATH = Path(__file__).with_name('sample_data')
+
+# Very conservative: a plain CPython on a slow CI runner does well above 100k/s
+MIN_UNCACHED_MEMOS_PER_SEC = 20_000
+MIN_CACHE_SPEEDUP = 3.0
+
+# wall-clock numbers depend on the machine and its load (coverage, parallel jobs), so they run on demand:
+# RUN_BENCHMARKS=1 pytest tests/test_memo_parser_bench.py
+benchmark = pytest.mark.skipif(not os.environ.get('RUN_BENCHMARKS'), reason='set RUN_BENCHMARKS=1 to run')
+
+
+def _collect_memos(o, out: set):
+    if isinstance(o, dict):
+        for k, v in o.items():
+            if k == 'memo' and isinstance(v, str):
+                out.add(v)
+            else:
+                _collect_memos(v, out)
+    elif isinstance(o, list):
+        for v in o:
+            _collect_memos(v, out)
+
+
+@pytest.fixture(scope='module')
+def memo_corpus():
+    memos = set()
+    for path in sorted(SAMPLE_DATA_PATH.glob('*.json')):
+        with open(path) as f:
+            _collect_memos(json.load(f), memos)
+    memos.discard('')
+    assert len(memos) > 100
+    return sorted(memos)
+
+
+def _throughput(parse, memos, rounds):
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for memo in memos:
+            parse(memo)
+    return len(memos) * rounds / (time.perf_counter() - t0)
+
+
+def test_cached_results_match_parser(memo_corpus):
+    for memo in memo_corpus:
+        assert THORMemo.parse_memo(memo, no_raise=True) == THORMemo._parse_memo_uncached(memo), memo
+
+
+@benchmark
+def test_memo_parser_throughput(memo_corpus):
+    uncached = _throughput(THORMemo._parse_memo_uncached, memo_corpus, rounds=20)
+    assert uncached >= MIN_UNCACHED_MEMOS_PER_SEC
+
+    THORMemo.parse_memo(memo_corpus[0], no_raise=True)  # warm up
+    cached = _throughput(lambda m: THORMemo.parse_memo(m, no_raise=True), memo_corpus, rounds=20)
+    assert cached >= uncached * MIN_CACHE_SPEEDUP
+
+
+def test_cached_memos_are_shared_and_immutable():
+    memo = '=:ETH.ETH:0xA58818F1cA5A7DD524Eca1F89E2325e15BAD6cc4:0/3/0:t:15'
+    m = THORMemo.parse_memo(memo)
+    assert THORMemo.parse_memo(memo) is m
+    assert m.affiliate_address == 't'
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        m.affiliate_address = 'somebody else'
+    assert isinstance(m.affiliates, tuple)
+
+
+def test_pool_memo_without_fee():
+    m = THORMemo.parse_memo('POOL-:5000')
+    assert m.action == ActionType.RUNEPOOL_WITHDRAW
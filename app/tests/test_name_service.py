@@ -0,0 +1,119 @@
+import asyncio
+from typing import cast
+
+import pytest
+
+from api.midgard.connector import MidgardConnector
+from api.midgard.name_service import NameService
+from lib.config import Config, SubConfig
+from lib.db import DB
+from tests.fakes import FakeRedis, FakeDB
+
+NAMED = {f'thor1named{i}': f'name{i}' for i in range(10)}
+
+
+class CountingRedis(FakeRedis):
+    def __init__(self):
+        super().__init__()
+        self.mget_calls = 0
+
+    async def mget(self, keys, *args):
+        self.mget_calls += 1
+        return await super().mget(keys, *args)
+
+
+class FakeMidgard:
+    ERROR_RESPONSE = 'error'
+    ERROR_NOT_FOUND = 'not_found'
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = []
+        self.running = 0
+        self.max_running = 0
+
+    async def request(self, path):
+        self.requests.append(path)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+
+        kind, arg = path.split('/')[-2:]
+        if kind == 'rlookup':
+            return [NAMED[arg]] if arg in NAMED else self.ERROR_NOT_FOUND
+        address = next(a for a, n in NAMED.items() if n == arg)
+        return {'expire': 1000, 'owner': address, 'entries': [{'chain': 'THOR', 'address': address}]}
+
+    @property
+    def rlookups(self):
+        return [r for r in self.requests if '/rlookup/' in r]
+
+
+def make_service(redis, midgard, max_concurrent_requests=4):
+    cfg = SubConfig({
+        'names': {
+            'thorname': {
+                'enabled': True,
+                'expire': '24h',
+                'max_concurrent_requests': max_concurrent_requests,
+                'local_cache': {'ttl': '10m', 'max_items': 1000},
+            },
+            'preconfig': {'thor1reserve': 'Reserve'},
+        }
+    })
+    db = cast(DB, cast(object, FakeDB(redis)))
+    return NameService(db, cast(Config, cfg), cast(MidgardConnector, cast(object, midgard)), node_cache=None)
+
+
+@pytest.mark.asyncio
+async def test_bulk_lookup_costs_a_few_round_trips():
+    redis, midgard = CountingRedis(), FakeMidgard()
+    addresses = [f'thor1anon{i}' for i in range(190)] + list(NAMED) + ['thor1reserve']
+
+    results = await make_service(redis, midgard).lookup_multiple_names_by_addresses(addresses)
+    assert results['thor1named3'].name == 'name3'
+    assert results['thor1reserve'].name == 'Reserve'
+    assert results['thor1anon5'] is None
+    assert redis.mget_calls == 2
+    assert redis.pipelines_executed == 2
+    assert len(midgard.rlookups) == 200
+    assert len(midgard.requests) == 210
+
+    # another process: everything comes from Redis, negative results included
+    service = make_service(redis, midgard)
+    again = await service.lookup_multiple_names_by_addresses(addresses)
+    assert again == results
+    assert redis.mget_calls == 4
+    assert len(midgard.requests) == 210
+
+    # same process: not even Redis
+    await service.lookup_multiple_names_by_addresses(addresses)
+    assert await service.lookup_name_by_address('thor1anon7') is None
+    assert redis.mget_calls == 4
+
+
+@pytest.mark.asyncio
+async def test_midgard_requests_are_deduplicated_and_limited():
+    midgard = FakeMidgard(delay=0.01)
+    service = make_service(FakeRedis(), midgard, max_concurrent_requests=3)
+
+    batch = [f'thor1anon{i}' for i in range(12)] + ['thor1named1']
+    await asyncio.gather(
+        service.lookup_multiple_names_by_addresses(batch),
+        service.lookup_multiple_names_by_addresses(batch),
+        service.lookup_name_by_address('thor1named1'),
+    )
+    assert len(midgard.rlookups) == 13
+    assert midgard.max_running == 3
+
+
+@pytest.mark.asyncio
+async def test_name_map_from_address_set():
+    service = make_service(FakeRedis(), FakeMidgard())
+    name_map = await service.safely_load_thornames_from_address_set(['thor1named2', 'thor1nobody', 'thor1named2'])
+    assert name_map.get('thor1named2') == 'name2'
+    assert 'thor1nobody' not in name_map
+    assert set(name_map.by_name) == {'name2'}
@@ -0,0 +1,97 @@
+import json
+from dataclasses import asdict, replace
+
+import pytest
+
+from lib.depcont import DepContainer
+from models.node_db import NodeStateDatabase
+from models.node_diff import NodeSetDiff, NodeSnapshot
+from models.node_info import NodeInfo, BondProvider, NodeSetChanges
+from tests.fakes import FakeRedis, FakeDB
+
+
+def make_node(i, **kwargs):
+    return replace(NodeInfo(
+        status=NodeInfo.ACTIVE,
+        node_address=f'thor1node{i}',
+        bond=1_000_000.0 + i,
+        ip_address=f'10.0.0.{i}',
+        version='3.1.0',
+        bond_providers=[BondProvider(f'thor1bp{i}', 500_000.0)],
+        observe_chains=[{'chain': 'BTC', 'height': 800_000}],
+        jail={'release_height': 0},
+    ), **kwargs)
+
+
+@pytest.fixture
+def node_db():
+    d = DepContainer()
+    d.db = FakeDB(FakeRedis())
+    return NodeStateDatabase(d)
+
+
+def test_diff_is_keyed_and_field_level():
+    prev = [make_node(i) for i in range(5)]
+    curr = [make_node(i) for i in range(1, 6)]
+    curr[0] = replace(curr[0], ip_address='1.2.3.4')
+    curr[1] = replace(curr[1], observe_chains=[{'chain': 'BTC', 'height': 800_001}], bond=1.0)
+
+    diff = NodeSetDiff.compute(NodeSnapshot.of(prev), NodeSnapshot.of(curr))
+    assert [n.node_address for n in diff.added] == ['thor1node5']
+    assert [n.node_address for n in diff.removed] == ['thor1node0']
+    assert diff.changed_fields == {
+        'thor1node1': {'ip_address'},
+        'thor1node2': {'observe_chains', 'bond'},
+    }
+    assert list(diff.changed_in('bond')) == ['thor1node2']
+    assert set(diff.changed_in()) == {'thor1node1', 'thor1node2'}
+    assert sorted(diff.dirty_addresses) == ['thor1node1', 'thor1node2', 'thor1node5']
+
+    # without a precomputed diff the change set computes the same thing
+    changes = NodeSetChanges(nodes_all=curr, nodes_previous=prev)
+    assert list(changes.changed_node_map('ip_address')) == ['thor1node1']
+    assert NodeSetDiff.compute(NodeSnapshot.of(curr), NodeSnapshot.of(curr)).is_empty
+
+
+@pytest.mark.asyncio
+async def test_only_changed_nodes_are_written(node_db):
+    redis: FakeRedis = node_db.deps.db.redis
+    nodes = [make_node(i) for i in range(10)]
+    await node_db.save_node_info_list(nodes)
+    assert len(redis.hashes[node_db.hash_key]) == 10
+
+    stored = dict(redis.hashes[node_db.hash_key])
+    nodes[3] = replace(nodes[3], version='3.2.0')
+    diff = await node_db.save_node_info_list(nodes[:9])
+    assert list(diff.changed) == ['thor1node3']
+    assert [n.node_address for n in diff.removed] == ['thor1node9']
+
+    after = redis.hashes[node_db.hash_key]
+    assert len(after) == 9
+    assert after['thor1node0'] is stored['thor1node0']  # not re-serialized
+    assert json.loads(after['thor1node3'])['version'] == '3.2.0'
+
+    # a fresh reader (another process) restores the node list from the hash
+    reader = NodeStateDatabase(node_db.deps)
+    restored = {n.node_address: n for n in await reader.get_last_node_info_list()}
+    assert restored['thor1node3'] == nodes[3]
+    assert restored['thor1node0'].bond_providers == [BondProvider('thor1bp0', 500_000.0)]
+
+
+@pytest.mark.asyncio
+async def test_old_format_and_lost_hash(node_db):
+    redis: FakeRedis = node_db.deps.db.redis
+    nodes = [make_node(i) for i in range(3)]
+    redis.strings[node_db.key] = json.dumps([asdict(n) for n in nodes])
+
+    assert await node_db.get_last_node_info_list() == nodes
+    diff = await node_db.save_node_info_list(nodes)
+    assert diff.is_empty
+    assert node_db.key not in redis.strings
+    assert len(redis.hashes[node_db.hash_key]) == 3
+
+    # the hash is gone (e.g. Redis flushed): the next save finds out, the one after it rewrites everything
+    await redis.delete(node_db.hash_key)
+    await node_db.save_node_info_list(nodes)
+    await node_db.save_node_info_list(nodes)
+    assert len(redis.hashes[node_db.hash_key]) == 3
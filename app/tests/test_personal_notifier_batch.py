@@ -0,0 +1,107 @@
+import asyncio
+from typing import cast
+
+import pytest
+
+from api.midgard.name_service import NameMap, LocalWalletNameDB
+from lib.config import SubConfig
+from lib.db import DB
+from lib.depcont import DepContainer
+from models.node_watchers import UserWatchlist
+from notify.broadcast_queue import PersonalSendQueue
+from notify.personal.base import BasePersonalNotifier
+from tests.fakes import FakeRedis, FakeDB
+
+N_USERS = 300
+
+
+class FakeLocalizationManager:
+    def __init__(self):
+        self.bulk_calls = 0
+
+    async def get_from_db_many(self, chat_ids, _db):
+        self.bulk_calls += 1
+        return {chat_id: f'loc-{chat_id}' for chat_id in chat_ids}
+
+
+class FakeNameService:
+    def __init__(self, db):
+        self.db = db
+
+    async def safely_load_thornames_from_address_set(self, _addresses):
+        return NameMap.empty()
+
+    async def get_local_name_maps(self, user_ids):
+        return await LocalWalletNameDB.get_name_maps(self.db, user_ids)
+
+
+class FakeSettingsManager:
+    async def get_settings_multi(self, user_ids):
+        return {user: {'messenger': 'telegram'} for user in user_ids}
+
+
+class FakeBroadcaster:
+    def __init__(self):
+        self.sent = []
+        self.personal_queue = PersonalSendQueue(self.send, workers=3, max_size=5)
+
+    async def send(self, channel, message, **_kwargs):
+        await asyncio.sleep(0.001)
+        self.sent.append((channel.channel_id, message.text))
+
+
+class EchoNotifier(BasePersonalNotifier):
+    def __init__(self, d, watcher):
+        super().__init__(d, watcher)
+        self.running = 0
+        self.max_running = 0
+
+    async def on_data(self, sender, data):
+        await self.group_and_send_messages(data, data)
+
+    def get_users_from_event(self, ev, address_to_user):
+        return address_to_user.get(ev)
+
+    async def generate_message_text(self, loc, group, settings, user, user_watch_addy_list, name_map):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.001)
+        self.running -= 1
+        return [f'{loc}: {name_map.get(ev, ev)}' for ev in group]
+
+
+@pytest.mark.asyncio
+async def test_group_and_send_messages_in_bulk():
+    redis = FakeRedis()
+    db = cast(DB, cast(object, FakeDB(redis)))
+
+    d = DepContainer()
+    d.cfg = SubConfig({'personal': {'max_concurrent_users': 4}})
+    d.db = db
+    d.loc_man = FakeLocalizationManager()
+    d.name_service = FakeNameService(db)
+    d.settings_manager = FakeSettingsManager()
+    d.broadcaster = FakeBroadcaster()
+
+    watcher = UserWatchlist(db, 'Wallet')
+    addresses = [f'thor1addr{i}' for i in range(N_USERS)]
+    for i, address in enumerate(addresses):
+        await watcher.add_user_to_node(f'user{i}', address)
+    await LocalWalletNameDB(db, 'user7').set_wallet_local_name('thor1addr7', 'My wallet')
+
+    notifier = EchoNotifier(d, watcher)
+    pipelines = redis.pipelines_executed
+    await notifier.group_and_send_messages(addresses, addresses)
+    await d.broadcaster.personal_queue.join()
+
+    sent = dict(d.broadcaster.sent)
+    assert len(sent) == N_USERS
+    assert sent['user7'] == 'loc-user7: My wallet'
+    assert sent['user8'] == 'loc-user8: thor1addr8'
+
+    assert d.loc_man.bulk_calls == 1
+    assert redis.pipelines_executed - pipelines == 2  # watchers + local names
+    assert notifier.max_running == 4
+    assert d.broadcaster.personal_queue.max_depth <= 5
+
+    await d.broadcaster.personal_queue.stop()
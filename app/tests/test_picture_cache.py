@@ -0,0 +1,131 @@
+import asyncio
+from dataclasses import dataclass
+from typing import cast
+
+import pytest
+
+from lib.db import DB
+from lib.html_renderer import InfographicRendererRPC
+from lib.picture_cache import PictureCache
+from tests.fakes import FakeRedis, FakeDB
+
+
+@dataclass
+class Stats:
+    volume: float
+    pools: list
+
+
+class Renderer:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return b'PNG' + str(self.calls).encode()
+
+
+def test_key_depends_on_everything():
+    key = PictureCache.make_key('price', Stats(1.0, ['BTC']), 'eng')
+    assert key == PictureCache.make_key('price', Stats(1.0, ['BTC']), 'eng')
+    assert key != PictureCache.make_key('price', Stats(1.0, ['BTC']), 'rus')
+    assert key != PictureCache.make_key('price', Stats(2.0, ['BTC']), 'eng')
+    assert key != PictureCache.make_key('pools', Stats(1.0, ['BTC']), 'eng')
+    assert PictureCache.make_key('price', {'a': 1, 'b': 2}) == PictureCache.make_key('price', {'b': 2, 'a': 1})
+
+    # no stable representation => no caching
+    assert PictureCache.make_key('price', {'x': object()}) is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_renders_are_computed_once():
+    cache = PictureCache()
+    render = Renderer(delay=0.02)
+
+    results = await asyncio.gather(*[cache.get_or_render('t', {'p': 1}, render) for _ in range(5)])
+    assert results == [b'PNG1'] * 5
+    assert render.calls == 1
+
+    assert await cache.get_or_render('t', {'p': 1}, render) == b'PNG1'
+    assert await cache.get_or_render('t', {'p': 2}, render) == b'PNG2'
+    assert render.calls == 2
+    assert cache.misses == 2
+
+
+@pytest.mark.asyncio
+async def test_memory_ttl_and_lru():
+    cache = PictureCache(max_items=2, ttl=0.05)
+    render = Renderer()
+
+    await cache.get_or_render('t', 1, render)
+    await cache.get_or_render('t', 2, render)
+    await cache.get_or_render('t', 3, render)  # evicts 1
+    await cache.get_or_render('t', 1, render)
+    assert render.calls == 4
+
+    await asyncio.sleep(0.06)
+    await cache.get_or_render('t', 1, render)
+    assert render.calls == 5
+
+
+@pytest.mark.asyncio
+async def test_redis_is_shared():
+    redis = FakeRedis()
+    db = cast(DB, cast(object, FakeDB(redis)))
+    render = Renderer()
+
+    assert await PictureCache(db, ttl=60).get_or_render('t', 1, render, locale='eng') == b'PNG1'
+    key = PictureCache.make_key('t', 1, 'eng')
+    assert redis.expirations[f'PictureCache:{key}'] == 60
+
+    # another process, empty memory
+    assert await PictureCache(db, ttl=60).get_or_render('t', 1, render, locale='eng') == b'PNG1'
+    assert render.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_render_is_not_cached():
+    cache = PictureCache()
+
+    async def broken():
+        raise ValueError('renderer is down')
+
+    with pytest.raises(ValueError):
+        await cache.get_or_render('t', 1, broken)
+    assert await cache.get_or_render('t', 1, Renderer()) == b'PNG1'
+
+
+@pytest.mark.asyncio
+async def test_html_renderer_uses_cache():
+    rpc = InfographicRendererRPC(None, cache=PictureCache())
+    calls = []
+
+    async def fake_render(template_name, parameters):
+        calls.append(template_name)
+        return b'HTML-PNG'
+
+    rpc._render_with_retries = fake_render
+    for _ in range(3):
+        assert await rpc.render('weekly_stats.jinja2', {'week': 1}) == b'HTML-PNG'
+    assert calls == ['weekly_stats.jinja2']
+
+
+@pytest.mark.asyncio
+async def test_html_renderer_batch_skips_cached():
+    rpc = InfographicRendererRPC(None, url='http://renderer:8404/render', cache=PictureCache())
+    assert rpc.batch_url == 'http://renderer:8404/render_batch'
+    batches = []
+
+    async def fake_render_batch(template_name, parameters_list):
+        batches.append([p['lang'] for p in parameters_list])
+        return [f'PNG-{p["lang"]}'.encode() for p in parameters_list]
+
+    rpc._render_batch = fake_render_batch
+
+    assert await rpc.render_batch('t.jinja2', [{'lang': 'eng'}, {'lang': 'rus'}, {'lang': 'eng'}]) == [
+        b'PNG-eng', b'PNG-rus', b'PNG-eng'
+    ]
+    assert await rpc.render_batch('t.jinja2', [{'lang': 'rus'}, {'lang': 'esp'}]) == [b'PNG-rus', b'PNG-esp']
+    assert batches == [['eng', 'rus'], ['esp']]
@@ -0,0 +1,207 @@
+import json
+from typing import cast
+
+import numpy as np
+import pytest
+
+from jobs.fetch.cached.pool import PoolCache
+from jobs.fetch.cached.pool_history import PoolHistoryStore
+from lib.columnar import encode_columns, decode_columns, ColumnarError
+from lib.config import SubConfig
+from lib.date_utils import DAY
+from lib.db import DB
+from lib.depcont import DepContainer
+from models.pool_info import PoolInfo
+from tests.fakes import FakeDB, FakeRedis
+
+
+def make_pool(asset, height, status=PoolInfo.AVAILABLE):
+    return PoolInfo(asset,
+                    balance_asset=10 ** 8 + height,
+                    balance_rune=10 ** 12 + 3 * height,
+                    pool_units=5 * 10 ** 15 + height,
+                    status=status,
+                    usd_per_asset=30_000.5 + height,
+                    units=6 * 10 ** 15,
+                    savers_apr=0.05)
+
+
+def make_pool_map(height):
+    return {
+        'BTC.BTC': make_pool('BTC.BTC', height),
+        'ETH.ETH': make_pool('ETH.ETH', height, status=PoolInfo.STAGED),
+    }
+
+
+def make_store(**kwargs):
+    redis = FakeRedis()
+    store = PoolHistoryStore(cast(DB, cast(object, FakeDB(redis))), **kwargs)
+    return store, redis
+
+
+def test_columnar_round_trip():
+    columns = {
+        'height': np.array([100, 101, 105, 200], dtype=np.int64),
+        'depth': np.array([10 ** 15, 10 ** 15 + 7, 10 ** 15 - 3, 0], dtype=np.int64),
+        'price': np.array([1.5, 2.25, np.nan, 0.0]),
+        'status': np.array(['available', 'staged', 'available', 'suspended'], dtype=object),
+        'flag': np.array([True, False, False, True]),
+    }
+    blob = encode_columns(columns)
+    assert isinstance(blob, str)
+
+    decoded = decode_columns(blob)
+    assert list(decoded) == list(columns)
+    assert decoded['height'].tolist() == columns['height'].tolist()
+    assert decoded['depth'].tolist() == columns['depth'].tolist()
+    np.testing.assert_array_equal(decoded['price'], columns['price'])
+    assert decoded['status'].tolist() == columns['status'].tolist()
+    assert decoded['flag'].tolist() == columns['flag'].tolist()
+
+
+def test_columnar_big_ints_are_stored_raw():
+    huge = 2 ** 70
+    columns = {'height': np.array([1, 2]), 'supply': np.array([huge, 5], dtype=object)}
+    decoded = decode_columns(encode_columns(columns))
+    assert decoded['supply'].tolist() == [huge, 5]
+    assert decoded['height'].tolist() == [1, 2]
+
+
+def test_columnar_bad_data():
+    with pytest.raises(ColumnarError):
+        decode_columns('{"json": "blob"}')
+    with pytest.raises(ColumnarError):
+        encode_columns({'a': [1, 2], 'b': [1]})
+
+
+@pytest.mark.asyncio
+async def test_save_is_buffered_until_flush():
+    store, redis = make_store(bucket_size=100, flush_every=3)
+
+    await store.save(1001, make_pool_map(1001))
+    await store.save(1002, make_pool_map(1002))
+    assert not redis.hashes
+    # still readable from the buffer
+    assert (await store.load(1002))['BTC.BTC'] == make_pool('BTC.BTC', 1002)
+
+    await store.save(1150, make_pool_map(1150))
+    assert set(redis.hashes) == {store.key_bucket(10), store.key_bucket(11)}
+    assert set(redis.hashes[store.key_bucket(10)]) == {'BTC.BTC', 'ETH.ETH'}
+
+
+@pytest.mark.asyncio
+async def test_load_exact_height_and_subset_of_pools():
+    store, redis = make_store(bucket_size=100, flush_every=1)
+    for h in (1001, 1005, 1099, 1100):
+        await store.save(h, make_pool_map(h))
+
+    # a fresh instance must read everything from Redis
+    reader = PoolHistoryStore(store.db, bucket_size=100)
+
+    pool_map = await reader.load(1005)
+    assert pool_map == make_pool_map(1005)
+    assert pool_map['ETH.ETH'].status == PoolInfo.STAGED
+    assert isinstance(pool_map['BTC.BTC'].balance_rune, int)
+
+    assert await reader.load(1006) is None
+    assert await reader.load(99_999) is None
+
+    btc_only = await reader.load(1099, pools=['BTC.BTC'])
+    assert list(btc_only) == ['BTC.BTC']
+
+    many = await reader.load_many([1001, 1100, 1003])
+    assert set(many) == {1001, 1100}
+
+
+@pytest.mark.asyncio
+async def test_rewrite_same_height():
+    store, redis = make_store(bucket_size=100, flush_every=1)
+    await store.save(1001, make_pool_map(1001))
+
+    updated = make_pool_map(1001)
+    updated['BTC.BTC'].balance_rune = 42
+    await store.save(1001, updated)
+
+    reader = PoolHistoryStore(store.db, bucket_size=100)
+    assert (await reader.load(1001))['BTC.BTC'].balance_rune == 42
+
+
+@pytest.mark.asyncio
+async def test_range_query():
+    store, redis = make_store(bucket_size=10, flush_every=100)
+    heights = list(range(95, 130, 2))
+    for h in heights:
+        await store.save(h, make_pool_map(h))
+
+    result = await store.load_range('BTC.BTC', 100, 120, ['balance_rune'])
+    expected = [h for h in heights if 100 <= h <= 120]
+    assert result['height'].tolist() == expected
+    assert result['balance_rune'].tolist() == [10 ** 12 + 3 * h for h in expected]
+
+    empty = await store.load_range('DOGE.DOGE', 100, 120)
+    assert len(empty['height']) == 0
+
+
+@pytest.mark.asyncio
+async def test_clear_drops_old_buckets():
+    store, redis = make_store(bucket_size=10, flush_every=1)
+    for h in (5, 15, 25, 35):
+        await store.save(h, make_pool_map(h))
+
+    await store.clear(min_height=20, max_height=29)
+
+    assert set(redis.hashes) == {store.key_bucket(2)}
+    assert await store.load(15) is None
+    assert await store.load(25) is not None
+
+    await store.purge()
+    assert not redis.hashes
+    assert not redis.zsets.get(store.key_index)
+
+
+@pytest.mark.asyncio
+async def test_values_beyond_int64_are_not_lost():
+    store, redis = make_store(bucket_size=100, flush_every=1)
+    await store.save(1001, make_pool_map(1001))
+
+    pool_map = make_pool_map(1002)
+    pool_map['BTC.BTC'].synth_supply = 2 ** 64
+    await store.save(1002, pool_map)
+
+    store._chunks = type(store._chunks)(store._chunks.capacity)  # force decoding from Redis
+    assert (await store.load(1002))['BTC.BTC'].synth_supply == 2 ** 64
+    assert (await store.load(1001))['BTC.BTC'] == make_pool('BTC.BTC', 1001)
+
+
+class PoolCacheConfig(SubConfig):
+    stable_coins = ()
+
+
+class FakeLastBlockCache:
+    async def get_thor_block(self):
+        return 20_000
+
+
+@pytest.mark.asyncio
+async def test_legacy_hash_is_migrated_and_trimmed():
+    d = DepContainer()
+    d.cfg = PoolCacheConfig({'price': {'pool_cache_max_age': '1d'}})
+    d.db = cast(DB, cast(object, FakeDB(FakeRedis())))
+    d.last_block_cache = FakeLastBlockCache()
+    cache = PoolCache(d)
+    legacy = d.db.redis.hashes[PoolCache.DB_KEY_POOL_INFO_HASH]
+    for height in (10, 19_000, 19_500):
+        legacy[str(height)] = json.dumps({k: p.to_dict() for k, p in make_pool_map(height).items()})
+
+    # read once: moved to the new store, the legacy entry is kept until it is flushed there
+    assert (await cache.load_pools(height=19_500))['BTC.BTC'].balance_rune == make_pool('BTC.BTC', 19_500).balance_rune
+    assert set(legacy) == {'10', '19000', '19500'}
+
+    await cache.flush_history()
+    assert set(legacy) == {'10', '19000'}
+    stored = await PoolHistoryStore(d.db).load(19_500)
+    assert stored['BTC.BTC'].balance_rune == make_pool('BTC.BTC', 19_500).balance_rune
+
+    # the old entries go away with the regular clearing
+    await cache.clear(max_age=DAY)
+    assert set(legacy) == {'19000'}
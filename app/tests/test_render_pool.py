@@ -0,0 +1,102 @@
+import pickle
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from comm.localization.eng_base import BaseLocalization
+from comm.picture.common import BasePictureGenerator
+from comm.picture.render_pool import RenderPool, RenderSpec, RenderError
+from comm.picture.resources import Resources
+from lib.config import SubConfig
+from lib.utils import async_wrap
+
+
+@async_wrap
+def square_picture(size, color='red'):
+    return Image.new('RGB', (size, size), color)
+
+
+class SquarePictureGenerator(BasePictureGenerator):
+    FILENAME_PREFIX = 'square'
+
+    def __init__(self, loc, size):
+        super().__init__(loc)
+        self.size = size
+        self.r = Resources()
+
+    @async_wrap
+    def _get_picture_sync(self):
+        return Image.new('RGB', (self.size, self.size), 'blue')
+
+
+@pytest.fixture
+def render_pool():
+    pool = RenderPool()
+    pool.start(2)
+    yield pool
+    pool.stop()
+    pool.stats.clear()
+
+
+def decode(data):
+    return Image.open(BytesIO(data))
+
+
+def test_spec_renders_synchronously():
+    image = RenderSpec(square_picture, (10,), {'color': 'green'}).render()
+    assert image.size == (10, 10)
+    assert image.getpixel((0, 0)) == (0, 128, 0)
+
+
+def test_resources_are_not_pickled():
+    loc = BaseLocalization(SubConfig({}))
+    loc.name_service = lambda: None
+    gen = SquarePictureGenerator(loc, 8)
+
+    data = pickle.dumps(RenderSpec.for_generator(gen))
+    assert len(data) < 10_000
+
+    copy = pickle.loads(data).args[0]
+    assert copy.r is Resources()
+    assert copy.loc.name_service is None
+
+
+@pytest.mark.asyncio
+async def test_render_in_pool(render_pool):
+    data = await render_pool.render(RenderSpec(square_picture, (16,), name='square'))
+    assert decode(data).size == (16, 16)
+
+    loc = BaseLocalization(SubConfig({}))
+    pic, name = await SquarePictureGenerator(loc, 12).get_picture()
+    assert isinstance(pic, bytes)
+    assert decode(pic).getpixel((0, 0)) == (0, 0, 255)
+    assert name.startswith('square-')
+
+    assert render_pool.pending == 0
+    assert render_pool.stats['square'].count == 1
+    assert render_pool.stats['SquarePictureGenerator'].count == 1
+    assert 'SquarePictureGenerator: 1 done' in render_pool.summary()
+
+
+@pytest.mark.asyncio
+async def test_unpicklable_spec_falls_back_to_thread(render_pool):
+    # lambdas can't be sent to a worker
+    data = await render_pool.render(RenderSpec(lambda: Image.new('RGB', (5, 5)), name='lambda'))
+    assert decode(data).size == (5, 5)
+    assert render_pool.stats['lambda'].count == 1
+
+
+@pytest.mark.asyncio
+async def test_render_failure_is_not_retried(render_pool):
+    with pytest.raises(RenderError):
+        await render_pool.render(RenderSpec(square_picture, ('not a size',), name='broken'))
+    assert render_pool.stats['broken'].errors == 1
+    assert render_pool.stats['broken'].count == 0
+
+
+@pytest.mark.asyncio
+async def test_disabled_pool_keeps_pil_images():
+    assert not RenderPool().enabled
+    pic, _ = await SquarePictureGenerator(BaseLocalization(SubConfig({})), 4).get_picture()
+    assert isinstance(pic, Image.Image)
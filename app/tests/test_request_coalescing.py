@@ -0,0 +1,111 @@
+import asyncio
+from typing import cast
+
+import aiohttp
+import pytest
+from aiohttp import ClientSession
+
+from api.aionode.coalesce import SingleFlight
+from api.aionode.connector import ThorConnector
+from api.aionode.env import ThorEnvironment
+from api.midgard.connector import MidgardConnector
+
+POOL = {'asset': 'BTC.BTC', 'balance_rune': '100', 'balance_asset': '1', 'status': 'Available'}
+
+
+def make_connector(**kwargs):
+    connector = ThorConnector(ThorEnvironment(thornode_url='https://node'), cast(ClientSession, cast(object, None)),
+                              **kwargs)
+    calls = []
+
+    async def request(path, is_rpc=False, height=None):
+        calls.append((path, height))
+        await asyncio.sleep(0.01)
+        if height and height > 1000:
+            return {'code': 3, 'message': 'requested block height is in the future'}
+        return [dict(POOL)] if path.endswith('pools') else dict(POOL)
+
+    connector._clients[0].request = request
+    return connector, calls
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_share_one_call():
+    connector, calls = make_connector()
+
+    results = await asyncio.gather(*([connector.query_pools() for _ in range(10)] +
+                                     [connector.query_pool('BTC.BTC', height=100) for _ in range(10)] +
+                                     [connector.query_pool('BTC.BTC', height=101)]))
+    assert sorted(calls) == [('/thorchain/pool/BTC.BTC', 100), ('/thorchain/pool/BTC.BTC', 101), ('/thorchain/pools', None)]
+    assert all(r[0].asset == 'BTC.BTC' for r in results[:10])
+    assert connector._single_flight.shared == 18
+    assert len(connector._single_flight) == 0
+
+    # a past height is served from memory, the latest state is asked again
+    calls.clear()
+    await connector.query_pool('BTC.BTC', height=100)
+    await connector.query_pools()
+    assert calls == [('/thorchain/pools', None)]
+
+    # an error for a height is not memoized: the block may appear a moment later
+    calls.clear()
+    await connector.query_mimir(height=2000)
+    await connector.query_mimir(height=2000)
+    assert calls == [('/thorchain/mimir', 2000)] * 2
+
+
+@pytest.mark.asyncio
+async def test_pinned_memo_can_be_disabled_and_errors_are_shared():
+    connector, calls = make_connector(pinned_ttl=0)
+    await connector.query_pool('BTC.BTC', height=100)
+    await connector.query_pool('BTC.BTC', height=100)
+    assert len(calls) == 2
+
+    single_flight = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError('boom')
+
+    results = await asyncio.gather(*[single_flight.do('k', failing) for _ in range(3)], return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+    assert single_flight.shared == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_owner_does_not_cancel_the_waiters():
+    single_flight = SingleFlight()
+    calls = []
+
+    async def request():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return 'data'
+
+    owner = asyncio.create_task(single_flight.do('k', request))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(single_flight.do('k', request))
+    await asyncio.sleep(0)
+
+    owner.cancel()
+    assert await waiter == 'data'
+    assert owner.cancelled()
+    assert calls == [1]
+    assert len(single_flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_midgard_requests_are_coalesced():
+    async with aiohttp.ClientSession() as session:
+        midgard = MidgardConnector(session, public_url='https://midgard')
+    calls = []
+
+    async def fake_get(ip, path):
+        calls.append(path)
+        await asyncio.sleep(0.01)
+        return {'path': path}
+
+    midgard._request_json_from_midgard_by_ip = fake_get
+    results = await asyncio.gather(*[midgard.request('v2/pools') for _ in range(5)], midgard.request('v2/network'))
+    assert calls == ['v2/pools', 'v2/network']
+    assert results[0] is results[4]
@@ -0,0 +1,77 @@
+import json
+from typing import cast
+
+import pytest
+
+from jobs.scanner.scanner_state import ScannerStateDB, ScannerState
+from lib.db import DB
+from tests.fakes import FakeDB, FakeRedis
+
+
+class CountingRedis(FakeRedis):
+    def __init__(self):
+        super().__init__()
+        self.gets = 0
+        self.sets = 0
+
+    async def get(self, name):
+        self.gets += 1
+        return await super().get(name)
+
+    async def set(self, name, value):
+        self.sets += 1
+        return await super().set(name, value)
+
+
+def make_state_db(**kwargs):
+    redis = CountingRedis()
+    return ScannerStateDB(cast(DB, cast(object, FakeDB(redis))), 'test', **kwargs), redis
+
+
+def saved_state(state_db: ScannerStateDB, redis: FakeRedis) -> ScannerState:
+    return ScannerState.model_validate(json.loads(redis.strings[state_db.db_key]))
+
+
+@pytest.mark.asyncio
+async def test_state_is_flushed_every_n_blocks():
+    state_db, redis = make_state_db(flush_interval=1e9, flush_every_blocks=10)
+    await state_db.register()
+    assert redis.sets == 1
+
+    await state_db.on_iteration_start(True)
+    for block_no in range(100, 125):
+        await state_db.set_thor_height(130)
+        await state_db.on_new_block_scanned(block_no, 0.1)
+        await state_db.on_new_block_processed(0.2)
+    await state_db.on_iteration_end()
+
+    assert redis.gets == 1  # only on register
+    assert redis.sets == 1 + 2
+
+    saved = saved_state(state_db, redis)
+    assert saved.last_scanned_block == 119
+    assert saved.is_scanning
+
+    await state_db.flush(force=True)
+    saved = saved_state(state_db, redis)
+    assert saved.last_scanned_block == 124
+    assert saved.total_blocks_scanned == 25
+    assert saved.lag_behind_thor == 6
+    assert not saved.is_scanning
+
+
+@pytest.mark.asyncio
+async def test_state_is_flushed_by_time():
+    state_db, redis = make_state_db(flush_interval=0.0, flush_every_blocks=1000)
+    await state_db.register()
+
+    await state_db.on_new_block_scanned(1, 0.1)
+    await state_db.on_new_block_processed(0.2)
+    assert redis.sets == 3
+
+
+@pytest.mark.asyncio
+async def test_nothing_to_flush():
+    state_db, redis = make_state_db()
+    await state_db.flush(force=True)
+    assert redis.sets == 0
@@ -0,0 +1,131 @@
+from typing import cast
+
+import pytest
+
+from lib.date_utils import MINUTE, HOUR, now_ts
+from lib.db import DB
+from lib.depcont import DepContainer
+from models.node_info import NodeInfo, NodeSetChanges, NodeEventType
+from models.slash_history import SlashPointHistory
+from notify.personal.slashing import SlashPointTracker
+from tests.fakes import FakeRedis, FakeDB
+
+T0 = 1_700_000_000
+TICK = 10
+N_NODES = 100
+
+
+def make_history(redis, keep_sec=3 * HOUR):
+    return SlashPointHistory(cast(DB, cast(object, FakeDB(redis))), keep_sec=keep_sec)
+
+
+@pytest.mark.asyncio
+async def test_only_changes_are_stored_and_queried():
+    redis = FakeRedis()
+    history = make_history(redis)
+    points = {f'thor1node{i}': 100 for i in range(N_NODES)}
+
+    for tick in range(60):  # 10 minutes
+        ts = T0 + tick * TICK
+        if tick == 30:
+            points['thor1node7'] = 150
+        if tick == 50:
+            points['thor1node7'] = 170
+        changed = await history.update(points, ts=ts)
+        if tick == 0:
+            assert len(changed) == N_NODES
+        elif tick in (30, 50):
+            assert changed == ['thor1node7']
+        else:
+            assert changed == []
+
+    blob = redis.hashes[history.key_log]
+    assert len(blob) == N_NODES
+    assert len(history._logs['thor1node7']) == 3
+    assert len(history._logs['thor1node8']) == 1
+
+    now = T0 + 59 * TICK
+    changes = history.changes_over([2 * MINUTE, 5 * MINUTE, HOUR], ts=now)
+    # the unchanged nodes are not even looked at; an hour ago is before the history began
+    assert changes == {'thor1node7': [150, 100, None]}
+
+    # another process restores the same logs
+    reader = make_history(redis)
+    await reader.load()
+    assert reader.changes_over([2 * MINUTE, 5 * MINUTE, HOUR], ts=now) == changes
+
+
+@pytest.mark.asyncio
+async def test_gaps_and_trimming():
+    redis = FakeRedis()
+    history = make_history(redis, keep_sec=HOUR)
+    await history.update({'a': 1, 'b': 5}, ts=T0)
+    await history.update({'a': 1, 'b': 5}, ts=T0 + 10)
+    # the bot was down for 20 minutes; "a" has changed meanwhile
+    await history.update({'a': 2, 'b': 5}, ts=T0 + 20 * MINUTE)
+
+    now = T0 + 21 * MINUTE
+    assert history.changes_over([MINUTE, 15 * MINUTE, 21 * MINUTE], ts=now) == {'a': [2, None, 1]}
+
+    # older rows go away, the value at the window start is kept; the nodes that left are dropped
+    await history.update({'a': 3}, ts=T0 + 2 * HOUR)
+    assert list(history._logs['a'].pts) == [2, 3]
+    await history.update({'a': 3}, ts=T0 + 3 * HOUR)
+    assert set(redis.hashes[history.key_log]) == {'a'}
+
+
+@pytest.mark.asyncio
+async def test_tracker_emits_slash_events():
+    d = DepContainer()
+    d.db = FakeDB(FakeRedis())
+    d.db.redis.streams[SlashPointTracker.DB_KEY_OLD_SERIES].append(('1-0', {'x': '1'}))
+    tracker = SlashPointTracker(d)
+    tracker.history.max_tick_gap = HOUR
+
+    def set_nodes(*slash_points):
+        nodes = [NodeInfo(node_address=f'thor1node{i}', slash_points=pts) for i, pts in enumerate(slash_points)]
+        tracker.node_set_change = NodeSetChanges(nodes_all=nodes)
+        return tracker._extract_slash_points(nodes)
+
+    now = now_ts()
+    await tracker.history.update(set_nodes(10, 20), ts=now - 20 * MINUTE)
+    await tracker.history.update(set_nodes(10, 20), ts=now - 10 * MINUTE)
+    assert SlashPointTracker.DB_KEY_OLD_SERIES not in d.db.redis.streams
+
+    set_nodes(10, 90)
+    events = await tracker.get_events_unsafe()
+    # 30 minutes ago and earlier are before the history began
+    assert {(e.address, e.type, e.data.interval_sec, e.data.delta_pts) for e in events} == {
+        ('thor1node1', NodeEventType.SLASHING, 2 * MINUTE, 70),
+        ('thor1node1', NodeEventType.SLASHING, 5 * MINUTE, 70),
+        ('thor1node1', NodeEventType.SLASHING, 15 * MINUTE, 70),
+    }
+
+
+@pytest.mark.asyncio
+async def test_old_snapshots_are_imported_before_the_stream_is_dropped():
+    d = DepContainer()
+    d.db = FakeDB(FakeRedis())
+    stream = d.db.redis.streams[SlashPointTracker.DB_KEY_OLD_SERIES]
+    now = int(now_ts())
+    for minutes_ago, pts in ((4 * 24 * 60, 1), (40, 10), (39, 10), (20, 10), (19, 50), (1, 50)):
+        stream.append((f'{(now - minutes_ago * MINUTE) * 1000}-0', {'thor1node0': '7', 'thor1node1': str(pts)}))
+
+    tracker = SlashPointTracker(d)
+    tracker.history.LEGACY_READ_BATCH = 2
+    tracker.history.max_tick_gap = HOUR
+    tracker.node_set_change = NodeSetChanges(nodes_all=[
+        NodeInfo(node_address='thor1node0', slash_points=7),
+        NodeInfo(node_address='thor1node1', slash_points=60),
+    ])
+    events = await tracker.get_events_unsafe()
+
+    assert SlashPointTracker.DB_KEY_OLD_SERIES not in d.db.redis.streams
+    assert set(d.db.redis.hashes[tracker.history.key_log]) == {'thor1node0', 'thor1node1'}
+    # the snapshot older than the history window is skipped, so 1 hour ago is unknown
+    assert {(e.address, e.data.interval_sec, e.data.delta_pts) for e in events} == {
+        ('thor1node1', 2 * MINUTE, 10),
+        ('thor1node1', 5 * MINUTE, 10),
+        ('thor1node1', 15 * MINUTE, 10),
+        ('thor1node1', 30 * MINUTE, 50),
+    }
@@ -139,3 +139,27 @@ async def test_handle_finished_swaps_still_checks_tx_stages_for_non_rune_l1_outb
     assert deps.thor_connector.called is True
 
 
+
+
+@pytest.mark.asyncio
+async def test_handle_finished_swaps_marks_given_away_in_one_round_trip():
+    deps = make_deps(stages=None)
+    extractor = SwapExtractorBlock(deps)
+    tx_ids = [f'{i:064X}' for i in range(3)]
+    for tx_id in tx_ids:
+        await store_completed_swap(
+            extractor,
+            tx_id,
+            out_asset='THOR.RUNE',
+            outbound_coin='181624641261 THOR.RUNE',
+            outbound_chain='THOR',
+        )
+
+    redis = deps.db.redis
+    pipelines_before = redis.pipelines_executed
+    txs = await extractor.handle_finished_swaps(set(tx_ids), 26130220)
+
+    assert sorted(tx.tx_hash for tx in txs) == tx_ids
+    assert redis.pipelines_executed - pipelines_before == 2  # one read, one write
+    for tx_id in tx_ids:
+        assert (await extractor._db.read_tx_status(tx_id)).status == SwapProps.STATUS_GIVEN_AWAY
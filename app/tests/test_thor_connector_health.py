@@ -0,0 +1,119 @@
+import asyncio
+from typing import cast
+
+import pytest
+from aiohttp import ClientSession
+
+from api.aionode.connector import ThorConnector
+from api.aionode.env import ThorEnvironment
+from api.aionode.health import EndpointHealth
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_connector(**kwargs):
+    envs = [
+        ThorEnvironment(thornode_url=f'https://node{i}', rpc_url=f'https://rpc{i}', retries=2)
+        for i in range(2)
+    ]
+    connector = ThorConnector(envs[0], cast(ClientSession, cast(object, None)), additional_envs=envs[1:], **kwargs)
+    calls = []
+
+    def fake(name, delay, fail=False):
+        async def request(path, is_rpc=False, height=None):
+            calls.append(name)
+            await asyncio.sleep(delay)
+            if fail:
+                raise ConnectionError(f'{name} is down')
+            return {'node': name, 'height': height}
+
+        return request
+
+    return connector, calls, fake
+
+
+def test_health_score_and_recovery():
+    clock = FakeClock()
+    fast, slow, broken = EndpointHealth(clock=clock), EndpointHealth(clock=clock), EndpointHealth(clock=clock)
+    for _ in range(20):
+        fast.record_success(0.05)
+        slow.record_success(0.5)
+        broken.record_success(0.05)
+    for _ in range(3):
+        broken.record_error(0.05)
+
+    assert fast.p95 == 0.05
+    assert fast.score < slow.score < broken.score
+    assert broken.in_cooldown
+
+    # the errors fade out
+    clock.now += 600
+    assert not broken.in_cooldown
+    assert broken.error_rate < 0.01
+    assert broken.score < slow.score
+
+
+@pytest.mark.asyncio
+async def test_failing_primary_does_not_hold_the_backup():
+    connector, calls, fake = make_connector()
+    primary, backup = connector._clients
+    primary.request = fake('primary', 0.0, fail=True)
+    backup.request = fake('backup', 0.0)
+
+    data = await connector._request('/thorchain/network')
+    assert data['node'] == 'backup'
+    assert calls == ['primary', 'backup']  # no retry of the primary first
+
+    # the failed node goes last now
+    calls.clear()
+    await connector._request('/thorchain/network')
+    assert calls == ['backup']
+
+
+@pytest.mark.asyncio
+async def test_hedged_block_request():
+    connector, calls, fake = make_connector(hedge=True, hedge_min_delay=0.01, hedge_max_delay=0.02)
+    primary, backup = connector._clients
+    primary.request = fake('primary', 0.5)
+    backup.request = fake('backup', 0.01)
+
+    block = await connector.query_thorchain_block_raw(100)
+    assert block == {'node': 'backup', 'height': 100}
+    assert calls == ['primary', 'backup']
+    assert connector.hedges_fired == connector.hedges_won == 1
+    # the cancelled primary has its slow sample, so it is not ranked first anymore
+    assert primary.health.p50 >= 0.01
+    assert connector._ranked_clients()[0] is backup
+
+    # the RPC URL is the same for both: nobody to hedge with
+    backup.env.rpc_url = primary.env.rpc_url
+    primary.request = fake('primary', 0.0)
+    calls.clear()
+    assert (await connector.query_native_status_raw())['node'] in ('primary', 'backup')
+    assert len(calls) == 1
+    assert connector.hedges_fired == 1
+
+    # not hedged without the option
+    plain, calls, fake = make_connector()
+    plain._clients[0].request = fake('primary', 0.05)
+    plain._clients[1].request = fake('backup', 0.0)
+    assert (await plain.query_thorchain_block_raw(5))['node'] == 'primary'
+    assert calls == ['primary']
+
+
+@pytest.mark.asyncio
+async def test_untried_backup_does_not_overtake_primary():
+    connector, calls, fake = make_connector()
+    primary, backup = connector._clients
+    primary.request = fake('primary', 0.01)
+    backup.request = fake('backup', 0.0)
+
+    for _ in range(3):
+        await connector._request('/thorchain/network')
+    assert calls == ['primary'] * 3
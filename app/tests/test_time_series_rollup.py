@@ -0,0 +1,109 @@
+from typing import cast
+
+import pytest
+
+from lib.date_utils import MINUTE, HOUR, DAY, now_ts
+from lib.db import DB
+from models.time_series import TimeSeries, PriceTimeSeries
+from tests.fakes import FakeDB, FakeRedis
+
+
+def make_series(cls=PriceTimeSeries, *args, **kwargs):
+    redis = FakeRedis()
+    db = cast(DB, cast(object, FakeDB(redis)))
+    return cls(*args, db, **kwargs), redis
+
+
+@pytest.mark.asyncio
+async def test_rollups_are_updated_on_add():
+    series, redis = make_series(PriceTimeSeries, 'TEST')
+    t0 = (now_ts() - 2 * HOUR) // HOUR * HOUR
+    for i, price in enumerate([1.0, 3.0, 2.0]):
+        await series.add_ts(t0 + i * 10, price=price)
+    await series.add_ts(t0 + HOUR + 5, price=10.0)
+
+    minutes = await series.get_rollup_buckets(MINUTE, 0, now_ts())
+    assert [b['t'] for b in minutes] == [t0, t0 + HOUR]
+    min_v, max_v, sum_v, count, last_v = minutes[0]['v']['price']
+    assert (min_v, max_v, sum_v, count, last_v) == (1.0, 3.0, 6.0, 3, 2.0)
+
+    days = await series.get_rollup_buckets(DAY, 0, now_ts())
+    assert sum(b['v']['price'][3] for b in days) == 4
+
+    # raw points are still there
+    assert len(redis.streams[series.stream_name]) == 4
+
+
+@pytest.mark.asyncio
+async def test_backfill_updates_older_bucket():
+    series, redis = make_series(PriceTimeSeries, 'TEST')
+    t0 = (now_ts() - DAY) // HOUR * HOUR
+    await series.add_ts(t0 + 2 * HOUR, price=5.0)
+    await series.add_ts(t0, price=1.0)  # older than the current bucket
+    await series.add_ts(t0 + 1, price=2.0)
+
+    hours = await series.get_rollup_buckets(HOUR, 0, now_ts())
+    assert [b['t'] for b in hours] == [t0, t0 + 2 * HOUR]
+    assert hours[0]['v']['price'][2] == 3.0
+
+
+@pytest.mark.asyncio
+async def test_pick_coarsest_resolution():
+    series, _ = make_series(PriceTimeSeries, 'TEST')
+    assert series.pick_rollup_resolution(30 * DAY, 300) == HOUR
+    assert series.pick_rollup_resolution(7 * DAY, 300) == 15 * MINUTE
+    assert series.pick_rollup_resolution(DAY, 300) == MINUTE
+    assert series.pick_rollup_resolution(HOUR, 300) is None
+    assert series.pick_rollup_resolution(2 * 365 * DAY, 300) == DAY
+
+
+@pytest.mark.asyncio
+async def test_rollup_query_returns_few_points():
+    series, redis = make_series(PriceTimeSeries, 'TEST')
+    now = now_ts()
+    n = 1000
+    for i in range(n):
+        await series.add_ts(now - 3 * DAY + i * 259, price=float(i))
+
+    points = await series.get_last_values_rollup(3 * DAY, 'price', points=50, with_ts=True)
+    assert 50 <= len(points) <= 3 * DAY / HOUR + 1
+    assert all(isinstance(ts, float) for ts, _ in points)
+    assert points[0][1] < points[-1][1]
+
+    last_values = await series.get_last_values_rollup(3 * DAY, 'price', points=50, aggregate='last')
+    assert last_values[-1] == float(n - 1)
+
+    with pytest.raises(ValueError):
+        await series.get_last_values_rollup(DAY, 'volume')
+
+
+@pytest.mark.asyncio
+async def test_rollups_are_built_for_existing_series():
+    plain, redis = make_series(TimeSeries, 'price-TEST')
+    t0 = (now_ts() - 3 * HOUR) // HOUR * HOUR
+    for i in range(5):
+        await plain.add_ts(t0 + i * MINUTE, price=float(i))
+    assert not redis.zsets
+
+    series = PriceTimeSeries('TEST', plain.db)
+    values = await series.get_last_values_rollup(DAY, 'price', points=10)
+    assert values == [2.0]  # one hourly bucket, avg of 0..4
+
+    await series.add_ts(t0 + 10 * MINUTE, price=100.0)
+    hours = await series.get_rollup_buckets(HOUR, 0, now_ts())
+    assert hours[0]['v']['price'][3] == 6
+
+
+@pytest.mark.asyncio
+async def test_best_point_ago_picks_nearest():
+    series, redis = make_series(TimeSeries, 'POL')
+    now = now_ts()
+    for offset in (-100, -40, -10, 25, 90):
+        await series.add_ts(now - HOUR + offset, value=str(offset))
+
+    point, diff = await series.get_best_point_ago(HOUR, tolerance_sec=60, ref_ts=now)
+    assert point == {'value': '-10'}
+    assert abs(diff - 10) < 0.01
+
+    point, diff = await series.get_best_point_ago(2 * HOUR, tolerance_sec=60, ref_ts=now)
+    assert point is None
@@ -0,0 +1,121 @@
+from typing import cast
+
+import pytest
+
+from api.midgard.parser import TxParseResult
+from jobs.fetch.tx import TxFetcher
+from lib.config import SubConfig
+from lib.date_utils import now_ts
+from lib.db import DB
+from lib.depcont import DepContainer
+from models.memo import ActionType
+from models.tx import ThorAction, ThorSubTx, ThorCoin, SUCCESS, PENDING
+from tests.fakes import FakeRedis, FakeDB
+
+PER_PAGE = 10
+
+
+def make_tx(i, status=SUCCESS):
+    return ThorAction(
+        date_timestamp=int(now_ts()),
+        height=1000 + i,
+        status=status,
+        type=ActionType.ADD_LIQUIDITY.value,
+        pools=['BTC.BTC'],
+        in_tx=[ThorSubTx(address='thor1user', coins=[ThorCoin(amount=1, asset='THOR.RUNE')], tx_id=f'TX{i:05}')],
+        out_tx=[],
+    )
+
+
+class FakeMidgardTxList:
+    def __init__(self, n):
+        self.txs = [make_tx(i) for i in range(n)]
+        self.pages_requested = []
+        self.unparseable_heights = set()
+
+    def add(self, tx):
+        self.txs.append(tx)
+
+    async def fetch_one_batch(self, page=0, **_kwargs):
+        self.pages_requested.append(page)
+        newest_first = sorted(self.txs, key=lambda t: t.height, reverse=True)
+        chunk = newest_first[page * PER_PAGE:(page + 1) * PER_PAGE]
+        parsed = [tx for tx in chunk if tx.height not in self.unparseable_heights]
+        return TxParseResult(total_count=len(self.txs), txs=parsed, tx_count_unfiltered=len(chunk))
+
+
+def make_fetcher(midgard):
+    d = DepContainer()
+    d.cfg = SubConfig({
+        'network_id': 'mainnet',
+        'tx': {
+            'fetch_period': 60,
+            'tx_per_batch': PER_PAGE,
+            'max_page_deep': 5,
+            'max_age': '2d',
+            'announce_pending_after_blocks': 500,
+            'deep_scan_period': '10m',
+        },
+    })
+    d.db = cast(DB, cast(object, FakeDB(FakeRedis())))
+    fetcher = TxFetcher(d)
+    fetcher.fetch_one_batch = midgard.fetch_one_batch
+    return fetcher
+
+
+async def tick(fetcher):
+    txs = await fetcher.fetch()
+    await fetcher.post_action(txs)
+    return txs
+
+
+@pytest.mark.asyncio
+async def test_incremental_paging_stops_at_high_water_mark():
+    midgard = FakeMidgardTxList(100)
+    fetcher = make_fetcher(midgard)
+
+    # the first tick is a deep scan
+    assert len(await tick(fetcher)) == 5 * PER_PAGE
+    assert midgard.pages_requested == [0, 1, 2, 3, 4]
+    assert fetcher.high_water_mark == (1099, 'TX00099')
+
+    # nothing new: one page
+    midgard.pages_requested.clear()
+    assert await tick(fetcher) == []
+    assert midgard.pages_requested == [0]
+
+    # a burst of new TXs: paging goes on until the old ones show up
+    for i in range(100, 115):
+        midgard.add(make_tx(i))
+    midgard.pages_requested.clear()
+    new_txs = await tick(fetcher)
+    assert sorted(t.tx_hash for t in new_txs) == [f'TX{i:05}' for i in range(100, 115)]
+    assert midgard.pages_requested == [0, 1]
+    assert fetcher.high_water_mark == (1114, 'TX00114')
+
+
+@pytest.mark.asyncio
+async def test_deep_scan_finds_txs_below_the_mark():
+    midgard = FakeMidgardTxList(30)
+    midgard.txs[5] = make_tx(5, status=PENDING)
+    fetcher = make_fetcher(midgard)
+    assert 'TX00005' not in {t.tx_hash for t in await tick(fetcher)}
+
+    # the pending TX has become successful deep in the list; a regular tick does not get there
+    midgard.txs[5] = make_tx(5)
+    assert await tick(fetcher) == []
+
+    fetcher.last_deep_scan_ts = 0
+    midgard.pages_requested.clear()
+    assert [t.tx_hash for t in await tick(fetcher)] == ['TX00005']
+    assert midgard.pages_requested == [0, 1, 2, 3]  # the last one is empty
+    assert fetcher.pending_hash_to_height == {}
+
+
+@pytest.mark.asyncio
+async def test_unparseable_action_does_not_stop_paging():
+    midgard = FakeMidgardTxList(100)
+    midgard.unparseable_heights.add(1095)
+    fetcher = make_fetcher(midgard)
+    assert len(await tick(fetcher)) == 5 * PER_PAGE - 1
+    assert midgard.pages_requested == [0, 1, 2, 3, 4]
@@ -20,7 +20,7 @@ ERROR_RATE = 0.01
 
 async def collect_info_about_existing_dedup(app):
     r = await app.deps.db.get_redis()
-    keys = await r.keys('tx:dedup_v2:*')
+    keys = await r.keys('tx:dedup_v3:*')
     print(keys)
     for key in keys:
         try:
@@ -29,6 +29,11 @@ async def collect_info_about_existing_dedup(app):
         except ResponseError as e:
             pass
 
+    # the deduplicators drop their own v2 bitmaps on first use; this lists the ones nobody uses anymore
+    legacy_keys = await r.keys(f'{TxDeduplicator.LEGACY_KEY_PREFIX}:*')
+    if legacy_keys:
+        print(f'Orphaned v2 keys: {legacy_keys}. Delete them with: await r.unlink(*legacy_keys)')
+
 
 async def dbg_accuracy_benchmark(app: LpAppFramework):
     dedup = TxDeduplicator(app.deps.db, 'dbg:test1', capacity=CAPACITY, error_rate=ERROR_RATE)